@@ -5,15 +5,17 @@
 
 from __future__ import absolute_import, division, print_function
 
+import fnmatch
 import os
+import re
 import shutil
 import tempfile
 import webbrowser
 
 from contextlib import suppress
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, TypeVar, Union
+from typing import Dict, List, Optional, Set, Tuple, TypeVar, Union
 
 from ansible.errors import AnsibleActionFail
 from ansible.parsing.dataloader import DataLoader
@@ -28,9 +30,13 @@ from ansible_collections.ansible.utils.plugins.module_utils.common.argspec_valid
     AnsibleArgSpecValidator,
 )
 
+from ..module_utils.git_metadata import GitMetadata, GitMetadataError, parse_bool
 from ..modules.git_publish import DOCUMENTATION
 from ..plugin_utils.command import Command
 from ..plugin_utils.git_base import ActionInit, GitBase, ResultBase
+from ..plugin_utils.private_directory import user_temporary_directory
+from ..plugin_utils.step_graph import chain
+from ..plugin_utils.trash import Trash
 
 
 # pylint: disable=invalid-name
@@ -38,7 +44,7 @@ __metaclass__ = type
 # pylint: enable=invalid-name
 
 # mypy disallow you from omitting parameters in generic types
-JSONTypes = Union[bool, int, str, Dict, List]  # type:ignore
+JSONTypes = Union[bool, float, int, str, Dict, List]  # type:ignore
 
 
 @dataclass(frozen=False)
@@ -48,11 +54,33 @@ class Result(ResultBase):
     user_name: str = ""
     user_email: str = ""
     pr_url: str = ""
+    files_staged: int = 0
 
 
+# The configuration read for the publish, url.<base>.insteadOf rewrites the origin URL
+CONFIG_KEYS = re.compile(
+    r"^(core\.sparsecheckout|user\.(name|email)|remote\.origin\.(push)?url|url\..*insteadof)$",
+)
+
+# The number of included paths shown when the add fails
+ADD_MSG_PATHS = 3
+
 T = TypeVar("T", bound="ActionModule")  # pylint: disable=invalid-name, useless-suppression
 
 
+def _excluded(path: str, exclude: List[str]) -> bool:
+    """Determine if a path is excluded, as a git pathspec without magic would.
+
+    :param path: The path
+    :param exclude: The excluded paths and patterns
+    :returns: True if the path matches an exclusion or is beneath an excluded directory
+    """
+    return any(
+        fnmatch.fnmatchcase(path, pattern.rstrip("/")) or path.startswith(pattern.rstrip("/") + "/")
+        for pattern in exclude
+    )
+
+
 # pylint: disable=too-many-instance-attributes
 class ActionModule(GitBase):
     """The retrieve action plugin."""
@@ -95,7 +123,14 @@ class ActionModule(GitBase):
         self._supports_async = True
         self._result: Result = Result()
         self._env: Optional[Dict[str, str]] = None
+        self._config: Dict[str, str] = {}
+        self._identity: List[str] = []
+        self._sparse_checkout: bool = False
+        self._skip_commit: bool = False
+        self._unchanged: bool = False
         self._temp_ssh_key_path: Optional[str] = None
+        self._ssh_multiplexing_options: List[str] = []
+        self._push_url: str = ""
 
     def _check_argspec(self: T) -> None:
         """Check the argspec for the action plugin.
@@ -110,6 +145,19 @@ class ActionModule(GitBase):
         valid, errors, self._task.args = aav.validate()
         if not valid:
             raise AnsibleActionFail(errors)
+        if self._task.args["path"] and self._task.args["paths"]:
+            msg = "Parameters `path` and `paths` are mutually exclusive."
+            raise AnsibleActionFail(msg)
+        if not self._task.args["path"] and not self._task.args["paths"]:
+            msg = "One of the parameters `path` or `paths` is required."
+            raise AnsibleActionFail(msg)
+        if self._task.args["max_workers"] < 1:
+            msg = f"Parameter `max_workers` must be 1 or more: {self._task.args['max_workers']}"
+            raise AnsibleActionFail(msg)
+        max_per_host = self._task.args["remote_concurrency"]["max_per_host"]
+        if max_per_host is not None and max_per_host < 1:
+            msg = f"Parameter `remote_concurrency.max_per_host` must be 1 or more: {max_per_host}"
+            raise AnsibleActionFail(msg)
         if self._task.args.get("token") == "":
             err = "Token can not be an empty string"
             raise AnsibleActionFail(err)
@@ -121,6 +169,9 @@ class ActionModule(GitBase):
         """Prepare the environment for SSH key authentication."""
         key_content = self._task.args.get("ssh_key_content")
         key_file = self._task.args.get("ssh_key_file")
+        self._ssh_multiplexing_options = self._ssh_multiplexing(
+            identity=key_content or key_file or "",
+        )
 
         if not key_content and not key_file:
             return
@@ -135,80 +186,302 @@ class ActionModule(GitBase):
             key_path = key_file
 
         ssh_command = f"ssh -i {key_path} -o IdentitiesOnly=yes -o StrictHostKeyChecking=no"
-        self._env = {"GIT_SSH_COMMAND": ssh_command}
+        self._env = {"GIT_SSH_COMMAND": " ".join([ssh_command, *self._ssh_multiplexing_options])}
+
+    def _ssh_config(self: T) -> Tuple[str, ...]:
+        """Build the ssh command when no ssh key is provided.
+
+        The ssh command configured in the repository, such as the host key
+        checking set by git_retrieve, is kept and the environment is not
+        changed so the ssh agent remains available.
+
+        :returns: The cli parameters, empty unless ssh multiplexing is enabled
+        """
+        if not self._ssh_multiplexing_options or self._env:
+            return ()
+        try:
+            ssh_command = GitMetadata(self._path_to_repo).config().get("core.sshcommand")
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            ssh_command = None
+        ssh_command = " ".join([ssh_command or "ssh", *self._ssh_multiplexing_options])
+        return ("-c", f"core.sshCommand={ssh_command}")
 
     def _cleanup_ssh_key(self: T) -> None:
         """Remove the temporary SSH key file if it was created."""
         if self._temp_ssh_key_path:
             Path(self._temp_ssh_key_path).unlink()
 
-    def _configure_git_user_name(self: T) -> None:
-        """Configure the git user name."""
+    def _read_config(self: T) -> None:
+        """Read the repository configuration relevant to the publish.
+
+        The configuration is read from disk, git is only used if it can not be.
+        The user name and email are only used if not already configured, they
+        are provided to the commit and tag commands rather than written to the
+        repository configuration.
+        """
+        try:
+            config = GitMetadata(self._path_to_repo).config()
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            self._read_config_git()
+        else:
+            self._config = {
+                key: values[-1]
+                for key, values in config.variables.items()
+                if CONFIG_KEYS.match(key)
+            }
+
+        try:
+            self._sparse_checkout = parse_bool(self._config.get("core.sparsecheckout") or "false")
+        except GitMetadataError:
+            # git fails on the value itself, the publish fails with it
+            self._sparse_checkout = False
+        self._result.user_name = self._config.get("user.name") or self._task.args["user"]["name"]
+        self._result.user_email = self._config.get("user.email") or self._task.args["user"]["email"]
+        if "user.name" not in self._config:
+            self._identity.extend(["-c", f"user.name={self._result.user_name}"])
+        if "user.email" not in self._config:
+            self._identity.extend(["-c", f"user.email={self._result.user_email}"])
+
+    def _read_config_git(self: T) -> None:
+        """Read the repository configuration relevant to the publish using git."""
+        self._config = {}
+
+        def parse(line: str) -> None:
+            key, separator, value = line.partition(" ")
+            # The last value of a key wins, as it would for git, a key without a value is true
+            self._config[key] = value if separator else "true"
+
         command_parts = list(self._base_command)
-        command_parts.extend(["config", "--get", "user.name"])
+        command_parts.extend(["config", "--get-regexp", CONFIG_KEYS.pattern])
         command = Command(
             command_parts=command_parts,
-            fail_msg="Failed to get current user name for git.",
+            fail_msg="Failed to read the git configuration.",
             env=self._env,
+            stdout_callback=parse,
         )
+        # git config exits with 1 when none of the keys are set
         self._run_command(command=command, ignore_errors=True)
-        if command.stdout:
-            self._result.user_name = command.stdout
-            return
 
-        name = self._task.args["user"]["name"]
+    def _add(self: T) -> None:
+        """Add files for the pending commit.
+
+        Files listed individually are written to the index directly, git add
+        matches every file against every pathspec and is slow for long lists.
+        Patterns, directories, ignored and removed files are staged with git
+        add. The paths are streamed to git on standard input, so the number of
+        files is not limited by the maximum length of the command line.
+        """
+        # A path listed twice would be written to the index and counted twice
+        include = list(dict.fromkeys(self._task.args["include"]))
+        exclude = self._task.args["exclude"]
+        files: List[str] = []
+        pathspecs = [path for path in include if path != "--all"]
+        # Exclusions using pathspec magic can only be evaluated by git
+        if "--all" not in include and not any(path.startswith(":") for path in exclude):
+            single = {path for path in pathspecs if self._is_file(path)}
+            pathspecs = [path for path in pathspecs if path not in single]
+            files = [path for path in include if path in single and not _excluded(path, exclude)]
+            ignored = self._check_ignore(files)
+            files = [path for path in files if path not in ignored]
+            # Staged with git add, which fails as it would for any ignored file
+            pathspecs.extend(path for path in include if path in ignored)
+        # Nothing is staged if git add fails, as it reports any pathspec not matching a file
+        if (pathspecs or not files) and not self._result.failed:
+            self._add_pathspecs(pathspecs)
+        if files and not self._result.failed:
+            self._update_index(files)
+
+    def _is_file(self: T, path: str) -> bool:
+        """Determine if an included path is a single file in the working tree.
+
+        :param path: The included path
+        :returns: True if the path is not a pattern and is an existing file
+        """
+        if path.startswith(":") or any(char in path for char in "*?["):
+            return False
+        full_path = Path(self._path_to_repo, path)
+        return full_path.is_file() or full_path.is_symlink()
+
+    def _check_ignore(self: T, files: List[str]) -> Set[str]:
+        """Find the files ignored by the repository, git add refuses to stage them.
+
+        :param files: The files
+        :returns: The ignored files
+        """
+        if not files:
+            return set()
+
+        ignored: Set[str] = set()
         command_parts = list(self._base_command)
-        command_parts.extend(["config", "user.name", name])
+        command_parts.extend(["check-ignore", "-z", "--stdin"])
         command = Command(
             command_parts=command_parts,
-            fail_msg="Failed to configure git user name",
+            fail_msg="Failed to check the files for the pending commit",
             env=self._env,
+            stdin="\0".join(files).encode("utf-8"),
+            stdout_callback=lambda line: ignored.update(filter(None, line.split("\0"))),
+        )
+        # git check-ignore exits with 1 when none of the files are ignored
+        self._run_command(command=command, ignore_errors=True)
+        if command.return_code not in (0, 1):
+            self._fail(command.fail_msg)
+        return ignored
+
+    def _update_index(self: T, files: List[str]) -> None:
+        """Write files to the index for the pending commit.
+
+        :param files: The files
+        """
+        command_parts = list(self._base_command)
+        command_parts.extend(["update-index", "--add", "-z", "--stdin"])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to add {len(files)} files to the pending commit",
+            env=self._env,
+            stdin="\0".join(files).encode("utf-8"),
         )
         self._run_command(command=command)
-        self._result.user_name = name
 
-    def _configure_git_user_email(self: T) -> None:
-        """Configure the git user email."""
+    def _add_pathspecs(self: T, pathspecs: List[str]) -> None:
+        """Add the files matching pathspecs for the pending commit.
+
+        :param pathspecs: The pathspecs
+        """
+        include = self._task.args["include"]
+        pathspecs = pathspecs + [f":(exclude){path}" for path in self._task.args["exclude"]]
         command_parts = list(self._base_command)
-        command_parts.extend(["config", "--get", "user.email"])
+        command_parts.extend(["add"])
+        if "--all" in include:
+            command_parts.append("--all")
+        if self._sparse_checkout:
+            # Allow files written outside the sparse checkout cone to be staged
+            command_parts.append("--sparse")
+        if pathspecs:
+            command_parts.extend(["--pathspec-from-file=-", "--pathspec-file-nul"])
+        files = " ".join(include if len(include) <= ADD_MSG_PATHS else [*include[:3], "..."])
         command = Command(
             command_parts=command_parts,
-            fail_msg="Failed to get current user email for git.",
+            fail_msg=f"Failed to add the file to the pending commit: {files}",
             env=self._env,
+            stdin="\0".join(pathspecs).encode("utf-8") if pathspecs else None,
         )
-        self._run_command(command=command, ignore_errors=True)
-        if command.stdout:
-            self._result.user_email = command.stdout
+        self._run_command(command=command)
+
+    def _count_staged(self: T) -> None:
+        """Count the files staged that differ from the last commit.
+
+        git update-index reports every file written to the index, changed or
+        not, so the staged files are compared with the last commit instead.
+        """
+        if self._result.failed:
             return
 
-        email = self._task.args["user"]["email"]
+        def count(line: str) -> None:
+            # Each name ends with a NUL, a name may contain a line ending
+            self._result.files_staged += line.count("\0")
+
         command_parts = list(self._base_command)
-        command_parts.extend(["config", "user.email", email])
+        command_parts.extend(["diff", "--cached", "--name-only", "--no-renames", "-z"])
         command = Command(
             command_parts=command_parts,
-            fail_msg="Failed to configure git user email",
+            fail_msg="Failed to compare the staged files with the last commit",
             env=self._env,
+            stdout_callback=count,
         )
         self._run_command(command=command)
-        self._result.user_email = email
 
-    def _add(self: T) -> None:
-        """Add files for the pending commit."""
+    def _detect_changes(self: T) -> None:
+        """Determine if the staged files differ from the last commit or the origin.
+
+        If nothing differs the commit, tag and push are skipped. If the staged
+        files only match the last commit, the commit is skipped and the
+        existing commits are pushed.
+        """
+        if not self._task.args["skip_unchanged"]:
+            return
+
+        staged = bool(self._result.files_staged)
+        if not self._task.args["compare_remote"]:
+            self._unchanged = not staged
+            return
+
+        tip = self._remote_tip()
+        if self._result.failed:
+            return
+        if tip and not self._differs(tip):
+            self._unchanged = True
+        else:
+            self._skip_commit = not staged
+
+    def _differs(self: T, revision: str) -> bool:
+        """Compare the staged files with a commit.
+
+        :param revision: The commit
+        :returns: True if the files differ or the commit is not available locally
+        """
         command_parts = list(self._base_command)
-        files = " ".join(self._task.args["include"])
-        command_parts.extend(["add", files])
+        command_parts.extend(["diff", "--cached", "--quiet", revision, "--"])
         command = Command(
             command_parts=command_parts,
-            fail_msg=f"Failed to add the file to the pending commit: {files}",
+            fail_msg=f"Failed to compare the staged files with: {revision}",
+            env=self._env,
+        )
+        # git diff exits with 1 if the files differ, and 128 if the commit is not available
+        self._run_command(command=command, ignore_errors=True)
+        return command.return_code != 0
+
+    def _current_branch(self: T) -> str:
+        """Get the branch checked out in the repository.
+
+        :returns: The full name of the branch, empty if HEAD is detached
+        """
+        try:
+            head = GitMetadata(self._path_to_repo).head()
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            command_parts = list(self._base_command)
+            command_parts.extend(["symbolic-ref", "--quiet", "HEAD"])
+            command = Command(
+                command_parts=command_parts,
+                fail_msg="Failed to read the current branch",
+                env=self._env,
+            )
+            self._run_command(command=command, ignore_errors=True)
+            head = command.stdout
+        return head if head.startswith("refs/heads/") else ""
+
+    def _remote_tip(self: T) -> str:
+        """Get the commit at the tip of the branch on the origin.
+
+        :returns: The commit, empty if the branch does not exist on the origin
+        """
+        branch = self._remote_branch()
+        push_url = self._resolve_push_url()
+        if not branch or not push_url:
+            return ""
+
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._push_auth(push_url)
+        command_parts.extend(cli_parameters)
+        command_parts.extend(["ls-remote", push_url, branch])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to query the origin for branch: {branch}",
+            remote=push_url,
+            no_log=no_log,
             env=self._env,
         )
         self._run_command(command=command)
+        return command.stdout.partition("\t")[0]
 
     def _commit(self: T) -> None:
         """Perform a commit for the pending push."""
+        if self._unchanged or self._skip_commit:
+            return
+
         command_parts = list(self._base_command)
         message = self._task.args["commit"]["message"].format(play_name=self._play_name)
         message = message.replace("'", '"')
+        command_parts.extend(self._identity)
         command_parts.extend(["commit", "--allow-empty", "-m", message])
         command = Command(
             command_parts=command_parts,
@@ -219,9 +492,13 @@ class ActionModule(GitBase):
 
     def _tag(self: T) -> None:
         """Create a tag object."""
+        if self._unchanged:
+            return
+
         command_parts = list(self._base_command)
         message = self._task.args["tag"].get("message")
         annotate = self._task.args["tag"]["annotation"]
+        command_parts.extend(self._identity)
         command_parts.extend(["tag", "-a", annotate])
         if message:
             message = message.replace("'", '"')
@@ -233,42 +510,60 @@ class ActionModule(GitBase):
         )
         self._run_command(command=command)
 
-    def _push(self: T) -> None:
-        """Push the commit to the origin."""
-        command_parts = list(self._base_command)
-        command_parts.extend(["remote", "-v"])
-        command = Command(
-            command_parts=command_parts,
-            fail_msg="Failed to get remote",
-            env=self._env,
-        )
+    def _resolve_push_url(self: T) -> str:
+        """Resolve the URL used to push to the origin.
 
-        self._run_command(command=command)
-        try:
-            push_line = next(
-                line for line in command.stdout_lines if "push" in line and "origin" in line
-            )
-        except StopIteration:
+        :returns: The URL, empty and the task failed if the origin is not configured
+        """
+        if self._push_url:
+            return self._push_url
+
+        config = self._config
+        push_url = config.get("remote.origin.pushurl") or config.get("remote.origin.url", "")
+        if push_url and any(key.startswith("url.") for key in self._config):
+            # The URL is rewritten by the configuration, let git resolve it
+            push_url = self._get_push_url()
+        if not push_url:
             self._result.failed = True
             self._result.msg = "Failed to find the origin remote"
-            return
+        self._push_url = push_url
+        return push_url
 
+    def _push_auth(self: T, push_url: str) -> Tuple[List[str], Dict[str, str]]:
+        """Build the authentication parameters for commands contacting the origin.
+
+        :param push_url: The URL used to push to the origin
+        :returns: The cli parameters and the values to remove from the log
+        """
         token = self._task.args.get("token")
-        no_log = {}
-        command_parts = list(self._base_command)
+        if token is None or "https" not in push_url:
+            return [], {}
+        token_base64, cli_parameters = self._git_auth_header(token)
+        return cli_parameters, {token_base64: "<TOKEN>"}
+
+    def _push(self: T) -> None:
+        """Push the commit to the origin."""
+        if self._unchanged:
+            return
 
-        if token is not None and "https" in push_line:
-            token_base64, command_parameters = self._git_auth_header(token)
-            command_parts.extend(command_parameters)
-            no_log[token_base64] = "<TOKEN>"
+        push_url = self._resolve_push_url()
+        if not push_url:
+            return
 
-        tag = self._task.args.get("tag")
-        command_parts.extend(["push", "origin", "HEAD"])
-        if tag:
-            command_parts.extend(["--tags"])
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._push_auth(push_url)
+        command_parts.extend(cli_parameters)
+
+        refspecs = self._push_refspecs()
+        command_parts.append("push")
+        if len(refspecs) > 1:
+            # The branch and tag are updated together or not at all
+            command_parts.append("--atomic")
+        command_parts.extend(["origin", *refspecs])
         command = Command(
             command_parts=command_parts,
             fail_msg="Failed to perform the push",
+            remote=push_url,
             no_log=no_log,
             env=self._env,
         )
@@ -278,13 +573,64 @@ class ActionModule(GitBase):
                 line for line in command.stderr.split("remote:") if "https" in line
             ).strip()
 
+    def _remote_branch(self: T) -> str:
+        """Get the branch on the origin the commit is pushed to.
+
+        :returns: The full name of the branch, empty if not named and HEAD is detached
+        """
+        remote_branch = self._task.args["remote_branch"]
+        if remote_branch:
+            return f"refs/heads/{remote_branch.removeprefix('refs/heads/')}"
+        return self._current_branch()
+
+    def _push_refspecs(self: T) -> List[str]:
+        """Build the refspecs for the push, the branch and the tag created by the task.
+
+        :returns: The refspecs
+        """
+        branch = self._remote_branch()
+        # A detached HEAD can only be pushed to a named branch, git reports the failure
+        refspecs = [f"HEAD:{branch}" if branch else "HEAD"]
+        tag = self._task.args.get("tag")
+        if tag:
+            name = f"refs/tags/{tag['annotation']}"
+            refspecs.append(f"{name}:{name}")
+        return refspecs
+
+    def _get_push_url(self: T) -> str:
+        """Get the URL used to push to the origin using git.
+
+        :returns: The URL, empty if the origin is not configured
+        """
+        command_parts = list(self._base_command)
+        command_parts.extend(["remote", "get-url", "--push", "origin"])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg="Failed to get remote",
+            env=self._env,
+        )
+        self._run_command(command=command, ignore_errors=True)
+        return command.stdout if command.return_code == 0 else ""
+
     def _remove_repo(self: T) -> None:
         """Remove the temporary directory."""
         if not self._task.args["remove"]:
             return
 
+        path = self._task.args["path"]
+        deferred = self._task.args["deferred_removal"]
+        directory = deferred["directory"]
+        if deferred["enabled"] and not directory:
+            # Shared by every task of the user, beside the temporary clones, so the limit applies
+            with suppress(OSError):
+                directory = str(Path(user_temporary_directory(), "trash"))
+        if deferred["enabled"] and directory:
+            trash = Trash(directory=directory, max_entries=deferred["max_entries"])
+            if trash.discard(path):
+                return
+
         try:
-            shutil.rmtree(self._task.args["path"])
+            shutil.rmtree(path)
         except OSError:
             self._result.failed = True
             self._result.msg = "Failed to remove repository"
@@ -305,21 +651,44 @@ class ActionModule(GitBase):
         self._task.diff = False
         super().run(task_vars=task_vars)
 
+        if not self._task.args.get("paths"):
+            return self._run_pipeline()
+
+        self._check_argspec()
+        common = {
+            key: value
+            for key, value in self._task.args.items()
+            if key not in ("max_workers", "paths")
+        }
+        return self._run_batch(
+            batch=[{**common, "path": path} for path in self._task.args["paths"]],
+            max_workers=self._task.args["max_workers"],
+            noun="repositories",
+            task_vars=task_vars,
+        )
+
+    def _run_pipeline(self: T) -> Dict[str, JSONTypes]:
+        """Publish a single repository.
+
+        :returns: The result
+        """
         try:
             self._check_argspec()
             if self._result.failed:
-                return asdict(self._result)
+                return self._result.asdict
 
             self._prepare_ssh_environment()
 
             self._path_to_repo = self._task.args["path"]
-            self._base_command = ("git", "-C", self._path_to_repo)
+            self._git = ("git", *self._performance_options(), *self._ssh_config())
+            self._base_command = (*self._git, "-C", self._path_to_repo)
             self._timeout = self._task.args["timeout"]
 
             steps = [
-                self._configure_git_user_name,
-                self._configure_git_user_email,
+                self._read_config,
                 self._add,
+                self._count_staged,
+                self._detect_changes,
                 self._commit,
             ]
             if self._task.args.get("tag"):
@@ -327,10 +696,9 @@ class ActionModule(GitBase):
 
             steps.extend([self._push, self._remove_repo])
 
-            for step in steps:
-                step()
-                if self._result.failed:
-                    return asdict(self._result)
+            self._run_steps(chain(steps))
+            if self._result.failed:
+                return self._result.asdict
 
             if self._result.pr_url and self._task.args["open_browser"]:
                 webbrowser.open(self._result.pr_url, new=2)
@@ -338,5 +706,10 @@ class ActionModule(GitBase):
         finally:
             self._cleanup_ssh_key()
 
+        if self._unchanged:
+            self._result.changed = False
+            self._result.msg = f"No changes to publish from: {self._path_to_repo}"
+            return self._result.asdict
+
         self._result.msg = f"Successfully published local changes from: {self._path_to_repo}"
-        return asdict(self._result)
+        return self._result.asdict
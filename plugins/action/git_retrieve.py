@@ -2,17 +2,21 @@
 # GNU General Public License v3.0+
 # (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 """The git_retrieve action plugin."""
+# pylint: disable=too-many-lines
 
 from __future__ import absolute_import, division, print_function
 
 import datetime
+import fnmatch
 import os
 import re
+import shutil
 import tempfile
 
-from dataclasses import asdict, dataclass, field
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, TypeVar, Union
+from typing import Dict, List, Optional, Set, Tuple, TypeVar, Union
 
 from ansible.errors import AnsibleActionFail
 from ansible.parsing.dataloader import DataLoader
@@ -27,9 +31,12 @@ from ansible_collections.ansible.utils.plugins.module_utils.common.argspec_valid
     AnsibleArgSpecValidator,
 )
 
+from ..module_utils.git_metadata import GitMetadata, GitMetadataError
 from ..modules.git_retrieve import DOCUMENTATION
 from ..plugin_utils.command import Command
 from ..plugin_utils.git_base import ActionInit, GitBase, ResultBase
+from ..plugin_utils.mirror_cache import MirrorCache, directory_size, normalize_url
+from ..plugin_utils.step_graph import Step, chain
 
 
 # pylint: disable=invalid-name
@@ -37,17 +44,23 @@ __metaclass__ = type
 # pylint: enable=invalid-name
 
 # mypy disallow you from omitting parameters in generic types
-JSONTypes = Union[bool, int, str, Dict, List]  # type:ignore
+JSONTypes = Union[bool, float, int, str, Dict, List]  # type:ignore
 
+FILTER_ALIASES = {"blobless": "blob:none", "treeless": "tree:0"}
+FILTER_SPEC = re.compile(r"^(blobless|treeless|blob:none|blob:limit=\d+[kmg]?|tree:\d+)$")
 
+
+# pylint: disable=too-many-instance-attributes
 @dataclass(frozen=False)
 class Result(ResultBase):
     """Data structure for the task result."""
 
     branch_name: str = ""
     branches: List[str] = field(default_factory=list)
+    mirror: Dict[str, Union[bool, int, str]] = field(default_factory=dict)
     name: str = ""
     path: str = ""
+    updated: bool = False
 
 
 T = TypeVar("T", bound="ActionModule")  # pylint: disable=invalid-name, useless-suppression
@@ -91,8 +104,15 @@ class ActionModule(GitBase):
         )
 
         self._base_command: Tuple[str, ...]
-        self._branches: List[str]
+        self._branch_retrieved: bool = False
         self._branch_name: str
+        self._branch_on_origin: bool = False
+        self._exit_stack = ExitStack()
+        self._mirror_cache: Optional[MirrorCache] = None
+        self._mirror_path: Optional[str] = None
+        self._upstream_staging: Optional[str] = None
+        self._upstream_configured: bool = False
+        self._updated: bool = False
         self._parent_directory: str
         self._repo_path: str
         self._play_name: str = ""
@@ -100,6 +120,7 @@ class ActionModule(GitBase):
         self._result: Result = Result()
         self._temp_ssh_key_path: Optional[str] = None
         self._ssh_command_str: str = "ssh"
+        self._ssh_multiplexing_options: List[str] = []
 
     def _check_argspec(self: T) -> None:
         """Check the argspec for the action plugin.
@@ -114,6 +135,22 @@ class ActionModule(GitBase):
         valid, errors, self._task.args = aav.validate()
         if not valid:
             raise AnsibleActionFail(errors)
+        if self._task.args["max_workers"] < 1:
+            msg = f"Parameter `max_workers` must be 1 or more: {self._task.args['max_workers']}"
+            raise AnsibleActionFail(msg)
+        max_per_host = self._task.args["remote_concurrency"]["max_per_host"]
+        if max_per_host is not None and max_per_host < 1:
+            msg = f"Parameter `remote_concurrency.max_per_host` must be 1 or more: {max_per_host}"
+            raise AnsibleActionFail(msg)
+        if self._task.args["repositories"]:
+            if self._task.args["origin"]:
+                msg = "Parameters `origin` and `repositories` are mutually exclusive."
+                raise AnsibleActionFail(msg)
+            # each entry is validated when it is retrieved
+            return
+        if not self._task.args["origin"]:
+            msg = "One of the parameters `origin` or `repositories` is required."
+            raise AnsibleActionFail(msg)
         # ansible provides an empty sting if the parent is used
         if self._task.args["origin"].get("token") == "":
             err = "Origin token can not be an empty string"
@@ -121,19 +158,53 @@ class ActionModule(GitBase):
         if self._task.args["upstream"].get("token") == "":
             err = "Upstream token can not be an empty string"
             raise AnsibleActionFail(err)
-        origin_args = self._task.args.get("origin", {})
+        self._check_origin_args()
+
+    def _check_origin_args(self: T) -> None:
+        """Check the combination of origin arguments.
+
+        :raises AnsibleActionFail: If the origin arguments are invalid
+        """
+        origin_args = self._task.args["origin"]
         if origin_args.get("ssh_key_file") and origin_args.get("ssh_key_content"):
             msg = (
                 "Parameters `origin.ssh_key_file` and `origin.ssh_key_content`"
                 " are mutually exclusive."
             )
             raise AnsibleActionFail(msg)
+        filter_spec = origin_args.get("filter")
+        if filter_spec and not FILTER_SPEC.match(filter_spec):
+            msg = (
+                f"Invalid origin filter '{filter_spec}', expected blobless, treeless,"
+                " blob:none, blob:limit=<size> or tree:<depth>"
+            )
+            raise AnsibleActionFail(msg)
+        if origin_args["depth"] < 0:
+            msg = f"Parameter `origin.depth` must be 0 or a positive number: {origin_args['depth']}"
+            raise AnsibleActionFail(msg)
+        commit = origin_args.get("commit")
+        if commit and (origin_args.get("tag") or origin_args.get("branch")):
+            msg = (
+                "Parameter `origin.commit` is mutually exclusive with"
+                " `origin.tag` and `origin.branch`."
+            )
+            raise AnsibleActionFail(msg)
+        if commit and not re.match(r"^([0-9a-f]{40}|[0-9a-f]{64})$", commit):
+            msg = f"Parameter `origin.commit` must be a full commit SHA: {commit}"
+            raise AnsibleActionFail(msg)
+        return_branches = self._task.args["return_branches"]
+        if not isinstance(return_branches, (bool, str)) or return_branches == "":
+            msg = "Parameter `return_branches` must be true, false or a pattern"
+            raise AnsibleActionFail(msg)
 
     def _prepare_ssh_environment(self: T) -> None:
         """Prepare the environment for SSH key authentication."""
         origin_args = self._task.args.get("origin", {})
         key_content = origin_args.get("ssh_key_content")
         key_file = origin_args.get("ssh_key_file")
+        self._ssh_multiplexing_options = self._ssh_multiplexing(
+            identity=key_content or key_file or "",
+        )
 
         if not key_content and not key_file:
             return
@@ -162,7 +233,7 @@ class ActionModule(GitBase):
 
         :returns: True if the branch exists
         """
-        return self._branch_name in self._branches
+        return self._branch_retrieved or self._branch_on_origin
 
     def _host_key_checking(self: T) -> None:
         """Configure host key checking."""
@@ -188,8 +259,11 @@ class ActionModule(GitBase):
         )
         self._run_command(command=command)
 
-    def _clone(self: T) -> None:
-        """Clone the repository, creating a new subdirectory."""
+    def _origin_env(self: T) -> Optional[Dict[str, str]]:
+        """Build the environment for commands interacting with the origin.
+
+        :returns: The environment or None if the default is sufficient
+        """
         origin = self._task.args["origin"]["url"]
         upstream = self._task.args["upstream"].get("url") or ""
         has_ssh_url = origin.startswith("git") or upstream.startswith("git")
@@ -199,37 +273,353 @@ class ActionModule(GitBase):
         if host_key_checking != "system" and has_ssh_url:
             final_ssh_command += f" -o StrictHostKeyChecking={host_key_checking}"
 
-        env = {"GIT_SSH_COMMAND": final_ssh_command} if final_ssh_command != "ssh" else None
+        if final_ssh_command == "ssh":
+            return None
+        return {"GIT_SSH_COMMAND": " ".join([final_ssh_command, *self._ssh_multiplexing_options])}
 
-        command_parts = list(self._base_command)
+    def _ssh_config(self: T, outside_clone: bool = False) -> Tuple[str, ...]:
+        """Build the ssh command for commands run without the origin environment.
 
-        no_log = {}
-        token = self._task.args["origin"].get("token")
-        if token is not None and "https" in origin:
-            token_base64, cli_parameters = self._git_auth_header(token=token)
-            command_parts.extend(cli_parameters)
-            no_log[token_base64] = "<TOKEN>"
+        The environment is not changed so the ssh agent remains available.
 
-        tag = self._task.args["origin"].get("tag")
-        command_parts.extend(
-            ["clone", "--depth=1", "--progress"],
+        :param outside_clone: For a command that does not read the host key
+            checking configured in the clone
+        :returns: The cli parameters, empty unless ssh multiplexing is enabled
+            or host key checking is not configured in the clone
+        """
+        host_key_checking = self._task.args["host_key_checking"]
+        if not self._ssh_multiplexing_options and (
+            not outside_clone or host_key_checking == "system"
+        ):
+            return ()
+        ssh_command = ["ssh", *self._ssh_multiplexing_options]
+        if host_key_checking != "system":
+            ssh_command.insert(1, f"-o StrictHostKeyChecking={host_key_checking}")
+        return ("-c", f"core.sshCommand={' '.join(ssh_command)}")
+
+    def _origin_auth(self: T, scoped: bool = False) -> Tuple[List[str], Dict[str, str]]:
+        """Build the authentication parameters for commands interacting with the origin.
+
+        :param scoped: Limit the authorization header to requests for the origin
+        :returns: The cli parameters and the values to remove from the log
+        """
+        origin = self._task.args["origin"]["url"]
+        token = self._task.args["origin"].get("token")
+        if token is None or "https" not in origin:
+            return [], {}
+        token_base64, cli_parameters = self._git_auth_header(
+            token=token,
+            url=origin if scoped else "",
         )
-        if tag:
+        return cli_parameters, {token_base64: "<TOKEN>"}
+
+    def _promisor_auth(self: T) -> Tuple[List[str], Dict[str, str]]:
+        """Build the authentication parameters for local commands in a partial clone.
+
+        Commands populating the working tree of a partial clone fetch missing
+        objects from the origin on demand.
+
+        :returns: The cli parameters and the values to remove from the log
+        """
+        if not self._task.args["origin"].get("filter"):
+            return [], {}
+        return self._origin_auth(scoped=True)
+
+    def _refresh_mirror(self: T) -> None:
+        """Create or incrementally update the cached mirror of the origin."""
+        if self._mirror_cache is None:
+            return
+
+        origin = self._task.args["origin"]["url"]
+        mirror_path = self._mirror_cache.path(origin)
+        lock = self._exit_stack.enter_context(self._mirror_cache.lock(origin))
+        try:
+            self._update_mirror(mirror_path)
+        finally:
+            # Other forks may read a refreshed mirror, or refresh it themselves otherwise
+            if self._mirror_path:
+                lock.downgrade()
+            else:
+                lock.release()
+
+    def _update_mirror(self: T, mirror_path: str) -> None:
+        """Fetch into the mirror of the origin, or create it, while holding its lock.
+
+        :param mirror_path: The path to the mirror
+        """
+        origin = self._task.args["origin"]["url"]
+        hit = Path(mirror_path).is_dir()
+        bytes_saved = directory_size(mirror_path) if hit else 0
+
+        cli_parameters, no_log = self._origin_auth()
+        command_parts = [*self._git, *cli_parameters]
+        if not self._task.args["mirror_cache"]["dissociate"]:
+            # Clones borrow objects from the mirror, they must not be pruned
+            command_parts.extend(["-c", "gc.auto=0", "-c", "maintenance.auto=false"])
+        if hit:
             command_parts.extend(
-                ["--branch", tag],
+                [
+                    "-C",
+                    mirror_path,
+                    "fetch",
+                    "--prune",
+                    "--tags",
+                    "--progress",
+                    origin,
+                    "+refs/heads/*:refs/heads/*",
+                ],
             )
         else:
-            command_parts.extend(
+            command_parts.extend(["clone", "--bare", "--progress", origin, mirror_path])
+
+        command = Command(
+            command_parts=command_parts,
+            env=self._origin_env(),
+            fail_msg=f"Failed to refresh the mirror of: {origin}",
+            remote=origin,
+            no_log=no_log,
+        )
+        # A mirror that can not be refreshed is bypassed, the clone will report any real failure
+        self._run_command(command=command, ignore_errors=True)
+        if command.return_code != 0:
+            if not hit:
+                shutil.rmtree(mirror_path, ignore_errors=True)
+            self._result.mirror = {"hit": False, "path": mirror_path, "bytes_saved": 0}
+            return
+
+        self._mirror_path = mirror_path
+        self._result.mirror = {"hit": hit, "path": mirror_path, "bytes_saved": bytes_saved}
+
+    def _evict_mirrors(self: T) -> None:
+        """Evict mirrors exceeding the age or size limits of the cache."""
+        if self._mirror_cache is None:
+            return
+
+        evicted = self._mirror_cache.evict(keep=self._task.args["origin"]["url"])
+        self._result.mirror["evicted"] = len(evicted)
+
+    @property
+    def _targeted(self: T) -> bool:
+        """Return True if only the requested ref is retrieved from the origin.
+
+        :returns: True if remote branches are not all available locally
+        """
+        origin = self._task.args["origin"]
+        return bool(origin["single_branch"] or origin.get("tag") or origin.get("commit"))
+
+    def _history_options(self: T) -> List[str]:
+        """Build the options limiting the history transferred from the origin.
+
+        :returns: The cli options for a clone or fetch
+        """
+        origin = self._task.args["origin"]
+        options = []
+        # Also limited when cloning from a mirror, a dissociated clone copies the history it has
+        if origin.get("shallow_since"):
+            options.append(f"--shallow-since={origin['shallow_since']}")
+        elif origin["depth"]:
+            options.append(f"--depth={origin['depth']}")
+        filter_spec = origin.get("filter")
+        if filter_spec:
+            options.append(f"--filter={FILTER_ALIASES.get(filter_spec, filter_spec)}")
+        if not origin["tags"]:
+            options.append("--no-tags")
+        return options
+
+    def _set_repo_path(self: T, repo_name: str) -> None:
+        """Record the location of the retrieved repository.
+
+        :param repo_name: The name of the repository directory
+        """
+        self._result.name = repo_name
+        self._repo_path = self._parent_directory + "/" + repo_name  # Reconstruct the full path
+        self._result.path = self._repo_path
+        self._base_command = (*self._git, "-C", self._repo_path)
+
+    @property
+    def _repo_name(self: T) -> str:
+        """Return the directory name git derives from the origin URL.
+
+        :returns: The name of the repository directory
+        """
+        origin = self._task.args["origin"]["url"]
+        return re.sub(r"(/?\.git)?/*$", "", origin).rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+
+    def _read_origin_config(self: T, path: str) -> Tuple[str, List[str]]:
+        """Read the origin URL and fetch refspecs of an existing clone.
+
+        :param path: The path to the existing clone
+        :returns: The origin URL and the refspecs, the URL is empty if not configured
+        """
+        try:
+            config = GitMetadata(path).config()
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            variables: Dict[str, List[str]] = {}
+
+            def parse(line: str) -> None:
+                key, _, value = line.partition(" ")
+                variables.setdefault(key, []).append(value)
+
+            command = Command(
+                command_parts=[*self._git, "-C", path, "config", "--get-regexp", r"^remote\."],
+                fail_msg="Failed to read the git configuration.",
+                stdout_callback=parse,
+            )
+            self._run_command(command=command, ignore_errors=True)
+        else:
+            variables = config.variables
+        self._upstream_configured = "remote.upstream.url" in variables
+        url = variables.get("remote.origin.url", [""])[-1]
+        return url, variables.get("remote.origin.fetch", [])
+
+    @staticmethod
+    def _operation_in_progress(path: str) -> str:
+        """Return the operation interrupted in an existing clone.
+
+        :param path: The path to the existing clone
+        :returns: The name of the operation, empty if none is in progress
+        """
+        try:
+            git_dir = GitMetadata(path).git_dir
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            git_dir = Path(path, ".git")
+        operations = {
+            "rebase-merge": "rebase",
+            "rebase-apply": "rebase",
+            "MERGE_HEAD": "merge",
+            "CHERRY_PICK_HEAD": "cherry-pick",
+            "REVERT_HEAD": "revert",
+        }
+        return next((name for file, name in operations.items() if (git_dir / file).exists()), "")
+
+    def _existing_clone_error(self: T, path: str, url: str) -> str:
+        """Check an existing clone may be refreshed in place.
+
+        :param path: The path to the existing clone
+        :param url: The origin URL of the existing clone
+        :returns: Why the clone can not be refreshed, empty if it can
+        """
+        if not url:
+            return "has no origin remote"
+        if normalize_url(url) != normalize_url(self._task.args["origin"]["url"]):
+            return f"has a different origin: {url}"
+        in_progress = self._operation_in_progress(path)
+        if in_progress:
+            return f"has a {in_progress} in progress"
+        return ""
+
+    def _update(self: T) -> None:
+        """Refresh an existing clone of the origin in place of a new clone.
+
+        Only new objects are fetched, local changes and untracked files are
+        discarded. The task fails, leaving the directory in place, if it is
+        not a clone of the origin, an operation such as a rebase is in progress
+        or the fetch fails. A clone of the origin that can not be cleaned is
+        removed and cloned again.
+        """
+        if not self._task.args["update"]:
+            return
+
+        origin = self._task.args["origin"]
+        path = Path(self._parent_directory, self._repo_name)
+        if not (path / ".git").exists():
+            return
+
+        url, refspecs = self._read_origin_config(str(path))
+        error = self._existing_clone_error(str(path), url)
+        if error:
+            self._result.failed = True
+            self._result.msg = f"Existing repository {path} {error}"
+            return
+
+        if origin.get("commit"):
+            refspecs = [origin["commit"]]
+        if origin.get("tag"):
+            refspecs.append(f"+refs/tags/{origin['tag']}:refs/tags/{origin['tag']}")
+        for branch in (origin.get("branch"), self._branch_on_origin and self._branch_name):
+            if branch:
+                refspecs.append(f"+refs/heads/{branch}:refs/remotes/origin/{branch}")
+
+        cli_parameters, no_log = self._origin_auth()
+        fetch = [*cli_parameters, "fetch", "--prune", "--progress", *self._history_options()]
+        command = Command(
+            command_parts=[*self._git, "-C", str(path), *fetch, "origin", *refspecs],
+            env=self._origin_env(),
+            fail_msg=f"Failed to fetch from origin: {origin['url']}",
+            remote=origin["url"],
+            no_log=no_log,
+        )
+        # A failed fetch may be transient, the existing clone is kept
+        self._run_command(command=command)
+        if self._result.failed:
+            return
+
+        command = Command(
+            command_parts=[*self._git, "-C", str(path), "clean", "-ffdx", "--quiet"],
+            fail_msg=f"Failed to clean the working tree: {path}",
+        )
+        self._run_command(command=command, ignore_errors=True)
+        if command.return_code == 0:
+            self._set_repo_path(self._repo_name)
+            self._updated = self._result.updated = True
+            return
+
+        # A clone of the origin that can not be cleaned is replaced
+        self._upstream_configured = False
+        shutil.rmtree(path)
+
+    def _clone_options(self: T) -> List[str]:
+        """Build the options for the clone.
+
+        :returns: The cli options for the clone
+        """
+        tag = self._task.args["origin"].get("tag")
+        branch = self._task.args["origin"].get("branch")
+        options = []
+        if self._mirror_path:
+            options.extend(["--reference", self._mirror_path])
+            if self._task.args["mirror_cache"]["dissociate"]:
+                options.append("--dissociate")
+        if self._task.args["origin"].get("sparse_paths"):
+            options.append("--sparse")
+        if tag or branch:
+            options.extend(
+                ["--branch", tag or branch],
+            )
+        if self._task.args["origin"]["single_branch"]:
+            options.append("--single-branch")
+        elif not tag:
+            options.extend(
                 ["--no-single-branch"],
             )
+        return options
+
+    def _clone(self: T) -> None:
+        """Clone the repository, creating a new subdirectory."""
+        if self._updated:
+            return
+
+        if self._task.args["origin"].get("commit"):
+            self._fetch_commit()
+            return
+
+        origin = self._task.args["origin"]["url"]
+        command_parts = list(self._base_command)
+
+        cli_parameters, no_log = self._origin_auth()
+        command_parts.extend(cli_parameters)
+
+        command_parts.extend(["clone", *self._history_options(), "--progress"])
+        command_parts.extend(self._clone_options())
 
         # Clone WITHOUT specifying a destination, which creates a new subdirectory.
         command_parts.extend([origin])
 
         command = Command(
             command_parts=command_parts,
-            env=env,
+            env=self._origin_env(),
             fail_msg=f"Failed to clone repository: {origin}",
+            remote=origin,
             no_log=no_log,
         )
         self._run_command(command=command)
@@ -245,34 +635,158 @@ class ActionModule(GitBase):
             self._result.msg = "Could not determine repository name from clone output."
             return
 
-        self._result.name = repo_name
-        self._repo_path = self._parent_directory + "/" + repo_name  # Reconstruct the full path
-        self._result.path = self._repo_path
-        self._base_command = ("git", "-C", self._repo_path)
+        self._set_repo_path(repo_name)
         return
 
+    def _fetch_commit(self: T) -> None:
+        """Retrieve a single commit into a new repository.
+
+        A commit can not be cloned directly, the repository is initialized and
+        only the commit is fetched, most servers allow a fetch by commit SHA.
+        """
+        origin = self._task.args["origin"]["url"]
+        commit = self._task.args["origin"]["commit"]
+        repo_name = self._repo_name
+        if not repo_name:
+            self._result.failed = True
+            self._result.msg = f"Could not determine repository name from origin: {origin}"
+            return
+
+        command_parts = list(self._base_command)
+        command_parts.extend(["init", "--quiet", repo_name])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to initialize repository: {repo_name}",
+        )
+        self._run_command(command=command)
+        if self._result.failed:
+            return
+        self._set_repo_path(repo_name)
+
+        # Borrow objects from the mirror, a dissociated repository fetches the single commit
+        if self._mirror_path and not self._task.args["mirror_cache"]["dissociate"]:
+            alternates = Path(self._repo_path, ".git", "objects", "info", "alternates")
+            alternates.write_text(f"{self._mirror_path}/objects\n", encoding="utf-8")
+
+        command_parts = list(self._base_command)
+        command_parts.extend(["remote", "add", "origin", origin])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to add origin: {origin}",
+        )
+        self._run_command(command=command)
+        if self._result.failed:
+            return
+
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._origin_auth()
+        command_parts.extend(cli_parameters)
+        command_parts.extend(["fetch", "--progress", *self._history_options(), "origin", commit])
+        command = Command(
+            command_parts=command_parts,
+            env=self._origin_env(),
+            fail_msg=f"Failed to fetch commit: {commit}",
+            remote=self._task.args["origin"]["url"],
+            no_log=no_log,
+        )
+        self._run_command(command=command)
+
+    def _sparse_checkout(self: T) -> None:
+        """Restrict the working tree to the sparse paths."""
+        sparse_paths = self._task.args["origin"].get("sparse_paths")
+        if not sparse_paths:
+            return
+
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._promisor_auth()
+        command_parts.extend(cli_parameters)
+        command_parts.extend(["sparse-checkout", "set", "--cone", "--", *sparse_paths])
+        command = Command(
+            command_parts=command_parts,
+            env=self._origin_env(),
+            fail_msg=f"Failed to configure the sparse checkout: {', '.join(sparse_paths)}",
+            no_log=no_log,
+        )
+        self._run_command(command=command)
+
     def _get_branches(self: T) -> None:
-        """Get the branches."""
+        """Get the branches.
+
+        The existence of the new branch is an exact ref query, the branches
+        are only listed if they are returned. The refs are read from disk,
+        git is only used if the repository layout is not supported by the reader.
+        """
+        branch = self._branch_name
+        try:
+            metadata = GitMetadata(self._repo_path)
+            self._branch_retrieved = any(
+                metadata.ref(name) is not None
+                for name in (f"refs/heads/{branch}", f"refs/remotes/origin/{branch}")
+            )
+            if self._task.args["return_branches"] is not False:
+                local = metadata.branches()
+                self._return_branches(local, metadata.branches(remote="origin") - local)
+        except (GitMetadataError, OSError, UnicodeDecodeError):
+            self._list_branches()
+
+    def _return_branches(self: T, local: Set[str], remote: Set[str]) -> None:
+        """Add the branches matching the return_branches pattern to the result.
+
+        :param local: The local branches
+        :param remote: The remote tracking branches without a local branch
+        """
+        pattern = self._task.args["return_branches"]
+        branches = sorted(local) + sorted(remote)
+        if isinstance(pattern, str):
+            branches = [branch for branch in branches if fnmatch.fnmatchcase(branch, pattern)]
+        self._result.branches = branches
+
+    def _list_branches(self: T) -> None:
+        """Get the branches using git."""
+        branch = self._branch_name
+        exact = [f"refs/heads/{branch}", f"refs/remotes/origin/{branch}"]
+        listed = self._task.args["return_branches"] is not False
         command_parts = list(self._base_command)
-        command_parts.extend(["branch", "-a"])
+        command_parts.extend(
+            [
+                "for-each-ref",
+                "--format=%(refname) %(symref)",
+                *(["refs/heads/", "refs/remotes/origin/"] if listed else exact),
+            ],
+        )
         origin = self._task.args["origin"]["url"]
+        local: Set[str] = set()
+        remote: Set[str] = set()
+        found: List[str] = []
+
+        def parse(line: str) -> None:
+            name, _, symref = line.partition(" ")
+            if name in exact:
+                found.append(name)
+            if name.startswith("refs/heads/"):
+                local.add(name.removeprefix("refs/heads/"))
+            # The remote HEAD is a pointer to a branch, not a branch
+            elif name.startswith("refs/remotes/origin/") and not (
+                name == "refs/remotes/origin/HEAD" and symref
+            ):
+                remote.add(name.removeprefix("refs/remotes/origin/"))
+
         command = Command(
             command_parts=command_parts,
             fail_msg=f"Failed to list branches: {origin}",
+            stdout_callback=parse,
         )
         self._run_command(command=command)
 
         if self._result.failed:
             return
 
-        self._branches = []
-        for line in command.stdout_lines:
-            if line.startswith("*"):
-                self._branches.append(line.split()[1])
-            else:
-                self._branches.append(line.split("origin/")[-1])
-        self._result.branches = self._branches
+        self._branch_retrieved = bool(found)
+        if listed:
+            self._return_branches(local, remote - local)
 
+    def _resolve_branch_name(self: T) -> None:
+        """Resolve the name of the new branch."""
         timestamp = (
             datetime.datetime.now(tz=datetime.timezone.utc)
             .astimezone()
@@ -296,32 +810,110 @@ class ActionModule(GitBase):
             timestamp=timestamp,
         )
         self._result.branch_name = self._branch_name
-        return
+
+    def _query_origin_branch(self: T) -> None:
+        """Query the origin for the new branch before anything is transferred.
+
+        A single ref advertisement answers both the duplicate detection and, when
+        not all branches are retrieved, if an existing branch needs to be fetched.
+        """
+        duplicate_detection = self._task.args["branch"]["duplicate_detection"]
+        # An update recreates the branch from the origin, if it exists there
+        if not duplicate_detection and not self._targeted and not self._task.args["update"]:
+            return
+
+        origin = self._task.args["origin"]["url"]
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._origin_auth()
+        command_parts.extend(cli_parameters)
+        command_parts.extend(["ls-remote", "--heads", origin, f"refs/heads/{self._branch_name}"])
+        command = Command(
+            command_parts=command_parts,
+            env=self._origin_env(),
+            fail_msg=f"Failed to query the origin for branch: {self._branch_name}",
+            remote=origin,
+            no_log=no_log,
+        )
+        self._run_command(command=command)
+        self._branch_on_origin = bool(command.stdout_lines)
 
     def _detect_duplicate_branch(self: T) -> None:
         """Detect duplicate branch."""
         duplicate_detection = self._task.args["branch"]["duplicate_detection"]
-        if duplicate_detection and self._branch_exists:
+        if duplicate_detection and self._branch_on_origin:
             self._result.failed = True
             self._result.msg = f"Branch '{self._branch_name}' already exists"
 
+    def _fetch_branch(self: T) -> None:
+        """Fetch an existing branch that was not retrieved with the clone."""
+        if self._updated or not self._branch_on_origin or self._branch_retrieved:
+            return
+
+        branch = self._branch_name
+        command_parts = list(self._base_command)
+        cli_parameters, no_log = self._origin_auth()
+        command_parts.extend(cli_parameters)
+        command_parts.extend(
+            [
+                "fetch",
+                *self._history_options(),
+                "origin",
+                f"+refs/heads/{branch}:refs/remotes/origin/{branch}",
+            ],
+        )
+        command = Command(
+            command_parts=command_parts,
+            env=self._origin_env(),
+            fail_msg=f"Failed to fetch branch: {branch}",
+            remote=self._task.args["origin"]["url"],
+            no_log=no_log,
+        )
+        self._run_command(command=command)
+
+    def _start_point(self: T) -> List[str]:
+        """Return the name and start point of the new branch.
+
+        :returns: The branch name, followed by the start point if not HEAD
+        """
+        origin = self._task.args["origin"]
+        branch = self._branch_name
+        if self._updated and self._branch_on_origin:
+            return [branch, f"origin/{branch}"]
+        if origin.get("tag"):
+            # A new clone has the tag checked out, an updated clone has the previous branch
+            return (
+                [origin["tag"], f"refs/tags/{origin['tag']}"] if self._updated else [origin["tag"]]
+            )
+        if origin.get("commit"):
+            return [branch, origin["commit"]]
+        if origin.get("branch"):
+            return [branch, f"origin/{origin['branch']}"]
+        return [branch, "origin/HEAD"]
+
     def _switch_checkout(self: T) -> None:
         """Switch to or checkout the branch."""
         command_parts = list(self._base_command)
+        cli_parameters, no_log = self._promisor_auth()
+        command_parts.extend(cli_parameters)
         branch = self._branch_name
 
-        if self._branch_exists:
-            command_parts.extend(["switch", branch])
+        if self._updated:
+            # Local changes and the branch left by a previous run are discarded
+            command_parts.extend(["checkout", "--force", "-B", *self._start_point()])
+        elif self._branch_exists and not self._branch_retrieved:
+            # Fetched outside of the clone refspec, so it can not be guessed by switch
+            command_parts.extend(["switch", "-c", branch, f"origin/{branch}"])
+        elif self._branch_exists:
+            # The upstream may be fetched concurrently, the guess must only consider the origin
+            command_parts.extend(["-c", "checkout.defaultRemote=origin", "switch", branch])
         else:
-            tag = self._task.args["origin"].get("tag")
-            if tag:
-                command_parts.extend(["checkout", "-b", tag])
-            else:
-                command_parts.extend(["checkout", "-b", branch, "origin/HEAD"])
+            command_parts.extend(["checkout", "-b", *self._start_point()])
 
         command = Command(
             command_parts=command_parts,
+            env=self._origin_env() if self._task.args["origin"].get("filter") else None,
             fail_msg=f"Failed to change branches to: {branch}",
+            no_log=no_log,
         )
         self._run_command(command=command)
 
@@ -332,7 +924,9 @@ class ActionModule(GitBase):
 
         command_parts = list(self._base_command)
         upstream = self._task.args["upstream"]["url"]
-        command_parts.extend(["remote", "add", "upstream", upstream])
+        # An updated clone may already have the upstream remote
+        action = "set-url" if self._upstream_configured else "add"
+        command_parts.extend(["remote", action, "upstream", upstream])
         command = Command(
             command_parts=command_parts,
             fail_msg=f"Failed to add upstream: {upstream}",
@@ -340,31 +934,98 @@ class ActionModule(GitBase):
         self._run_command(command=command)
         return
 
-    def _pull_upstream(self: T) -> None:
-        """Pull from upstream."""
-        if not self._task.args["upstream"].get("url"):
-            return
+    def _upstream_auth(self: T, promisor: bool = True) -> Tuple[List[str], Dict[str, str]]:
+        """Build the authentication parameters for commands contacting the upstream.
 
-        command_parts = list(self._base_command)
-        no_log = {}
+        :param promisor: Include the parameters for objects missing from a partial clone
+        :returns: The cli parameters and the values to remove from the log
+        """
+        # Objects missing from a partial clone of the origin may be fetched on demand
+        cli_parameters, no_log = self._promisor_auth() if promisor else ([], {})
         upstream = self._task.args["upstream"]["url"]
         token = self._task.args["upstream"].get("token")
         if token is not None and "https" in upstream:
-            token_base64, cli_parameters = self._git_auth_header(token=token)
-            command_parts.extend(cli_parameters)
+            token_base64, token_parameters = self._git_auth_header(
+                token=token,
+                url=upstream if no_log else "",
+            )
+            cli_parameters.extend(token_parameters)
             no_log[token_base64] = "<TOKEN>"
+        return cli_parameters, no_log
+
+    def _stage_upstream(self: T) -> None:
+        """Fetch the upstream branch into a temporary bare repository while the origin is cloned."""
+        upstream = self._task.args["upstream"]
+        if not upstream.get("url") or not upstream["concurrent_fetch"]:
+            return
 
+        self._upstream_staging = tempfile.mkdtemp(prefix="ansible-scm-upstream-")
+        self._exit_stack.callback(shutil.rmtree, self._upstream_staging, ignore_errors=True)
+        # Not run in the clone, so the host key checking configured there does not apply
+        command_parts = ["git", *self._performance_options(), *self._ssh_config(outside_clone=True)]
+        cli_parameters, no_log = self._upstream_auth(promisor=False)
+        command_parts.extend(cli_parameters)
+        command_parts.extend(["clone", "--bare", "--single-branch", "--no-tags", "--progress"])
+        command_parts.extend(["--branch", upstream["branch"]])
+        if self._mirror_path:
+            # Only objects missing from the origin mirror are transferred from the upstream
+            command_parts.extend(["--reference", self._mirror_path])
+        command_parts.extend([upstream["url"], self._upstream_staging])
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to fetch upstream branch: {upstream['branch']}",
+            remote=upstream["url"],
+            no_log=no_log,
+        )
+        self._run_command(command=command)
+
+    def _fetch_upstream(self: T) -> None:
+        """Fetch the upstream branch, from the temporary repository if already staged."""
+        if not self._task.args["upstream"].get("url"):
+            return
+
+        command_parts = list(self._base_command)
+        staging = self._upstream_staging
+        # A staged branch is fetched locally, only objects missing from the clone are copied
+        cli_parameters, no_log = self._promisor_auth() if staging else self._upstream_auth()
+        command_parts.extend(cli_parameters)
         branch = self._task.args["upstream"]["branch"]
+        # Automatic maintenance could repack refs while the checkout runs concurrently
+        command_parts.extend(["-c", "gc.auto=0", "-c", "maintenance.auto=false"])
+        command_parts.extend(
+            [
+                "fetch",
+                "--no-tags",
+                staging or "upstream",
+                f"+refs/heads/{branch}:refs/remotes/upstream/{branch}",
+            ],
+        )
+        command = Command(
+            command_parts=command_parts,
+            fail_msg=f"Failed to fetch upstream branch: {branch}",
+            remote="" if staging else self._task.args["upstream"]["url"],
+            no_log=no_log,
+        )
+        self._run_command(command=command)
 
-        command_parts.extend(["pull", "upstream", branch, "--rebase"])
+    def _rebase_upstream(self: T) -> None:
+        """Rebase on the fetched upstream branch, without contacting the upstream."""
+        if not self._task.args["upstream"].get("url"):
+            return
 
+        command_parts = list(self._base_command)
+        # The rebase may fetch objects missing from a partial clone of the origin
+        cli_parameters, no_log = self._promisor_auth()
+        command_parts.extend(cli_parameters)
+        branch = self._task.args["upstream"]["branch"]
+        command_parts.extend(["rebase", f"refs/remotes/upstream/{branch}"])
         command = Command(
             command_parts=command_parts,
+            env=self._origin_env() if self._task.args["origin"].get("filter") else None,
             fail_msg=f"Failed to pull upstream branch: {branch}",
             no_log=no_log,
         )
         self._run_command(command=command)
-        return
 
     def run(
         self: T,
@@ -382,10 +1043,37 @@ class ActionModule(GitBase):
         self._task.diff = False
         super().run(task_vars=task_vars)
 
+        if not self._task.args.get("repositories"):
+            return self._run_pipeline()
+
+        self._check_argspec()
+        common = {
+            key: value
+            for key, value in self._task.args.items()
+            if key not in ("max_workers", "repositories")
+        }
+        batch = []
+        for entry in self._task.args["repositories"]:
+            if "repositories" in entry or "max_workers" in entry:
+                msg = "Parameters `repositories` and `max_workers` are not valid in an entry."
+                raise AnsibleActionFail(msg)
+            batch.append(self._merge_args(common, entry))
+        return self._run_batch(
+            batch=batch,
+            max_workers=self._task.args["max_workers"],
+            noun="repositories",
+            task_vars=task_vars,
+        )
+
+    def _run_pipeline(self: T) -> Dict[str, JSONTypes]:
+        """Retrieve a single repository.
+
+        :returns: The result
+        """
         try:
             self._check_argspec()
             if self._result.failed:
-                return asdict(self._result)
+                return self._result.asdict
 
             self._prepare_ssh_environment()
 
@@ -395,25 +1083,56 @@ class ActionModule(GitBase):
             if not os.path.exists(self._parent_directory):
                 os.makedirs(self._parent_directory)
 
-            self._base_command = ("git", "-C", self._parent_directory)
+            self._git = ("git", *self._performance_options(), *self._ssh_config())
+            self._base_command = (*self._git, "-C", self._parent_directory)
             self._timeout = self._task.args["timeout"]
 
+            mirror_cache = self._task.args["mirror_cache"]
+            if mirror_cache["enabled"]:
+                self._mirror_cache = MirrorCache(
+                    directory=mirror_cache["directory"],
+                    max_age=mirror_cache["max_age"] * 60 * 60,
+                    max_size=mirror_cache["max_size"] * 1024 * 1024,
+                )
+
+            clone_steps = chain(
+                [
+                    self._resolve_branch_name,
+                    self._query_origin_branch,
+                    self._detect_duplicate_branch,
+                    self._refresh_mirror,
+                    self._update,
+                    self._clone,
+                    # Steps writing the repository configuration run one at a time
+                    self._host_key_checking,
+                    self._sparse_checkout,
+                    self._add_upstream_remote,
+                ],
+            )
+            # A partial clone fetches lazily during the checkout, not alongside the upstream fetch
+            lazy_fetch = (self._fetch_upstream,) if self._task.args["origin"]["filter"] else ()
             steps = (
-                self._clone,
-                self._host_key_checking,
-                self._get_branches,
-                self._detect_duplicate_branch,
-                self._switch_checkout,
-                self._add_upstream_remote,
-                self._pull_upstream,
+                *clone_steps,
+                # Overlaps with the clone when the upstream is fetched concurrently
+                Step(self._stage_upstream, after=(self._refresh_mirror,)),
+                Step(self._get_branches, after=(self._clone,)),
+                # Only fetched if the branch was not found in the clone
+                Step(self._fetch_branch, after=(self._add_upstream_remote, self._get_branches)),
+                Step(self._fetch_upstream, after=(self._fetch_branch, self._stage_upstream)),
+                Step(
+                    self._switch_checkout,
+                    after=(self._get_branches, self._fetch_branch, *lazy_fetch),
+                ),
+                Step(self._rebase_upstream, after=(self._switch_checkout, self._fetch_upstream)),
+                Step(self._evict_mirrors, after=(self._rebase_upstream,)),
             )
 
-            for step in steps:
-                step()
-                if self._result.failed:
-                    return asdict(self._result)
+            self._run_steps(steps)
+            if self._result.failed:
+                return self._result.asdict
         finally:
+            self._exit_stack.close()
             self._cleanup_ssh_key()
 
         self._result.msg = f"Successfully retrieved repository: {self._task.args['origin']['url']}"
-        return asdict(self._result)
+        return self._result.asdict
@@ -0,0 +1,383 @@
+# Copyright 2022 Red Hat
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""The git_file lookup plugin."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import re
+import tempfile
+
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple, TypeVar
+
+from ansible.errors import AnsibleLookupError
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.lookup import LookupBase
+
+from ..plugin_utils.command import Command
+from ..plugin_utils.file_cache import FileCache
+
+
+DOCUMENTATION = """
+name: git_file
+short_description: Read files from a distant repository without retrieving it
+version_added: "3.3.0"
+description:
+  - Read the content of one or more files in a distant repository at a branch, tag or commit
+  - >-
+    Only the commit and its trees are fetched, without history or the content of other files,
+    then the content of every file requested is fetched in a single batch
+  - >-
+    The content is cached on the controller, keyed by the repository, commit and path, so
+    later lookups of a file at the same commit, from any host or play, do not contact the origin
+  - >-
+    The origin is only queried for the commit of the ref, unless it was resolved
+    within 'ref_max_age' seconds
+options:
+  _terms:
+    description:
+      - The paths of the files, relative to the root of the repository
+    required: true
+    type: list
+    elements: str
+  url:
+    description:
+      - The URL of the repository
+      - Authentication uses the git credential helpers and ssh configuration of the controller
+    required: true
+    type: str
+  ref:
+    description:
+      - The branch, tag or full commit SHA to read the files at
+    default: HEAD
+    type: str
+  ref_max_age:
+    description:
+      - >-
+        The number of seconds the commit of a branch or tag is reused before
+        the origin is queried again
+      - A value of 0 queries the origin on every lookup
+    default: 0
+    type: int
+  cache_directory:
+    description:
+      - The directory where the content of the files is cached
+      - If the directory does not exist, it will be created
+    default: '~/.cache/ansible_scm/files'
+    type: str
+  cache_max_age:
+    description:
+      - Evict the content of files not used within this many hours
+      - A value of 0 disables age based eviction
+    default: 24
+    type: int
+  cache_max_size:
+    description:
+      - Evict the least recently used content once the cache exceeds this many megabytes
+      - A value of 0 disables size based eviction
+    default: 100
+    type: int
+  timeout:
+    description:
+      - The timeout in seconds for each command issued
+    default: 30
+    type: int
+notes:
+  - >-
+    The origin must support partial clone filters, otherwise the content of every file
+    at the commit is transferred, although only the files requested are cached
+  - Symbolic links and submodules can not be read
+author:
+- Ansible Network Community (ansible-network)
+"""
+
+EXAMPLES = r"""
+- name: Read files from a distant repository
+  hosts: all
+  gather_facts: false
+  tasks:
+    - name: Read the site configuration from the main branch
+      ansible.builtin.set_fact:
+        site: "{{ lookup('ansible.scm.git_file', 'sites/defaults.yml', url=origin) | from_yaml }}"
+      vars:
+        origin: https://github.com/ansible-network/scm_testing.git
+
+    - name: Read several files at a release tag in a single fetch
+      ansible.builtin.set_fact:
+        configs: "{{ query('ansible.scm.git_file', *paths, url=origin, ref='v1.0.0') }}"
+      vars:
+        origin: https://github.com/ansible-network/scm_testing.git
+        paths:
+          - configs/network/core.yml
+          - configs/network/edge.yml
+
+    - name: Query the origin for the commit of the branch at most once a minute
+      ansible.builtin.debug:
+        msg: "{{ lookup('ansible.scm.git_file', 'README.md', url=origin, ref_max_age=60) }}"
+      vars:
+        origin: git@github.com:ansible-network/scm_testing.git
+"""
+
+RETURN = """
+_raw:
+  description:
+    - The content of each file, in the order of the paths
+  type: list
+  elements: str
+"""
+
+T = TypeVar("T", bound="LookupModule")  # pylint: disable=invalid-name, useless-suppression
+
+COMMIT = re.compile(r"^([0-9a-f]{40}|[0-9a-f]{64})$")
+
+# The modes of the files that can be read, symbolic links and submodules are not
+REGULAR_FILES = ("100644", "100755")
+
+
+def _normalize_path(term: str) -> str:
+    """Normalize the path of a file in the repository.
+
+    :param term: The path, relative to the root of the repository
+    :raises AnsibleLookupError: If the path leaves the repository
+    :return: The path without a leading slash or redundant components
+    """
+    parts = [part for part in PurePosixPath(term).parts if part not in ("/", ".")]
+    if not parts or ".." in parts:
+        msg = f"Invalid path in the repository: {term}"
+        raise AnsibleLookupError(msg)
+    return "/".join(parts)
+
+
+def _preferred_ref(ref: str) -> Tuple[str, ...]:
+    """Return the refs advertised by the origin that a ref may name, preferred first.
+
+    :param ref: The ref, such as ``main``, ``v1.0.0`` or ``refs/heads/main``
+    :return: The full names of the refs, a peeled tag is preferred to the tag
+    """
+    if ref == "HEAD" or ref.startswith("refs/"):
+        return (f"{ref}^{{}}", ref)
+    return (f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}")
+
+
+class LookupModule(LookupBase):  # type: ignore[misc] # parent has type Any
+    """The git_file lookup plugin."""
+
+    def run(
+        self: T,
+        terms: List[str],
+        variables: Optional[Dict[str, object]] = None,
+        **kwargs: object,
+    ) -> List[str]:
+        """Read the content of files in a distant repository.
+
+        :param terms: The paths of the files
+        :param variables: The variables available to the lookup
+        :param kwargs: The options of the lookup
+        :return: The content of each file
+        """
+        self.set_options(var_options=variables, direct=kwargs)
+        url = self.get_option("url")
+        paths = [_normalize_path(term) for term in terms]
+        cache = FileCache(
+            directory=self.get_option("cache_directory"),
+            max_age=self.get_option("cache_max_age") * 60 * 60,
+            max_size=self.get_option("cache_max_size") * 1024 * 1024,
+        )
+
+        commit = self._resolve(cache, url, self.get_option("ref"))
+        contents = {path: cache.get(url, commit, path) for path in dict.fromkeys(paths)}
+        missing = [path for path, content in contents.items() if content is None]
+        if missing:
+            contents.update(self._fetch(cache, url, commit, missing))
+            cache.evict()
+        return [to_text(contents[path], errors="surrogate_or_strict") for path in paths]
+
+    def _run_command(self: T, command: Command) -> Command:
+        """Run a command, raising an error if it fails.
+
+        :param command: The command
+        :raises AnsibleLookupError: If the command fails
+        :return: The command, once run
+        """
+        command.run(timeout=self.get_option("timeout"))
+        if command.return_code:
+            msg = f"{command.fail_msg}: {command.stderr}"
+            raise AnsibleLookupError(msg)
+        return command
+
+    def _resolve(self: T, cache: FileCache, url: str, ref: str) -> str:
+        """Resolve a ref to a commit, querying the origin if it was not resolved recently.
+
+        :param cache: The file cache
+        :param url: The repository URL
+        :param ref: The branch, tag or commit
+        :raises AnsibleLookupError: If the origin has no such ref
+        :return: The commit
+        """
+        if COMMIT.match(ref):
+            return ref
+        commit = cache.commit(url, ref, max_age=self.get_option("ref_max_age"))
+        if commit:
+            return commit
+
+        advertised: Dict[str, str] = {}
+
+        def parse(line: str) -> None:
+            target, _, name = line.partition("\t")
+            advertised[name] = target
+
+        command = Command(
+            command_parts=["git", "ls-remote", url, ref],
+            fail_msg=f"Failed to query the origin for ref: {ref}",
+            stdout_callback=parse,
+            remote=url,
+        )
+        self._run_command(command)
+        commit = next(
+            (advertised[name] for name in _preferred_ref(ref) if name in advertised),
+            "",
+        )
+        if not commit:
+            msg = f"Ref '{ref}' not found in repository: {url}"
+            raise AnsibleLookupError(msg)
+        cache.remember(url, ref, commit)
+        return commit
+
+    def _list_objects(
+        self: T,
+        git: List[str],
+        url: str,
+        commit: str,
+        paths: List[str],
+    ) -> List[str]:
+        """List the objects of files at a commit, checking each is a regular file.
+
+        :param git: The git command of the temporary repository
+        :param url: The repository URL
+        :param commit: The commit
+        :param paths: The paths of the files
+        :raises AnsibleLookupError: If a path is not a regular file at the commit
+        :return: The object of each file
+        """
+        entries: Dict[str, List[str]] = {}
+
+        def parse(line: str) -> None:
+            details, _, path = line.partition("\t")
+            # The mode, type and object of the path
+            entries[path] = details.split()
+
+        self._run_command(
+            Command(
+                command_parts=[*git, "ls-tree", "--full-tree", commit, "--", *paths],
+                fail_msg=f"Failed to list files at commit: {commit}",
+                stdout_callback=parse,
+            ),
+        )
+        for path in paths:
+            if path not in entries:
+                msg = f"File '{path}' not found in repository {url} at commit: {commit}"
+                raise AnsibleLookupError(msg)
+            if entries[path][0] not in REGULAR_FILES:
+                msg = f"Path '{path}' in repository {url} is not a regular file"
+                raise AnsibleLookupError(msg)
+        return [entries[path][2] for path in paths]
+
+    def _fetch(
+        self: T,
+        cache: FileCache,
+        url: str,
+        commit: str,
+        paths: List[str],
+    ) -> Dict[str, bytes]:
+        """Fetch the content of files at a commit into the cache.
+
+        The commit and its trees are fetched into a temporary repository
+        without the content of any file, then the content of every file
+        requested is fetched in a single request and checked out.
+
+        :param cache: The file cache
+        :param url: The repository URL
+        :param commit: The commit
+        :param paths: The paths of the files
+        :return: The content of each file
+        """
+        with tempfile.TemporaryDirectory(prefix=".fetch-", dir=cache.directory) as temporary:
+            git_dir, work_tree = str(Path(temporary, "repository")), Path(temporary, "files")
+            work_tree.mkdir()
+            git = ["git", "--literal-pathspecs", "-c", "core.quotePath=false", "-C", git_dir]
+            self._run_command(
+                Command(
+                    command_parts=["git", "init", "--quiet", "--bare", git_dir],
+                    fail_msg="Failed to create a temporary repository",
+                ),
+            )
+            self._run_command(
+                Command(
+                    command_parts=[*git, "remote", "add", "origin", url],
+                    fail_msg=f"Failed to add the origin: {url}",
+                ),
+            )
+            self._run_command(
+                Command(
+                    command_parts=[
+                        *git,
+                        "fetch",
+                        "--quiet",
+                        "--depth=1",
+                        "--filter=blob:none",
+                        "--no-tags",
+                        "origin",
+                        commit,
+                    ],
+                    fail_msg=f"Failed to fetch commit: {commit}",
+                    remote=url,
+                ),
+            )
+
+            objects = self._list_objects(git, url, commit, paths)
+            # The checkout of paths would fetch each missing object separately
+            self._run_command(
+                Command(
+                    command_parts=[
+                        *git,
+                        "-c",
+                        "fetch.negotiationAlgorithm=noop",
+                        "fetch",
+                        "--quiet",
+                        "--no-tags",
+                        "--no-write-fetch-head",
+                        "--recurse-submodules=no",
+                        "--filter=blob:none",
+                        "--stdin",
+                        "origin",
+                    ],
+                    fail_msg=f"Failed to fetch files at commit: {commit}",
+                    stdin="".join(f"{obj}\n" for obj in objects).encode(),
+                    remote=url,
+                ),
+            )
+            self._run_command(
+                Command(
+                    command_parts=[
+                        *git,
+                        "-c",
+                        "core.autocrlf=false",
+                        f"--work-tree={work_tree}",
+                        "checkout",
+                        commit,
+                        "--",
+                        *paths,
+                    ],
+                    fail_msg=f"Failed to check out files at commit: {commit}",
+                ),
+            )
+            contents = {path: (work_tree / path).read_bytes() for path in paths}
+        for path, content in contents.items():
+            cache.put(url, commit, path, content)
+        return contents
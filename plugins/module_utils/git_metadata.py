@@ -0,0 +1,331 @@
+"""Read git repository metadata directly from disk.
+
+Refs, HEAD and configuration are read without running git. Layouts the
+reader does not understand raise ``GitMetadataError`` so the caller can
+fall back to running git.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+import re
+import shutil
+import sys
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+
+T = TypeVar("T", bound="GitMetadata")  # pylint: disable=invalid-name, useless-suppression
+U = TypeVar("U", bound="GitConfig")  # pylint: disable=invalid-name, useless-suppression
+
+SECTION = re.compile(r'^\[\s*([\w.-]+)\s*(?:"((?:[^"\\]|\\.)*)")?\s*\](.*)$')
+KEY = re.compile(r"^([A-Za-z][\w-]*)\s*(=?)(.*)$")
+ESCAPES = {"n": "\n", "t": "\t", "b": "\b", '"': '"', "\\": "\\"}
+BOOLEANS = {"true": True, "yes": True, "on": True, "false": False, "no": False, "off": False}
+INTEGER = re.compile(r"^[-+]?(\d+)[kmg]?$", re.IGNORECASE)
+
+
+class GitMetadataError(Exception):
+    """The repository metadata can not be read without git."""
+
+
+def _parse_value(value: str, lines: Iterator[str]) -> str:
+    """Parse a configuration value, following continuation lines.
+
+    :param value: The text following the equals sign
+    :param lines: The remaining lines of the file, for continuations
+    :raises GitMetadataError: If the value is malformed
+    :return: The value
+    """
+    result: List[str] = []
+    pending = ""
+    quoted = False
+    chars = iter(value.strip())
+    while True:
+        char = next(chars, None)
+        if char is None:
+            break
+        if char == "\\":
+            escaped = next(chars, None)
+            if escaped is None:
+                # A trailing backslash continues the value on the next line
+                chars = iter(next(lines, ""))
+                continue
+            if escaped not in ESCAPES:
+                msg = f"Invalid escape in configuration value: \\{escaped}"
+                raise GitMetadataError(msg)
+            result.extend([pending, ESCAPES[escaped]])
+            pending = ""
+        elif char == '"':
+            quoted = not quoted
+        elif char in "#;" and not quoted:
+            break
+        elif char.isspace() and not quoted:
+            pending += char
+        else:
+            result.extend([pending, char])
+            pending = ""
+    if quoted:
+        msg = "Unterminated quote in configuration value"
+        raise GitMetadataError(msg)
+    return "".join(result)
+
+
+def parse_config(text: str) -> List[Tuple[str, str]]:
+    """Parse the text of a git configuration file.
+
+    Section and variable names are lower cased, subsection names are
+    case sensitive. A variable without a value is true.
+
+    :param text: The content of the configuration file
+    :raises GitMetadataError: If the file is malformed or includes other files
+    :return: The key and value of each variable, in the order of the file
+    """
+    entries: List[Tuple[str, str]] = []
+    section = ""
+    lines = iter(text.splitlines())
+    for raw_line in lines:
+        line = raw_line.strip()
+        if line.startswith("["):
+            match = SECTION.match(line)
+            if not match:
+                msg = f"Invalid configuration section: {line}"
+                raise GitMetadataError(msg)
+            name, subsection, line = match.groups()
+            if subsection is None:
+                # The deprecated [section.subsection] form is case insensitive
+                section = name.lower()
+            else:
+                subsection = re.sub(r"\\(.)", r"\1", subsection)
+                section = f"{name.lower()}.{subsection}"
+            if section.startswith(("include", "includeif")):
+                msg = "Configuration includes are not supported"
+                raise GitMetadataError(msg)
+            line = line.strip()
+        if not line or line.startswith(("#", ";")):
+            continue
+        match = KEY.match(line)
+        if not match or not section:
+            msg = f"Invalid configuration line: {line}"
+            raise GitMetadataError(msg)
+        key, equals, value = match.groups()
+        value = _parse_value(value, lines) if equals else "true"
+        entries.append((f"{section}.{key.lower()}", value))
+    return entries
+
+
+def parse_bool(value: str) -> bool:
+    """Parse a boolean configuration value the way git does.
+
+    The literals are case insensitive, an empty value is false and an integer
+    is true unless it is zero. ``parse_config`` returns ``true`` for a
+    variable without a value.
+
+    :param value: The value
+    :raises GitMetadataError: If git would not accept the value as a boolean
+    :return: The boolean
+    """
+    lowered = value.lower()
+    if not lowered:
+        return False
+    if lowered in BOOLEANS:
+        return BOOLEANS[lowered]
+    match = INTEGER.match(lowered)
+    if not match:
+        msg = f"Invalid boolean configuration value: {value}"
+        raise GitMetadataError(msg)
+    return int(match.group(1)) != 0
+
+
+def system_config_path() -> Path:
+    """Locate the system configuration of the git found on the PATH.
+
+    git reads ``etc/gitconfig`` beneath its installation prefix, or
+    ``/etc/gitconfig`` when installed in ``/usr``. The prefix is only trusted
+    if it holds the git data directory, a wrapper script elsewhere does not.
+
+    :raises GitMetadataError: If the installation prefix can not be determined
+    :return: The path to the system configuration
+    """
+    executable = shutil.which("git")
+    if not executable:
+        msg = "git was not found"
+        raise GitMetadataError(msg)
+    # Not resolved, package managers link git into the prefix it was configured with
+    directory = Path(executable).parent
+    prefix = directory.parent
+    # The git of macOS is a shim for the git of the developer tools
+    shim = sys.platform == "darwin" and directory == Path("/usr/bin")
+    if directory.name != "bin" or shim or not (prefix / "share" / "git-core").is_dir():
+        msg = f"The installation prefix of git is unknown: {executable}"
+        raise GitMetadataError(msg)
+    return Path("/etc/gitconfig") if prefix == Path("/usr") else prefix / "etc" / "gitconfig"
+
+
+@dataclass(frozen=False)
+class GitConfig:
+    """The merged configuration of a repository, later values take precedence."""
+
+    variables: Dict[str, List[str]] = field(default_factory=dict)
+
+    def update(self: U, entries: List[Tuple[str, str]]) -> None:
+        """Add the variables of a configuration file.
+
+        :param entries: The key and value of each variable
+        """
+        for key, value in entries:
+            self.variables.setdefault(key, []).append(value)
+
+    def get(self: U, key: str) -> Optional[str]:
+        """Return the last value of a variable, as ``git config --get`` would.
+
+        :param key: The variable, with lower cased section and name
+        :return: The value, if set
+        """
+        values = self.variables.get(key)
+        return values[-1] if values else None
+
+
+@dataclass(frozen=False)
+class GitMetadata:
+    """The metadata of the repository checked out at ``path``."""
+
+    path: str
+    git_dir: Path = field(init=False)
+    common_dir: Path = field(init=False)
+
+    def __post_init__(self: T) -> None:
+        """Locate the git directory.
+
+        :raises GitMetadataError: If the layout is not supported
+        """
+        dot_git = Path(self.path, ".git")
+        if dot_git.is_file():
+            # A linked worktree or submodule, the refs may be shared with another directory
+            content = dot_git.read_text(encoding="utf-8").strip()
+            if not content.startswith("gitdir: "):
+                msg = f"Unsupported .git file: {dot_git}"
+                raise GitMetadataError(msg)
+            self.git_dir = (dot_git.parent / content.removeprefix("gitdir: ")).resolve()
+        elif dot_git.is_dir():
+            self.git_dir = dot_git
+        else:
+            msg = f"Not a git repository: {self.path}"
+            raise GitMetadataError(msg)
+        common_dir = self.git_dir / "commondir"
+        if common_dir.is_file():
+            relative = common_dir.read_text(encoding="utf-8").strip()
+            self.common_dir = (self.git_dir / relative).resolve()
+        else:
+            self.common_dir = self.git_dir
+        if (self.common_dir / "reftable").exists():
+            msg = "The reftable ref storage is not supported"
+            raise GitMetadataError(msg)
+
+    def head(self: T) -> str:
+        """Return the content of HEAD.
+
+        :return: The ref, such as ``refs/heads/main``, or a commit when detached
+        """
+        content = (self.git_dir / "HEAD").read_text(encoding="utf-8").strip()
+        return content.removeprefix("ref: ")
+
+    def refs(self: T, prefix: str) -> Dict[str, str]:
+        """Return the refs beneath a prefix from packed-refs and the loose refs.
+
+        :param prefix: The prefix, such as ``refs/heads/``
+        :return: The target of each ref, a commit or ``ref: <name>`` if symbolic
+        """
+        refs: Dict[str, str] = {}
+        packed = self.common_dir / "packed-refs"
+        if packed.is_file():
+            for line in packed.read_text(encoding="utf-8").splitlines():
+                # Skip the header and peeled tag lines
+                if line.startswith(("#", "^")):
+                    continue
+                target, _, name = line.partition(" ")
+                if name.startswith(prefix):
+                    refs[name] = target
+        loose = self.common_dir / prefix
+        if loose.is_dir():
+            for path in loose.rglob("*"):
+                if path.is_dir() or path.name.endswith(".lock"):
+                    continue
+                name = path.relative_to(self.common_dir).as_posix()
+                try:
+                    refs[name] = path.read_text(encoding="utf-8").strip()
+                except FileNotFoundError:
+                    # Removed by a concurrent git process, such as pack-refs
+                    continue
+        return refs
+
+    def ref(self: T, name: str) -> Optional[str]:
+        """Return the target of a single ref, without reading every ref.
+
+        :param name: The full name of the ref, such as ``refs/heads/main``
+        :return: The target of the ref, None if it does not exist
+        """
+        loose = self.common_dir / name
+        if loose.is_file():
+            try:
+                return loose.read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                # Packed by a concurrent git process
+                pass
+        packed = self.common_dir / "packed-refs"
+        if not packed.is_file():
+            return None
+        suffix = f" {name}"
+        with packed.open(encoding="utf-8") as lines:
+            for line in lines:
+                entry = line.rstrip("\n")
+                if entry.endswith(suffix) and not entry.startswith(("#", "^")):
+                    return entry.partition(" ")[0]
+        return None
+
+    def branches(self: T, remote: str = "") -> Set[str]:
+        """Return the names of the local or remote tracking branches.
+
+        :param remote: The remote, local branches are returned if not provided
+        :return: The branch names, without the remote name
+        """
+        prefix = f"refs/remotes/{remote}/" if remote else "refs/heads/"
+        return {
+            name.removeprefix(prefix)
+            for name, target in self.refs(prefix).items()
+            # The remote HEAD is a pointer to a branch, not a branch
+            if not (remote and name == f"{prefix}HEAD" and target.startswith("ref: "))
+        }
+
+    def config(self: T) -> GitConfig:
+        """Return the system, global and repository configuration.
+
+        :raises GitMetadataError: If the configuration is changed by the environment,
+            the system configuration can not be located or is not understood
+        :return: The merged configuration
+        """
+        if any(name.startswith(("GIT_CONFIG", "GIT_DIR")) for name in os.environ):
+            msg = "The git configuration is changed by the environment"
+            raise GitMetadataError(msg)
+        config = GitConfig()
+        xdg = Path(os.environ.get("XDG_CONFIG_HOME") or Path("~/.config").expanduser())
+        paths = [
+            system_config_path(),
+            xdg / "git" / "config",
+            Path("~/.gitconfig").expanduser(),
+            self.common_dir / "config",
+        ]
+        for path in paths:
+            if path.is_file():
+                config.update(parse_config(path.read_text(encoding="utf-8")))
+        if parse_bool(config.get("extensions.worktreeconfig") or "false"):
+            msg = "Per worktree configuration is not supported"
+            raise GitMetadataError(msg)
+        return config
@@ -28,26 +28,252 @@ options:
           - The commit message
         default: 'Updates made by ansible with play: {play_name}'
         type: str
+  compare_remote:
+    description:
+      - When skipping unchanged publishes, compare the staged files with the tip of the branch on the origin
+      - The branch is the remote branch, or the current branch if not provided
+      - >-
+        If they match, nothing is published. If they only match the last commit, the commit is
+        skipped and commits not yet on the origin are pushed
+      - The origin is queried for the branch, nothing is transferred
+    default: false
+    type: bool
+  deferred_removal:
+    description:
+      - Details about removing the local copy of the repository in the background
+      - >-
+        When enabled, the repository is renamed into a trash directory and removed by a
+        detached process, so the task returns as soon as the push completes
+      - If the repository can not be renamed into the trash directory, it is removed before the task returns
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Remove the repository in the background
+        default: false
+        type: bool
+      directory:
+        description:
+          - The trash directory, which must be on the same filesystem as the repository
+          - >-
+            If not provided, a directory named 'trash' in the directory 'ansible_scm-<uid>'
+            of the temporary directory is shared by every task of the user
+          - >-
+            The trash directory is not used, and the repository is removed before the task
+            returns, unless it is a directory only the user has access to, not a symbolic link
+        type: str
+      max_entries:
+        description:
+          - >-
+            The number of repositories that may be waiting in the trash, once reached the
+            oldest are removed in the background along with the repository
+          - A value of 0 disables the limit
+        default: 16
+        type: int
+  exclude:
+    description:
+      - A list of files or git pathspecs to exclude from the files included in the commit
+      - A directory excludes all of the files beneath it
+    default: []
+    elements: str
+    type: list
   include:
     description:
       - A list of files to include (add) in the commit
+      - Each entry is a git pathspec, wildcards such as '*.cfg' match files in any directory
+      - Prefix an entry with ':(glob)' to match with shell glob rules, such as ':(glob)configs/**/*.cfg'
+      - Use '--all' to include all changes in the working tree
+      - The list is passed to git on standard input, so it may contain any number of files
+      - Files listed individually are written to the index directly rather than matched as pathspecs
     default: ['--all']
     elements: str
     type: list
+  max_workers:
+    description:
+      - The number of repositories published concurrently when a list of paths is provided
+      - Must be 1 or more
+    default: 4
+    type: int
   open_browser:
     description:
       - Open the default browser to the pull-request page
     default: false
     type: bool
+  output_max_bytes:
+    description:
+      - The maximum size in bytes of the command output lines in the result, across every command of the task
+      - Once reached, the earlier lines of a command are replaced with a count of the lines omitted
+      - A value of 0 disables the limit
+    default: 0
+    type: int
+  output_verbosity:
+    description:
+      - The detail of each command in the 'output' of the result
+      - none, commands are not added to the output, their timings are still returned
+      - summary, the command and return code, without the lines of output
+      - tail, the last 20 lines of standard output and standard error
+      - full, every line of output retained
+    default: full
+    choices: [none, summary, tail, full]
+    type: str
   path:
     description:
       - The path to the repository
-    required: true
+      - Required unless a list of paths is provided
+  paths:
+    description:
+      - Publish several repositories concurrently, rather than the single path
+      - The other options are used for each of the repositories
+      - A failure to publish one repository does not prevent the others from being published
+      - The results are returned in the same order as the paths
+    type: list
+    elements: str
+  performance:
+    description:
+      - Git configuration tuning for large repositories, applied to each git command of the task
+      - The repository configuration is not changed
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Apply the tuning
+        default: false
+        type: bool
+      checkout_workers:
+        description:
+          - The number of parallel workers used to populate the working tree, as 'checkout.workers'
+          - A value of 0 uses the number of CPUs available to the controller process
+        default: 0
+        type: int
+      compression:
+        description:
+          - The zlib compression level, from -1 to 9, for objects and packs, as 'core.compression'
+          - A lower level trades network transfer for less CPU time
+          - If not provided, the git default is used
+        type: int
+      http_post_buffer:
+        description:
+          - The size in bytes of the buffer used to send data to the remote over http, as 'http.postBuffer'
+          - A value of 0 uses the git default
+        default: 0
+        type: int
+      pack_threads:
+        description:
+          - The number of threads used to search for deltas when packing objects, as 'pack.threads'
+          - A value of 0 uses the number of CPUs available to the controller process
+        default: 0
+        type: int
+      protocol_version:
+        description:
+          - The wire protocol version, as 'protocol.version'
+          - Version 2 only transfers the refs requested, rather than every ref of the remote
+        default: 2
+        choices: [0, 1, 2]
+        type: int
+  remote_branch:
+    description:
+      - The name of the branch on the origin to push the commit to
+      - If not provided, the commit is pushed to a branch with the name of the current branch
+      - Only the branch and the tag created by the task are pushed, together in a single atomic push
+    type: str
+  remote_concurrency:
+    description:
+      - Limit the commands contacting each remote host, across every fork on the controller
+      - >-
+        Clone, fetch, ls-remote and push commands wait until fewer than 'max_per_host' commands
+        are contacting the same host, the time waited is returned as 'queue_wait'
+      - The limit is shared with file locks, by all tasks using the same directory
+    default: {}
+    type: dict
+    suboptions:
+      max_per_host:
+        description:
+          - The maximum number of commands contacting a remote host at once, 1 or more
+          - If not provided, the commands are not limited
+          - >-
+            A command waits for at most 'timeout' seconds, the task fails if a
+            command contacting the host has not completed by then
+        type: int
+      directory:
+        description:
+          - The directory for the lock files
+          - >-
+            If not provided, a directory in 'XDG_RUNTIME_DIR' is used if set, otherwise a
+            directory for the user in the temporary directory
+          - The task fails unless the directory is only accessible by the user and is not a symbolic link
+        type: str
   remove:
     description:
       - Remove the local copy of the repository if the push is successful
+      - See 'deferred_removal' to remove it in the background
     default: true
     type: bool
+  retries:
+    description:
+      - Run commands that contact a remote again after a transient error
+      - >-
+        Errors such as an HTTP 429 or 5xx response, a reset connection or a failed name
+        resolution are retried, other errors and timeouts are not
+      - Errors reporting any other 4xx response, such as a failed authentication, are never retried
+      - Each attempt is added to the output with the attempt number and the delay before the next attempt
+    default: {}
+    type: dict
+    suboptions:
+      attempts:
+        description:
+          - The maximum number of times a command is run, a value of 1 disables retries
+        default: 1
+        type: int
+      delay:
+        description:
+          - >-
+            The limit in seconds of the delay before the first retry, doubled for each further retry,
+            the delay is chosen at random up to the limit
+        default: 1.0
+        type: float
+      max_delay:
+        description:
+          - The maximum limit in seconds of the delay before a retry
+        default: 30.0
+        type: float
+      budget:
+        description:
+          - The number of seconds after the first attempt beyond which no retry is started
+          - A value of 0 disables the budget
+        default: 0
+        type: float
+  ssh_multiplexing:
+    description:
+      - Share one ssh connection per remote host and ssh key between git commands, across tasks and forks
+      - >-
+        The first command to a host starts a master connection which later commands use
+        instead of connecting and authenticating again, until it has been idle for 'persist' seconds
+      - Commands fall back to a new connection if the master can not be used
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Share ssh connections
+        default: false
+        type: bool
+      persist:
+        description:
+          - The number of seconds the master connection is kept open once no command is using it
+        default: 60
+        type: int
+      directory:
+        description:
+          - The directory for the connection sockets, the path of a socket is limited to 104 characters
+          - >-
+            If not provided, a directory in 'XDG_RUNTIME_DIR' is used if set, otherwise a
+            directory for the user in the temporary directory
+          - >-
+            Connections are not shared unless the directory is only accessible by the user
+            and is not a symbolic link
+        type: str
   timeout:
     description:
       - The timeout in seconds for each command issued
@@ -61,6 +287,12 @@ options:
         interacting with the origin repository
       - Will only be used for https based connections
     type: str
+  trace_file:
+    description:
+      - Append a JSON record with the timing of each step and command to this file
+      - The timings are also returned in the task result
+      - If not provided, the ANSIBLE_SCM_TRACE_FILE environment variable is used
+    type: str
   tag:
     description:
       - Specify the tag details associated with the commit.
@@ -76,6 +308,7 @@ options:
     description:
       - Details for the user to be used for the commit
       - Will only be used if not already configured
+      - Provided to the commit and tag commands, the repository configuration is not changed
     default: {}
     type: dict
     suboptions:
@@ -87,6 +320,12 @@ options:
         description: The email of the user
         default: 'ansible@localhost'
         type: str
+  skip_unchanged:
+    description:
+      - Skip the commit, tag and push if the staged files do not differ from the last commit
+      - The task reports no change when nothing is published
+    default: false
+    type: bool
   ssh_key_file:
     description:
       - Path to the SSH private key file to use for authentication with git.
@@ -137,13 +376,16 @@ EXAMPLES = r"""
 # TASK [Publish the changes] **********************************************************************
 # changed: [localhost] => {
 #     "changed": true,
+#     "files_staged": 1,
 #     "msg": "Successfully published local changes from: /tmp/tmpvtm6_ejo/scm_testing",
 #     "output": [
 #         {
-#             "command": "git -C /tmp/tmpvtm6_ejo/scm_testing add --all",
+#             "command": "git -C /tmp/tmpvtm6_ejo/scm_testing add --verbose --all",
 #             "return_code": 0,
 #             "stderr_lines": [],
-#             "stdout_lines": []
+#             "stdout_lines": [
+#                 "add 'details.yaml'"
+#             ]
 #         },
 #         {
 #             "command": "git -C /tmp/tmpvtm6_ejo/scm_testing commit --allow-empty -m 'Updates made by ansible with play: localhost'",
@@ -156,7 +398,7 @@ EXAMPLES = r"""
 #             ]
 #         },
 #         {
-#             "command": "git -C /tmp/tmpvtm6_ejo/scm_testing push origin",
+#             "command": "git -C /tmp/tmpvtm6_ejo/scm_testing push origin HEAD:refs/heads/ansible-localhost-2022-06-05T075705.453080-0700",
 #             "return_code": 0,
 #             "stderr_lines": [
 #                 "remote: ",
@@ -170,6 +412,75 @@ EXAMPLES = r"""
 #         }
 #     ]
 # }
+
+- name: Publish only when the rendered configuration changed
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Skip the commit and push if the files match the branch on the origin
+      ansible.scm.git_publish:
+        path: "{{ repository['path'] }}"
+        skip_unchanged: true
+        compare_remote: true
+
+# {
+#     "changed": false,
+#     "msg": "No changes to publish from: /tmp/tmpvtm6_ejo/scm_testing",
+#     ...
+# }
+
+- name: Publish without waiting for the repository to be removed
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Remove the repository in a detached process once pushed
+      ansible.scm.git_publish:
+        path: "{{ repository['path'] }}"
+        deferred_removal:
+          enabled: true
+
+- name: Publish several repositories
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retrieve the repositories
+      ansible.scm.git_retrieve:
+        repositories:
+          - origin:
+              url: git@github.com:cidrblock/scm_testing.git
+          - origin:
+              url: git@github.com:cidrblock/scm_testing_2.git
+      register: repositories
+
+    - name: Add to the repositories
+      ansible.builtin.copy:
+        src: details.yaml
+        dest: "{{ item.path }}/details.yaml"
+      loop: "{{ repositories.results }}"
+
+    - name: Publish the changes, pushing four repositories at a time
+      ansible.scm.git_publish:
+        max_workers: 4
+        paths: "{{ repositories.results | map(attribute='path') }}"
+
+# {
+#     "changed": true,
+#     "failed": false,
+#     "msg": "Successfully processed 2 repositories",
+#     "results": [
+#         {
+#             "changed": true,
+#             "duration": 2.183,
+#             "failed": false,
+#             "msg": "Successfully published local changes from: /tmp/tmpf2bt0m9x/scm_testing",
+#             "output": [...],
+#             "pr_url": "https://github.com/cidrblock/scm_testing/pull/new/ansible-localhost-2022-06-05T075705.453080-0700",
+#             "user_email": "ansible@localhost",
+#             "user_name": "ansible"
+#         },
+#         ...
+#     ]
+# }
 """
 
 RETURN = r"""
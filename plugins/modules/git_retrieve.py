@@ -32,6 +32,7 @@ options:
         description:
           - Reusing an existing branch can introduce unexpected behavior
           - If set to true, the task will fail if the remote branch already exists
+          - The origin is queried for the branch before the repository is cloned
           - >-
             If set to false and the branch exists the task will use and be updated
             to the existing branch
@@ -52,11 +53,63 @@ options:
       - "yes"
     default: system
     type: str
+  mirror_cache:
+    description:
+      - Details about the controller side mirror cache
+      - >-
+        When enabled, a bare mirror of the origin is kept on the execution node, keyed by
+        the normalized origin URL, and refreshed with an incremental fetch before each clone
+      - The clone uses the mirror as a reference, so only objects missing from the mirror are transferred
+      - Concurrent tasks using the same mirror are serialized with a file lock while it is refreshed
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Use the mirror cache for the clone
+        default: false
+        type: bool
+      directory:
+        description:
+          - The directory where the mirrors are stored
+          - If the directory does not exist, it will be created
+        default: '~/.cache/ansible_scm/mirrors'
+        type: str
+      dissociate:
+        description:
+          - Copy the referenced objects into the clone once it completes
+          - >-
+            The depth or shallow_since of the origin still apply, only the history
+            retrieved is copied from the mirror
+          - >-
+            If set to false the clone borrows objects from the mirror and
+            will be unusable if the mirror is evicted while the clone is still in use,
+            automatic garbage collection of the mirror is then disabled when it is refreshed
+        default: true
+        type: bool
+      max_age:
+        description:
+          - Evict mirrors not used within this many hours
+          - A value of 0 disables age based eviction
+        default: 0
+        type: int
+      max_size:
+        description:
+          - Evict the least recently used mirrors once the cache exceeds this many megabytes
+          - A value of 0 disables size based eviction
+        default: 0
+        type: int
+  max_workers:
+    description:
+      - The number of repositories retrieved concurrently when a list of repositories is provided
+      - Must be 1 or more
+    default: 4
+    type: int
   origin:
     description:
       - Details about the origin
+      - Required unless a list of repositories is provided
     type: dict
-    required: true
     suboptions:
       token:
         description:
@@ -71,6 +124,54 @@ options:
       tag:
         description: Specify the tag
         type: str
+      branch:
+        description:
+          - The branch of the origin used as the base for the new branch
+          - If not provided, the default branch of the origin is used
+        type: str
+      commit:
+        description:
+          - Retrieve exactly this commit SHA, fetching only the commit with a depth of 1
+          - The origin must allow fetching a commit by SHA
+          - Mutually exclusive with tag and branch
+        type: str
+      depth:
+        description:
+          - The number of commits of history to retrieve
+          - A value of 0 retrieves the full history
+        default: 1
+        type: int
+      shallow_since:
+        description:
+          - Retrieve the history after this date instead of a number of commits
+          - Takes precedence over depth
+        type: str
+      single_branch:
+        description:
+          - Retrieve only the base branch rather than the tip of every branch of the origin
+          - When set, an existing branch is detected by querying the origin for the branch name
+        default: false
+        type: bool
+      tags:
+        description:
+          - Retrieve the tags of the origin
+        default: true
+        type: bool
+      filter:
+        description:
+          - Perform a partial clone, deferring the transfer of objects until they are needed
+          - blobless will omit all file contents, they are fetched on demand at checkout
+          - treeless will omit all trees and file contents, they are fetched on demand at checkout
+          - Any other value is passed to git as the filter specification, for example 'blob:limit=1m'
+          - The origin must support partial clones
+        type: str
+      sparse_paths:
+        description:
+          - Only materialize these directories in the working tree, using a cone mode sparse checkout
+          - Files at the root of the repository are always present
+          - Combine with filter to avoid transferring the contents of other directories
+        type: list
+        elements: str
       ssh_key_file:
         description:
           - Path to the SSH private key file to use for authentication with the origin repository.
@@ -83,17 +184,207 @@ options:
           - Used only for SSH-based repository URLs.
         type: str
         no_log: true
+  output_max_bytes:
+    description:
+      - The maximum size in bytes of the command output lines in the result, across every command of the task
+      - Once reached, the earlier lines of a command are replaced with a count of the lines omitted
+      - A value of 0 disables the limit
+    default: 0
+    type: int
+  output_verbosity:
+    description:
+      - The detail of each command in the 'output' of the result
+      - none, commands are not added to the output, their timings are still returned
+      - summary, the command and return code, without the lines of output
+      - tail, the last 20 lines of standard output and standard error
+      - full, every line of output retained
+    default: full
+    choices: [none, summary, tail, full]
+    type: str
   parent_directory:
     description:
       - The local directory where the repository will be placed
       - If the parent directory does not exist, it will be created
     default: '{temporary_directory}'
     type: str
+  performance:
+    description:
+      - Git configuration tuning for large repositories, applied to each git command of the task
+      - The repository configuration is not changed
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Apply the tuning
+        default: false
+        type: bool
+      checkout_workers:
+        description:
+          - The number of parallel workers used to populate the working tree, as 'checkout.workers'
+          - A value of 0 uses the number of CPUs available to the controller process
+        default: 0
+        type: int
+      compression:
+        description:
+          - The zlib compression level, from -1 to 9, for objects and packs, as 'core.compression'
+          - A lower level trades network transfer for less CPU time
+          - If not provided, the git default is used
+        type: int
+      http_post_buffer:
+        description:
+          - The size in bytes of the buffer used to send data to the remote over http, as 'http.postBuffer'
+          - A value of 0 uses the git default
+        default: 0
+        type: int
+      pack_threads:
+        description:
+          - The number of threads used to search for deltas when packing objects, as 'pack.threads'
+          - A value of 0 uses the number of CPUs available to the controller process
+        default: 0
+        type: int
+      protocol_version:
+        description:
+          - The wire protocol version, as 'protocol.version'
+          - Version 2 only transfers the refs requested, rather than every ref of the remote
+        default: 2
+        choices: [0, 1, 2]
+        type: int
+  remote_concurrency:
+    description:
+      - Limit the commands contacting each remote host, across every fork on the controller
+      - >-
+        Clone, fetch, ls-remote and push commands wait until fewer than 'max_per_host' commands
+        are contacting the same host, the time waited is returned as 'queue_wait'
+      - The limit is shared with file locks, by all tasks using the same directory
+    default: {}
+    type: dict
+    suboptions:
+      max_per_host:
+        description:
+          - The maximum number of commands contacting a remote host at once, 1 or more
+          - If not provided, the commands are not limited
+          - >-
+            A command waits for at most 'timeout' seconds, the task fails if a
+            command contacting the host has not completed by then
+        type: int
+      directory:
+        description:
+          - The directory for the lock files
+          - >-
+            If not provided, a directory in 'XDG_RUNTIME_DIR' is used if set, otherwise a
+            directory for the user in the temporary directory
+          - The task fails unless the directory is only accessible by the user and is not a symbolic link
+        type: str
+  repositories:
+    description:
+      - Retrieve several repositories concurrently, rather than the single origin
+      - >-
+        Each entry accepts the same options as the task, origin is required and
+        other options default to the values provided to the task
+      - Dictionary options, such as branch, are merged with the values provided to the task
+      - A failure to retrieve one repository does not prevent the others from being retrieved
+      - The results are returned in the same order as the entries
+    type: list
+    elements: dict
+  retries:
+    description:
+      - Run commands that contact a remote again after a transient error
+      - >-
+        Errors such as an HTTP 429 or 5xx response, a reset connection or a failed name
+        resolution are retried, other errors and timeouts are not
+      - Errors reporting any other 4xx response, such as a failed authentication, are never retried
+      - Each attempt is added to the output with the attempt number and the delay before the next attempt
+    default: {}
+    type: dict
+    suboptions:
+      attempts:
+        description:
+          - The maximum number of times a command is run, a value of 1 disables retries
+        default: 1
+        type: int
+      delay:
+        description:
+          - >-
+            The limit in seconds of the delay before the first retry, doubled for each further retry,
+            the delay is chosen at random up to the limit
+        default: 1.0
+        type: float
+      max_delay:
+        description:
+          - The maximum limit in seconds of the delay before a retry
+        default: 30.0
+        type: float
+      budget:
+        description:
+          - The number of seconds after the first attempt beyond which no retry is started
+          - A value of 0 disables the budget
+        default: 0
+        type: float
+  return_branches:
+    description:
+      - The branches to return in the result, as the 'branches' list
+      - true returns every local and remote tracking branch, false returns none
+      - >-
+        A shell style pattern, such as 'release/*', returns the matching branch names,
+        for repositories with many branches that would otherwise be listed in each result
+      - The existence of the new branch is checked with a query of its refs in every case
+    default: true
+    type: raw
+  ssh_multiplexing:
+    description:
+      - Share one ssh connection per remote host and ssh key between git commands, across tasks and forks
+      - >-
+        The first command to a host starts a master connection which later commands use
+        instead of connecting and authenticating again, until it has been idle for 'persist' seconds
+      - Commands fall back to a new connection if the master can not be used
+    default: {}
+    type: dict
+    suboptions:
+      enabled:
+        description:
+          - Share ssh connections
+        default: false
+        type: bool
+      persist:
+        description:
+          - The number of seconds the master connection is kept open once no command is using it
+        default: 60
+        type: int
+      directory:
+        description:
+          - The directory for the connection sockets, the path of a socket is limited to 104 characters
+          - >-
+            If not provided, a directory in 'XDG_RUNTIME_DIR' is used if set, otherwise a
+            directory for the user in the temporary directory
+          - >-
+            Connections are not shared unless the directory is only accessible by the user
+            and is not a symbolic link
+        type: str
   timeout:
     description:
       - The timeout in seconds for each command issued
     default: 30
     type: int
+  trace_file:
+    description:
+      - Append a JSON record with the timing of each step and command to this file
+      - The timings are also returned in the task result
+      - If not provided, the ANSIBLE_SCM_TRACE_FILE environment variable is used
+    type: str
+  update:
+    description:
+      - Refresh an existing clone of the origin in the parent directory rather than cloning again
+      - >-
+        The origin of the existing clone must match the origin, otherwise the task will fail,
+        as it will if a rebase or merge is in progress or the fetch fails, the directory is left in place
+      - >-
+        Only new objects are fetched, local changes and untracked files are discarded and
+        the branch is recreated from the origin, replacing a branch left by a previous run
+      - If the working tree of a clone of the origin can not be cleaned, it is removed and the origin is cloned again
+      - If the parent directory does not contain a clone of the origin, the origin is cloned
+    default: false
+    type: bool
   upstream:
     description:
       - Details about the upstream
@@ -105,6 +396,19 @@ options:
           - The branch to use for the upstream
         default: main
         type: str
+      concurrent_fetch:
+        description:
+          - >-
+            Fetch the upstream branch into a temporary bare repository while the origin is cloned,
+            rather than after the clone completes
+          - >-
+            The clone then fetches the upstream branch from the temporary repository, so only objects
+            missing from the origin are copied, and is rebased on it without contacting the upstream again
+          - >-
+            When the mirror cache is enabled, the temporary repository borrows objects from the origin mirror,
+            so objects common to the origin and the upstream are not transferred from the upstream
+        default: false
+        type: bool
       token:
         description:
           - The token to use to authenticate to the upstream repository
@@ -207,6 +511,141 @@ EXAMPLES = r"""
 #     ],
 #     "path": "/tmp/tmpvtm6_ejo/scm_testing"
 # }
+
+- name: Retrieve a large repository using a local mirror
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retrieve the repository, transferring only objects missing from the mirror
+      ansible.scm.git_retrieve:
+        origin:
+          url: https://github.com/ansible/ansible.git
+        mirror_cache:
+          enabled: true
+          max_age: 168
+          max_size: 20480
+      register: repository
+
+# "mirror": {
+#     "bytes_saved": 283115520,
+#     "evicted": 0,
+#     "hit": true,
+#     "path": "/home/user/.cache/ansible_scm/mirrors/ansible-6cc3c0e9f3a5f4a1.git"
+# },
+
+- name: Refresh the clone retrieved by the previous run
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Fetch only the changes since the previous run into the existing clone
+      ansible.scm.git_retrieve:
+        origin:
+          url: git@github.com:cidrblock/config_backup.git
+        parent_directory: /var/lib/config_backup
+        branch:
+          name: backup
+          duplicate_detection: false
+        update: true
+      register: repository
+
+- name: Retrieve a repository with a large working tree
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Populate the working tree with a worker per CPU and use less CPU time compressing
+      ansible.scm.git_retrieve:
+        origin:
+          url: https://github.com/ansible/ansible.git
+        performance:
+          enabled: true
+          compression: 1
+      register: repository
+
+- name: Retrieve a single directory of a monorepo
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retrieve only the network configuration, fetching file contents on demand
+      ansible.scm.git_retrieve:
+        origin:
+          url: git@github.com:example/monorepo.git
+          filter: blobless
+          sparse_paths:
+            - configs/network
+      register: repository
+
+- name: Retrieve only what is needed from a repository with many branches
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retrieve the release branch without the other branches or tags
+      ansible.scm.git_retrieve:
+        origin:
+          url: git@github.com:cidrblock/scm_testing.git
+          branch: release
+          single_branch: true
+          tags: false
+        return_branches: "release/*"
+      register: repository
+
+    - name: Retrieve an exact commit
+      ansible.scm.git_retrieve:
+        origin:
+          url: git@github.com:cidrblock/scm_testing.git
+          commit: 6abefd2b1e4f4c9c8f0d8c2b7f1f3a4e5d6c7b8a
+      register: repository
+
+- name: Retrieve from a busy git server
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retry transient errors up to 4 times within 2 minutes
+      ansible.scm.git_retrieve:
+        origin:
+          url: https://github.com/cidrblock/scm_testing.git
+        retries:
+          attempts: 5
+          delay: 2
+          budget: 120
+      register: repository
+
+- name: Retrieve several repositories
+  hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Retrieve the repositories, four at a time
+      ansible.scm.git_retrieve:
+        branch:
+          name: ansible-{play_name}
+        max_workers: 4
+        repositories:
+          - origin:
+              url: git@github.com:cidrblock/scm_testing.git
+          - origin:
+              url: git@github.com:cidrblock/scm_testing_2.git
+            upstream:
+              url: git@github.com:ansible/scm_testing_2.git
+      register: repositories
+
+# {
+#     "changed": true,
+#     "failed": false,
+#     "msg": "Successfully processed 2 repositories",
+#     "results": [
+#         {
+#             "branch_name": "ansible-Retrieve several repositories",
+#             "branches": [...],
+#             "changed": true,
+#             "duration": 4.512,
+#             "failed": false,
+#             "msg": "Successfully retrieved repository: git@github.com:cidrblock/scm_testing.git",
+#             "name": "scm_testing",
+#             "output": [...],
+#             "path": "/tmp/tmpf2bt0m9x/scm_testing"
+#         },
+#         ...
+#     ]
+# }
 """
 RETURN = r"""
 # TO-DO: Enter return values here
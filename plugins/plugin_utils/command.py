@@ -2,7 +2,13 @@
 
 from __future__ import absolute_import, division, print_function
 
+import io
+import os
+import re
 import shlex
+import subprocess
+import threading
+import time
 
 
 # pylint: disable=invalid-name
@@ -10,19 +16,82 @@ __metaclass__ = type
 # pylint: enable=invalid-name
 
 
+from collections import deque
+from contextlib import suppress
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, TypeVar, Union
+from typing import IO, Callable, Deque, Dict, List, Optional, Tuple, TypeVar, Union
 
 
 T = TypeVar("T", bound="Command")  # pylint: disable=invalid-name, useless-suppression
+U = TypeVar("U", bound="OutputBuffer")  # pylint: disable=invalid-name, useless-suppression
+
+LineCallback = Callable[[str], None]
+
+TIMEOUT_RETURN_CODE = 62  # ETIME, Timer expired
+
+# The lines of output kept for each stream with the tail verbosity
+TAIL_LINES = 20
+
+
+@dataclass(frozen=False)
+class OutputBuffer:
+    """A bounded buffer of the lines of output from a command.
+
+    The first ``head`` and last ``tail`` lines are kept, the lines in
+    between are counted and replaced with a single marker line.
+    """
+
+    head: int = 100
+    tail: int = 400
+    omitted: int = 0
+    _head: List[str] = field(default_factory=list, repr=False)
+    _tail: Deque[str] = field(default_factory=deque, repr=False)
+
+    def append(self: U, line: str) -> None:
+        """Add a line to the buffer.
+
+        :param line: The line, without the line ending
+        """
+        if len(self._head) < self.head:
+            self._head.append(line)
+            return
+        if len(self._tail) == self.tail:
+            if not self.tail:
+                self.omitted += 1
+                return
+            self._tail.popleft()
+            self.omitted += 1
+        self._tail.append(line)
+
+    def clear(self: U) -> None:
+        """Remove the lines from the buffer, before the command is run again."""
+        self.omitted = 0
+        self._head.clear()
+        self._tail.clear()
+
+    @property
+    def lines(self: U) -> List[str]:
+        """Return the lines kept in the buffer.
+
+        :return: The lines, with a marker in place of any omitted lines
+        """
+        lines = list(self._head)
+        if self.omitted:
+            lines.append(f"... {self.omitted} lines omitted ...")
+        lines.extend(self._tail)
+        return lines
 
 
 @dataclass(frozen=False)
 class Command:
     """Data structure for details of a command to be run.
 
-    A ``Command`` is updated after instantiated with details from either
-    ``stdout`` or ``stderr``.
+    A ``Command`` is updated after it is run with details from either
+    ``stdout`` or ``stderr``. Output is read as it is produced, each line is
+    passed to the optional callback and only a bounded buffer is retained.
+    If ``stdin`` is provided it is written to the command as it runs.
+    Commands that contact a remote record its URL as ``remote``, so they may
+    be run again after a transient error and limited per remote host.
     """
 
     # pylint: disable=too-many-instance-attributes
@@ -33,10 +102,16 @@ class Command:
     env: Optional[Dict[str, str]] = None
     no_log: Dict[str, str] = field(default_factory=dict)
     return_code: int = -1
-    stdout: str = ""
-    stderr: str = ""
-    stdout_lines: List[str] = field(default_factory=list)
-    stderr_lines: List[str] = field(default_factory=list)
+    timed_out: bool = False
+    started: float = 0.0
+    duration: float = 0.0
+    cpu_time: float = 0.0
+    stdout_buffer: OutputBuffer = field(default_factory=OutputBuffer)
+    stderr_buffer: OutputBuffer = field(default_factory=OutputBuffer)
+    stdout_callback: Optional[LineCallback] = None
+    stderr_callback: Optional[LineCallback] = None
+    stdin: Optional[bytes] = None
+    remote: str = ""
 
     @property
     def command(self: T) -> str:
@@ -46,26 +121,223 @@ class Command:
         """
         return shlex.join(self.command_parts)
 
+    @property
+    def stdout(self: T) -> str:
+        """Return the retained standard output.
+
+        :return: The standard output
+        """
+        return "\n".join(self.stdout_buffer.lines)
+
+    @property
+    def stderr(self: T) -> str:
+        """Return the retained standard error.
+
+        :return: The standard error
+        """
+        return "\n".join(self.stderr_buffer.lines)
+
+    @property
+    def stdout_lines(self: T) -> List[str]:
+        """Return the retained lines of standard output.
+
+        :return: The lines of standard output
+        """
+        return self.stdout_buffer.lines
+
+    @property
+    def stderr_lines(self: T) -> List[str]:
+        """Return the retained lines of standard error.
+
+        :return: The lines of standard error
+        """
+        return self.stderr_buffer.lines
+
+    def run(self: T, timeout: int) -> None:
+        """Run the command, streaming the output into the buffers.
+
+        Carriage returns, as used by git for progress, are treated as line
+        endings so progress updates do not accumulate into a single line.
+        The process is reaped with ``wait4`` so the CPU time of the command
+        can be recorded without counting other commands running concurrently.
+        An exception raised by a callback is raised once the command has
+        exited, the output is still read so the command is not blocked on a
+        full pipe.
+
+        :param timeout: The timeout in seconds
+        :raises Exception: The first exception raised by a callback
+        """
+        self.timed_out = False
+        self.stdout_buffer.clear()
+        self.stderr_buffer.clear()
+        self.started = time.time()
+        start = time.perf_counter()
+        callback_errors: List[Exception] = []
+        with subprocess.Popen(
+            self.command_parts,
+            env=self.env,
+            stdin=None if self.stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ) as process:
+            threads = [
+                threading.Thread(
+                    target=_read_lines,
+                    args=(stream, buffer, callback, callback_errors),
+                    daemon=True,
+                )
+                for stream, buffer, callback in (
+                    (process.stdout, self.stdout_buffer, self.stdout_callback),
+                    (process.stderr, self.stderr_buffer, self.stderr_callback),
+                )
+            ]
+            if process.stdin and self.stdin is not None:
+                # Written while the output is read, a full pipe would otherwise block both
+                threads.append(
+                    threading.Thread(
+                        target=_write_input,
+                        args=(process.stdin, self.stdin),
+                        daemon=True,
+                    ),
+                )
+            for thread in threads:
+                thread.start()
+            timer = threading.Timer(timeout, self._expire, args=(process,))
+            timer.start()
+            _pid, status, usage = os.wait4(process.pid, 0)
+            timer.cancel()
+            process.returncode = os.waitstatus_to_exitcode(status)
+            self.duration = time.perf_counter() - start
+            self.cpu_time = usage.ru_utime + usage.ru_stime
+            self.return_code = TIMEOUT_RETURN_CODE if self.timed_out else process.returncode
+            for thread in threads:
+                # A grandchild holding the pipe open must not block a timed out command
+                thread.join(timeout=1 if self.timed_out else None)
+        if callback_errors:
+            raise callback_errors[0]
+
     @property
     def cleaned(self: T) -> Dict[str, Union[int, Dict[str, str], List[str], str]]:
         """Return the sanitized details of the command for the log.
 
         :return: The sanitized details of the command for the log.
         """
-        command_parts = self.command_parts
-        stdout_lines = self.stdout_lines
-        stderr_lines = self.stderr_lines
-
-        if self.no_log:
-            for find, replace in self.no_log.items():
-                for data in (command_parts, stdout_lines, stderr_lines):
-                    for idx, part in enumerate(data):
-                        data[idx] = part.replace(find, replace)
-
-        return {
-            "command": shlex.join(command_parts),
+        return self.details()
+
+    def details(
+        self: T,
+        verbosity: str = "full",
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Union[int, Dict[str, str], List[str], str]]:
+        """Return the sanitized details of the command for the log.
+
+        Values in ``no_log`` are replaced in a single pass over each line,
+        the command itself is not changed.
+
+        :param verbosity: One of ``summary``, without the output, ``tail``,
+            with the last lines of output, or ``full``, with all retained lines
+        :param max_bytes: The maximum size of the output lines, the last lines
+            are kept, None for no limit
+        :return: The sanitized details of the command for the log.
+        """
+        redact = _redactor(self.no_log)
+        details: Dict[str, Union[int, Dict[str, str], List[str], str]] = {
+            "command": shlex.join(redact(part) for part in self.command_parts),
             "env": self.env or "",
-            "stdout_lines": stdout_lines,
-            "stderr_lines": stderr_lines,
-            "return_code": self.return_code,
         }
+        if verbosity != "summary":
+            streams = [self.stdout_lines, self.stderr_lines]
+            if verbosity == "tail":
+                streams = [lines[-TAIL_LINES:] for lines in streams]
+            for key, lines in zip(("stdout_lines", "stderr_lines"), streams):
+                details[key], used = _cap_lines([redact(line) for line in lines], max_bytes)
+                if max_bytes is not None:
+                    max_bytes -= used
+        details["return_code"] = self.return_code
+        return details
+
+    def _expire(self: T, process: "subprocess.Popen[bytes]") -> None:
+        """Stop a command that exceeded the timeout.
+
+        :param process: The process of the command
+        """
+        self.timed_out = True
+        process.kill()
+
+
+def _redactor(no_log: Dict[str, str]) -> Callable[[str], str]:
+    """Create a function replacing the values not to be logged.
+
+    :param no_log: The replacement for each value
+    :return: The function, replacing every value in a single pass
+    """
+    if not no_log:
+        return lambda text: text
+    # The longest value first, where one value contains another
+    pattern = re.compile(
+        "|".join(re.escape(find) for find in sorted(no_log, key=len, reverse=True)),
+    )
+    return lambda text: pattern.sub(lambda match: no_log[match.group(0)], text)
+
+
+def _cap_lines(lines: List[str], max_bytes: Optional[int]) -> Tuple[List[str], int]:
+    """Keep the last lines that fit within a size.
+
+    :param lines: The lines
+    :param max_bytes: The maximum size of the lines, None for no limit
+    :return: The lines kept, with a marker in place of any omitted lines, and their size
+    """
+    sizes = [len(line.encode("utf-8")) + 1 for line in lines]
+    if max_bytes is None:
+        return lines, sum(sizes)
+    used = 0
+    kept = 0
+    for size in reversed(sizes):
+        if used + size > max_bytes:
+            break
+        used += size
+        kept += 1
+    if kept == len(lines):
+        return lines, used
+    return [f"... {len(lines) - kept} lines omitted ...", *lines[len(lines) - kept :]], used
+
+
+def _write_input(stream: IO[bytes], data: bytes) -> None:
+    """Write the input of a command and close the stream.
+
+    :param stream: The standard input of the command
+    :param data: The input
+    """
+    # The command may exit, or be killed, before reading all of the input
+    with suppress(OSError, ValueError), stream:
+        stream.write(data)
+
+
+def _read_lines(
+    stream: IO[bytes],
+    buffer: OutputBuffer,
+    callback: Optional[LineCallback],
+    errors: List[Exception],
+) -> None:
+    """Read lines from a stream as they are produced.
+
+    The stream is read to the end even if the callback raises, the callback
+    is not called again and the exception is added to ``errors``.
+
+    :param stream: The stream
+    :param buffer: The buffer for the lines
+    :param callback: A function called with each line
+    :param errors: The exceptions raised by the callback
+    """
+    # The stream is closed beneath an abandoned reader once a timed out command is reaped
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline=None)
+    with suppress(OSError, ValueError), text:
+        for raw_line in text:
+            line = raw_line.rstrip("\n")
+            if callback:
+                try:
+                    callback(line)
+                except Exception as exc:  # noqa: BLE001 # pylint: disable=broad-exception-caught
+                    errors.append(exc)
+                    callback = None
+            buffer.append(line)
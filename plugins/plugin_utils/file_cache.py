@@ -0,0 +1,187 @@
+"""A controller side cache of the contents of files in remote repositories."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import hashlib
+import os
+import tempfile
+import time
+
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, TypeVar
+
+from .mirror_cache import cache_key, normalize_url
+
+
+T = TypeVar("T", bound="FileCache")  # pylint: disable=invalid-name, useless-suppression
+
+
+def _digest(value: str) -> str:
+    """Return a file name for an arbitrary value.
+
+    :param value: The value
+    :return: The digest of the value
+    """
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+def _write(path: Path, content: bytes) -> None:
+    """Write a file atomically, so a concurrent reader never sees part of it.
+
+    :param path: The file
+    :param content: The content of the file
+    """
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(content)
+        Path(temporary).replace(path)
+    except OSError:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+
+
+@dataclass(frozen=False)
+class FileCache:
+    """A directory of file contents keyed by repository, commit and path.
+
+    The content of a path at a commit never changes, so entries are only
+    removed by eviction: least recently used first, once they are older than
+    ``max_age`` seconds or the cache grows beyond ``max_size`` bytes. A value
+    of 0 disables the corresponding limit. The commit a ref resolves to is
+    kept separately, since it changes as the ref moves.
+    """
+
+    directory: str
+    max_age: int = 0
+    max_size: int = 0
+
+    def __post_init__(self: T) -> None:
+        """Expand and create the cache directory."""
+        self.directory = str(Path(self.directory).expanduser().resolve())
+        Path(self.directory).mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    def _content_path(self: T, url: str, commit: str, path: str) -> Path:
+        """Return the path of the cached content of a file.
+
+        :param url: The repository URL
+        :param commit: The commit
+        :param path: The path of the file in the repository
+        :return: The path of the cache entry
+        """
+        return Path(self.directory, "files", cache_key(url), commit, _digest(path))
+
+    def _ref_path(self: T, url: str, ref: str) -> Path:
+        """Return the path of the cached commit of a ref.
+
+        :param url: The repository URL
+        :param ref: The ref
+        :return: The path of the cache entry
+        """
+        return Path(self.directory, "refs", _digest(f"{normalize_url(url)}\0{ref}"))
+
+    def get(self: T, url: str, commit: str, path: str) -> Optional[bytes]:
+        """Return the cached content of a file and mark it as recently used.
+
+        :param url: The repository URL
+        :param commit: The commit
+        :param path: The path of the file in the repository
+        :return: The content, or None if it is not cached
+        """
+        entry = self._content_path(url, commit, path)
+        try:
+            content = entry.read_bytes()
+            os.utime(entry)
+        except FileNotFoundError:
+            # Not cached, or evicted by a concurrent fork
+            return None
+        return content
+
+    def put(self: T, url: str, commit: str, path: str, content: bytes) -> None:
+        """Add the content of a file to the cache.
+
+        :param url: The repository URL
+        :param commit: The commit
+        :param path: The path of the file in the repository
+        :param content: The content
+        """
+        _write(self._content_path(url, commit, path), content)
+
+    def commit(self: T, url: str, ref: str, max_age: int) -> Optional[str]:
+        """Return the commit a ref resolved to, if it was resolved recently.
+
+        :param url: The repository URL
+        :param ref: The ref
+        :param max_age: The seconds after which the ref must be resolved again
+        :return: The commit, or None if the ref must be resolved
+        """
+        if not max_age:
+            return None
+        entry = self._ref_path(url, ref)
+        with suppress(FileNotFoundError):
+            if time.time() - entry.stat().st_mtime <= max_age:
+                return entry.read_text(encoding="utf-8").strip() or None
+        return None
+
+    def remember(self: T, url: str, ref: str, commit: str) -> None:
+        """Record the commit a ref resolved to.
+
+        :param url: The repository URL
+        :param ref: The ref
+        :param commit: The commit
+        """
+        _write(self._ref_path(url, ref), commit.encode("utf-8"))
+
+    def _entries(self: T) -> List[Tuple[float, int, Path]]:
+        """Collect the file contents in the cache.
+
+        :return: The last use, size and path of each entry, least recently used first
+        """
+        entries = []
+        for entry in Path(self.directory, "files").glob("*/*/*"):
+            if entry.name.startswith(".tmp-"):
+                # Being written by a concurrent fork
+                continue
+            # Removed by a concurrent fork while walking
+            with suppress(FileNotFoundError):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry))
+        return sorted(entries)
+
+    def evict(self: T) -> int:
+        """Remove entries that exceed the age or size limits, and expired refs.
+
+        :return: The number of file contents evicted
+        """
+        if not self.max_age and not self.max_size:
+            return 0
+
+        now = time.time()
+        entries = self._entries()
+        total = sum(size for _last_used, size, _path in entries)
+        evicted = 0
+        for last_used, size, entry in entries:
+            expired = bool(self.max_age) and now - last_used > self.max_age
+            if not expired and not (self.max_size and total > self.max_size):
+                continue
+            entry.unlink(missing_ok=True)
+            # The commit and repository directories are removed once empty
+            with suppress(OSError):
+                entry.parent.rmdir()
+                entry.parent.parent.rmdir()
+            total -= size
+            evicted += 1
+        if self.max_age:
+            for ref in Path(self.directory, "refs").glob("*"):
+                with suppress(FileNotFoundError):
+                    if now - ref.stat().st_mtime > self.max_age:
+                        ref.unlink()
+        return evicted
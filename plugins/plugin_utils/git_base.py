@@ -8,12 +8,20 @@ __metaclass__ = type
 # pylint: enable=invalid-name
 
 import base64
-import subprocess
-
+import hashlib
+import os
+import shlex
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field, fields
+from pathlib import Path
 from types import ModuleType
-from typing import Dict, List, Tuple, TypeVar, Union
+from typing import Dict, List, Optional, Sequence, Tuple, TypeVar, Union
 
+from ansible.errors import AnsibleActionFail
 from ansible.parsing.dataloader import DataLoader
 from ansible.playbook.play_context import PlayContext
 from ansible.playbook.task import Task
@@ -23,12 +31,19 @@ from ansible.plugins.connection.local import Connection
 from ansible.template import Templar
 
 from .command import Command
+from .host_limiter import HostLimiter, SlotTimeoutError, runtime_directory
+from .private_directory import private_directory
+from .retry import RetryPolicy, is_transient
+from .step_graph import STEP_OUTPUT, Step, run_graph
+from .trace import TRACE_FILE_ENV, Span, write_trace
 
 
 # mypy disallow you from omitting parameters in generic types
-JSONTypes = Union[bool, int, str, Dict, List]  # type: ignore
+JSONTypes = Union[bool, float, int, str, Dict, List]  # type: ignore
 
 T = TypeVar("T", bound="ActionInit")  # pylint: disable=invalid-name, useless-suppression
+V = TypeVar("V", bound="ResultBase")  # pylint: disable=invalid-name, useless-suppression
+W = TypeVar("W", bound="BatchResult")  # pylint: disable=invalid-name, useless-suppression
 
 
 @dataclass(frozen=False)
@@ -63,75 +78,401 @@ class ResultBase:
     output: List[Dict[str, Union[int, Dict[str, str], List[str], str]]] = field(
         default_factory=list,
     )
+    timings: List[Dict[str, Union[None, bool, float, int, str]]] = field(default_factory=list)
+    queue_wait: float = 0.0
+
+    @property
+    def asdict(self: V) -> Dict[str, JSONTypes]:
+        """Create a dictionary, avoiding the deepcopy with dataclass.asdict.
+
+        The output of each command is already a new dictionary, copying it
+        again would double the memory used by a large result.
+
+        :return: A dictionary of the result.
+        """
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+
+@dataclass(frozen=False)
+class BatchResult:
+    """Data structure for the task result when several repositories are processed."""
+
+    changed: bool = False
+    failed: bool = False
+    msg: str = ""
+    results: List[Dict[str, JSONTypes]] = field(default_factory=list)
+
+    @property
+    def asdict(self: W) -> Dict[str, JSONTypes]:
+        """Create a dictionary, avoiding the deepcopy with dataclass.asdict.
+
+        :return: A dictionary of the result.
+        """
+        return {field.name: getattr(self, field.name) for field in fields(self)}
 
 
 U = TypeVar("U", bound="GitBase")  # pylint: disable=invalid-name, useless-suppression
 
 
+def available_cpus() -> int:
+    """Return the number of CPUs the process may run on.
+
+    :return: The number of CPUs, respecting the affinity mask where supported
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class GitBase(ActionBase):  # type: ignore[misc] # parent has type Any
     """Base class for the git paction plugins."""
 
+    # pylint: disable=too-many-instance-attributes
+
     def __init__(self: U, action_init: ActionInit) -> None:
         """Initialize the action plugin.
 
         :param action_init: The keyword arguments for action base
         """
         super().__init__(**action_init.asdict)
+        self._action_init = action_init
         self._result: ResultBase = ResultBase()
         self._timeout: int
+        self._git: Tuple[str, ...] = ("git",)
+        self._lock = threading.Lock()
+        self._trace_file: Optional[str] = None
+        self._trace_id = uuid.uuid4().hex
+        self._output_bytes = 0
 
     @staticmethod
-    def _git_auth_header(token: str) -> Tuple[str, List[str]]:
+    def _git_auth_header(token: str, url: str = "") -> Tuple[str, List[str]]:
         """Create the authorization header.
 
         helpful: https://github.com/actions/checkout/blob/main/src/git-auth-helper.ts#L56
 
         :param token: The token
+        :param url: Limit the header to requests for this URL, used when a command
+            may contact more than one remote, such as a lazy fetch in a partial clone
         :return: The base64 encoded token and the authorization header cli parameter
         """
         basic = f"x-access-token:{token}"
         basic_encoded = base64.b64encode(basic.encode("utf-8")).decode("utf-8")
+        key = f"http.{url}.extraheader" if url else "http.extraheader"
         cli_parameters = [
             "-c",
-            f"http.extraheader=AUTHORIZATION: basic {basic_encoded}",
+            f"{key}=AUTHORIZATION: basic {basic_encoded}",
         ]
         return basic_encoded, cli_parameters
 
+    def _performance_options(self: U) -> Tuple[str, ...]:
+        """Build the configuration parameters of the ``performance`` option.
+
+        Worker and thread counts of 0 use the number of CPUs available.
+
+        :return: The cli parameters, empty unless enabled
+        """
+        performance = self._task.args["performance"]
+        if not performance["enabled"]:
+            return ()
+
+        cpus = available_cpus()
+        config = {
+            "checkout.workers": performance["checkout_workers"] or cpus,
+            "pack.threads": performance["pack_threads"] or cpus,
+            "protocol.version": performance["protocol_version"],
+        }
+        if performance.get("compression") is not None:
+            config["core.compression"] = performance["compression"]
+        if performance["http_post_buffer"]:
+            config["http.postBuffer"] = performance["http_post_buffer"]
+        return tuple(part for key, value in config.items() for part in ("-c", f"{key}={value}"))
+
+    def _ssh_multiplexing(self: U, identity: str) -> List[str]:
+        """Build the ssh options sharing a connection per remote host and identity.
+
+        The first ssh command to a host becomes the master, later commands
+        with the same identity use its connection. The master exits once
+        idle for the persist time, a stale socket is replaced by ssh.
+
+        The sockets are only created in a directory private to the user,
+        another user could otherwise use or replace them.
+
+        :param identity: The key used to authenticate, empty for the default keys
+        :return: The ssh options, empty unless enabled and the directory is private
+        """
+        multiplexing = self._task.args["ssh_multiplexing"]
+        if not multiplexing["enabled"]:
+            return []
+
+        # Connections authenticated with different keys are not shared
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:12]
+        try:
+            if multiplexing.get("directory"):
+                directory = Path(multiplexing["directory"]).expanduser()
+                directory.parent.mkdir(parents=True, exist_ok=True)
+                private_directory(str(directory))
+            else:
+                directory = Path(runtime_directory("ssh"))
+            control_directory = private_directory(str(directory / digest))
+        except OSError:
+            return []
+        return [
+            "-o ControlMaster=auto",
+            f"-o {shlex.quote(f'ControlPath={control_directory}/%C')}",
+            f"-o ControlPersist={multiplexing['persist']}",
+        ]
+
+    @staticmethod
+    def _merge_args(
+        common: Dict[str, JSONTypes],
+        entry: Dict[str, JSONTypes],
+    ) -> Dict[str, JSONTypes]:
+        """Merge the arguments of a batch entry over the arguments of the task.
+
+        :param common: The arguments of the task
+        :param entry: The arguments of the batch entry
+        :return: The arguments for the entry
+        """
+        args = dict(common)
+        for key, value in entry.items():
+            default = args.get(key)
+            if isinstance(value, dict) and isinstance(default, dict):
+                args[key] = {**default, **value}
+            else:
+                args[key] = value
+        return args
+
+    def _run_worker(
+        self: U,
+        args: Dict[str, JSONTypes],
+        task_vars: Optional[Dict[str, JSONTypes]],
+    ) -> Dict[str, JSONTypes]:
+        """Run one entry of a batch in a new instance of the plugin.
+
+        Each worker has its own task arguments and result, so a failure,
+        including an unexpected error, is isolated to the entry. The duration
+        of the entry, in seconds, is added to the result.
+
+        :param args: The arguments for the entry
+        :param task_vars: The task variables
+        :return: The result for the entry
+        """
+        task = self._task.copy()
+        task.args = args
+        worker = type(self)(**{**self._action_init.asdict, "task": task})
+        start = time.monotonic()
+        try:
+            result: Dict[str, JSONTypes] = worker.run(task_vars=task_vars)
+        except AnsibleActionFail as exc:
+            result = ResultBase(changed=False, failed=True, msg=str(exc)).asdict
+        except Exception as exc:  # noqa: BLE001 # pylint: disable=broad-exception-caught
+            # The other entries are still running, their results must not be lost
+            msg = f"Unexpected error: {type(exc).__name__}: {exc}"
+            result = ResultBase(changed=False, failed=True, msg=msg).asdict
+        result["duration"] = round(time.monotonic() - start, 3)
+        return result
+
+    def _run_batch(
+        self: U,
+        batch: List[Dict[str, JSONTypes]],
+        max_workers: int,
+        noun: str,
+        task_vars: Optional[Dict[str, JSONTypes]],
+    ) -> Dict[str, JSONTypes]:
+        """Run each entry of a batch concurrently.
+
+        :param batch: The arguments for each entry
+        :param max_workers: The maximum number of entries processed at once
+        :param noun: The description of the entries, used in the result message
+        :param task_vars: The task variables
+        :return: The result, with the result of each entry in the order provided
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._run_worker, args, task_vars) for args in batch]
+            results = [future.result() for future in futures]
+
+        failures = sum(1 for result in results if result["failed"])
+        result = BatchResult(
+            changed=any(result["changed"] for result in results),
+            failed=bool(failures),
+            results=results,
+        )
+        if failures:
+            result.msg = f"Failed to process {failures} of {len(results)} {noun}"
+        else:
+            result.msg = f"Successfully processed {len(results)} {noun}"
+        return result.asdict
+
+    def _retry_policy(self: U) -> RetryPolicy:
+        """Build the retry policy from the ``retries`` option.
+
+        :return: The retry policy
+        """
+        retries = self._task.args["retries"]
+        return RetryPolicy(
+            attempts=retries["attempts"],
+            delay=retries["delay"],
+            max_delay=retries["max_delay"],
+            budget=retries["budget"],
+        )
+
+    def _host_limiter(self: U) -> HostLimiter:
+        """Build the limiter from the ``remote_concurrency`` option.
+
+        :return: The limiter
+        """
+        remote_concurrency = self._task.args["remote_concurrency"]
+        if not remote_concurrency["max_per_host"]:
+            return HostLimiter(directory="")
+        return HostLimiter(
+            directory=remote_concurrency.get("directory") or runtime_directory("hosts"),
+            max_per_host=remote_concurrency["max_per_host"],
+        )
+
     def _run_command(self: U, command: Command, ignore_errors: bool = False) -> None:
         """Run a command and append the command result to the results.
 
+        A command contacting a remote waits for a slot of the remote host and
+        is run again after a transient error as permitted by the retry
+        policy. Each attempt is added to the results.
+
         :param command: The command to run
         :param ignore_errors: If errors should be ignored
         """
+        policy = self._retry_policy() if command.remote else RetryPolicy()
         try:
-            result = subprocess.run(
-                command.command_parts,
-                env=command.env,
-                check=True,
-                capture_output=True,
-                timeout=self._timeout,
-            )
-            command.return_code = result.returncode
-            command.stdout = result.stdout.decode("utf-8") or ""
-            command.stderr = result.stderr.decode("utf-8") or ""
-
-        except subprocess.CalledProcessError as exc:
-            command.return_code = exc.returncode
-            command.stdout = exc.stdout.decode("utf-8") if exc.stdout else ""
-            command.stderr = exc.stderr.decode("utf-8") if exc.stderr else ""
+            limiter = self._host_limiter() if command.remote else HostLimiter(directory="")
+        except OSError as exc:
             if not ignore_errors:
+                self._fail(f"Failed to use the directory for the host locks, {exc}")
+            return
+        start = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                # A command holding a slot is stopped by its timeout, so waiting longer is futile
+                with limiter.slot(command.remote, timeout=self._timeout) as queue_wait:
+                    command.run(timeout=self._timeout)
+            except SlotTimeoutError as exc:
+                if not ignore_errors:
+                    self._fail(f"{exc}, {command.fail_msg}")
+                return
+            delay = None
+            if command.return_code and not command.timed_out and is_transient(command.stderr):
+                delay = policy.next_delay(attempt=attempt, elapsed=time.monotonic() - start)
+            if delay is None:
+                break
+            self._log_command(command, attempt=attempt, queue_wait=queue_wait, retry_delay=delay)
+            time.sleep(delay)
+            attempt += 1
+
+        if command.return_code and not ignore_errors:
+            if command.timed_out:
+                self._fail(f"Timeout: {command.fail_msg}")
+            else:
+                self._fail(command.fail_msg)
+        attempt = attempt if policy.attempts > 1 else 0
+        self._log_command(command, attempt=attempt, queue_wait=queue_wait)
+
+    def _log_command(
+        self: U,
+        command: Command,
+        attempt: int = 0,
+        queue_wait: Optional[float] = None,
+        retry_delay: Optional[float] = None,
+    ) -> None:
+        """Append the command result to the results and record the timing.
+
+        :param command: The command that was run
+        :param attempt: The number of the attempt, not logged if 0
+        :param queue_wait: The seconds waited for a slot of the remote host, if limited
+        :param retry_delay: The seconds before the command is run again, if it is
+        """
+        verbosity = self._task.args["output_verbosity"]
+        max_bytes = self._task.args["output_max_bytes"]
+        with self._lock:
+            # Commands running concurrently share the size limit of the task
+            cleaned = command.details(
+                verbosity="summary" if verbosity == "none" else verbosity,
+                max_bytes=max(max_bytes - self._output_bytes, 0) if max_bytes else None,
+            )
+            for key in ("stdout_lines", "stderr_lines"):
+                lines = cleaned.get(key)
+                if isinstance(lines, list):
+                    self._output_bytes += sum(len(line.encode("utf-8")) + 1 for line in lines)
+            if queue_wait is not None:
+                self._result.queue_wait = round(self._result.queue_wait + queue_wait, 3)
+        if attempt:
+            cleaned["attempt"] = attempt
+        if queue_wait is not None:
+            cleaned["queue_wait_ms"] = round(queue_wait * 1000)
+        if retry_delay is not None:
+            cleaned["retry_delay_ms"] = round(retry_delay * 1000)
+        if verbosity != "none":
+            (STEP_OUTPUT.get() or self._result).output.append(cleaned)
+        self._record(
+            Span(
+                kind="command",
+                name=str(cleaned["command"]),
+                start=command.started,
+                end=command.started + command.duration,
+                cpu_time=command.cpu_time,
+                return_code=command.return_code,
+                failed=command.return_code != 0,
+            ),
+        )
+
+    def _fail(self: U, msg: str) -> None:
+        """Fail the task, the first failure is reported if steps run concurrently.
+
+        :param msg: The failure message
+        """
+        with self._lock:
+            if not self._result.failed:
                 self._result.failed = True
-                self._result.msg = command.fail_msg
+                self._result.msg = msg
 
-        except subprocess.TimeoutExpired as exc:
-            command.return_code = 62  # ETIME, Timer expired
-            command.stdout = exc.stdout.decode("utf-8") if exc.stdout else ""
-            command.stderr = exc.stderr.decode("utf-8") if exc.stderr else ""
-            if not ignore_errors:
-                self._result.failed = True
-                self._result.msg = f"Timeout: {command.fail_msg}"
+    def _run_steps(self: U, steps: Sequence[Step]) -> None:
+        """Run the steps of the action plugin, stopping at the first failure.
+
+        Steps run as soon as the steps they depend on complete. The output of
+        each step is added to the result in the order of the steps. The timing
+        of each step is added to the result and, if a trace file is configured
+        with the ``trace_file`` option or the environment, appended to the
+        trace file.
+
+        :param steps: The steps to run
+        """
+        self._trace_file = self._task.args.get("trace_file") or os.environ.get(TRACE_FILE_ENV)
+        outputs = run_graph(steps, runner=self._run_step, failed=lambda: self._result.failed)
+        for output in outputs:
+            self._result.output.extend(output.output)
+            self._result.timings.extend(output.timings)
 
-        command.stdout_lines = command.stdout.splitlines()
-        command.stderr_lines = command.stderr.splitlines()
+    def _run_step(self: U, step: Step) -> None:
+        """Run and time a step.
 
-        self._result.output.append(command.cleaned)
+        :param step: The step
+        """
+        start = time.time()
+        step.run()
+        self._record(
+            Span(
+                kind="step",
+                name=step.name,
+                start=start,
+                end=time.time(),
+                failed=self._result.failed,
+            ),
+        )
+
+    def _record(self: U, span: Span) -> None:
+        """Record the timing of a step or command.
+
+        :param span: The timing
+        """
+        record = span.record
+        (STEP_OUTPUT.get() or self._result).timings.append(record)
+        if self._trace_file:
+            trace = {**record, "action": self._task.action, "trace_id": self._trace_id}
+            write_trace(self._trace_file, trace)
@@ -0,0 +1,136 @@
+"""Limit the commands contacting each remote host, across forks."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import fcntl
+import hashlib
+import os
+import random
+import re
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, Optional, TypeVar
+from urllib.parse import urlsplit
+
+from .mirror_cache import normalize_url
+from .private_directory import private_directory, user_temporary_directory
+
+
+T = TypeVar("T", bound="HostLimiter")  # pylint: disable=invalid-name, useless-suppression
+
+# The seconds between attempts to take a slot, randomized so waiting forks do not poll together
+POLL_INTERVAL = 0.1
+
+
+class SlotTimeoutError(Exception):
+    """No slot of a remote host was released within the timeout."""
+
+
+def remote_host(url: str) -> str:
+    """Return the host of a remote URL.
+
+    :param url: The remote URL
+    :return: The host and port, empty for a local repository
+    """
+    normalized = urlsplit(normalize_url(url))
+    return "" if normalized.scheme == "file" else normalized.netloc
+
+
+def runtime_directory(name: str) -> str:
+    """Create a directory for files shared by the forks on the controller.
+
+    :param name: The name of the directory
+    :raises OSError: If the directory, or the directory for the user it is
+        created in, is not private to the user
+    :return: The directory in the user's runtime directory, or in a directory
+        for the user in the temporary directory
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        parent = private_directory(str(Path(runtime, "ansible_scm")))
+    else:
+        parent = user_temporary_directory()
+    return private_directory(str(Path(parent, name)))
+
+
+def _try_lock(path: Path) -> Optional[IO[str]]:
+    """Take an exclusive lock on a file without waiting.
+
+    :param path: The lock file
+    :return: The open lock file, or None if it is locked by another process
+    """
+    handle = path.open("a", encoding="utf-8")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+@dataclass(frozen=False)
+class HostLimiter:
+    """A semaphore per remote host, shared by every fork on the controller.
+
+    Each host has ``max_per_host`` lock files, a command runs once it holds
+    the lock on any one of them. Locks are released by the operating system
+    if a fork exits, so a slot is never leaked. A value of 0 disables the
+    limit. The lock files are only created in a directory private to the
+    user, another user could otherwise hold every slot.
+    """
+
+    directory: str
+    max_per_host: int = 0
+
+    def __post_init__(self: T) -> None:
+        """Expand and create the lock directory.
+
+        :raises OSError: If the lock directory is not private to the user
+        """
+        self.directory = str(Path(self.directory).expanduser())
+        if self.max_per_host:
+            Path(self.directory).parent.mkdir(parents=True, exist_ok=True)
+            private_directory(self.directory)
+
+    @contextmanager
+    def slot(self: T, url: str, timeout: Optional[float] = None) -> Iterator[Optional[float]]:
+        """Hold one of the slots of the host of a remote URL.
+
+        :param url: The remote URL
+        :param timeout: The seconds to wait for a slot, None to wait until one is released
+        :raises SlotTimeoutError: If no slot was released within the timeout
+        :yields: The seconds waited for the slot, None if the host is not limited
+        """
+        host = remote_host(url)
+        if not self.max_per_host or not host:
+            yield None
+            return
+
+        digest = hashlib.sha256(host.encode("utf-8")).hexdigest()[:16]
+        key = f"{re.sub(r'[^a-zA-Z0-9_.-]', '_', host)}-{digest}"
+        paths = [Path(self.directory, f"{key}.{idx}.lock") for idx in range(self.max_per_host)]
+        # Start with a different slot in each fork, the first slots would otherwise be contended
+        offset = random.randrange(self.max_per_host)  # noqa: S311 # not cryptographic
+        paths = paths[offset:] + paths[:offset]
+        start = time.monotonic()
+        while True:
+            handle = next(filter(None, map(_try_lock, paths)), None)
+            if handle is not None:
+                break
+            if timeout is not None and time.monotonic() - start > timeout:
+                msg = f"Timed out after {timeout} seconds waiting for a slot of host: {host}"
+                raise SlotTimeoutError(msg)
+            time.sleep(POLL_INTERVAL * random.uniform(0.5, 1.5))  # noqa: S311
+        with handle:
+            try:
+                yield time.monotonic() - start
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
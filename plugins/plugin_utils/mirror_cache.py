@@ -0,0 +1,204 @@
+"""A controller side cache of bare mirror repositories."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import time
+
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, List, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+
+T = TypeVar("T", bound="MirrorCache")  # pylint: disable=invalid-name, useless-suppression
+U = TypeVar("U", bound="MirrorLock")  # pylint: disable=invalid-name, useless-suppression
+
+SCP_LIKE = re.compile(r"^(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+):(?P<path>(?!//).*)$")
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a repository URL so equivalent spellings share a cache entry.
+
+    Credentials, the user, a trailing slash and a trailing ``.git`` are removed
+    and the host is lower cased. scp-like ssh URLs are treated as ``ssh://``.
+
+    :param url: The repository URL
+    :return: The normalized URL
+    """
+    url = url.strip()
+    scp_like = SCP_LIKE.match(url)
+    if scp_like and "://" not in url:
+        scheme, host, path = "ssh", scp_like.group("host"), scp_like.group("path")
+    else:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower() or "file"
+        host = parts.hostname or ""
+        if parts.port:
+            host = f"{host}:{parts.port}"
+        path = parts.path
+    path = path.strip("/")
+    path = path.removesuffix(".git")
+    return f"{scheme}://{host.lower()}/{path}"
+
+
+def cache_key(url: str) -> str:
+    """Return a file name for a repository URL, shared by equivalent spellings.
+
+    :param url: The repository URL
+    :return: The name of the repository followed by a digest of the normalized URL
+    """
+    normalized = normalize_url(url)
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+    name = re.sub(r"[^\w.-]", "_", normalized.rsplit("/", 1)[-1]) or "repository"
+    return f"{name}-{digest}"
+
+
+def directory_size(path: str) -> int:
+    """Calculate the size of a directory tree on disk.
+
+    :param path: The directory
+    :return: The size in bytes
+    """
+    total = 0
+    for entry in Path(path).rglob("*"):
+        # Files may be removed by a concurrent gc while walking
+        with suppress(OSError):
+            total += entry.lstat().st_size
+    return total
+
+
+class MirrorLock:
+    """An advisory lock on a single mirror, shared between forks."""
+
+    def __init__(self: U, handle: IO[str]) -> None:
+        """Initialize the lock.
+
+        :param handle: The open lock file
+        """
+        self._handle = handle
+
+    def downgrade(self: U) -> None:
+        """Convert the exclusive lock to a shared lock.
+
+        Readers, such as a clone using the mirror as a reference, may proceed
+        concurrently once the mirror has been refreshed.
+        """
+        fcntl.flock(self._handle, fcntl.LOCK_SH)
+
+    def release(self: U) -> None:
+        """Release the lock before the end of the run, once the mirror is not used."""
+        fcntl.flock(self._handle, fcntl.LOCK_UN)
+
+
+@dataclass(frozen=False)
+class MirrorCache:
+    """A directory of bare mirrors keyed by normalized origin URL.
+
+    Mirrors are evicted least recently used first once they are older than
+    ``max_age`` seconds or the cache grows beyond ``max_size`` bytes. A value
+    of 0 disables the corresponding limit.
+    """
+
+    directory: str
+    max_age: int = 0
+    max_size: int = 0
+
+    def __post_init__(self: T) -> None:
+        """Expand and create the cache directory."""
+        self.directory = str(Path(self.directory).expanduser().resolve())
+        Path(self.directory).mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    def key(self: T, url: str) -> str:
+        """Return the cache key for a repository URL.
+
+        :param url: The repository URL
+        :return: The cache key
+        """
+        return cache_key(url)
+
+    def path(self: T, url: str) -> str:
+        """Return the path of the mirror for a repository URL.
+
+        :param url: The repository URL
+        :return: The path to the bare mirror
+        """
+        return str(Path(self.directory, f"{self.key(url)}.git"))
+
+    def _lock_path(self: T, key: str) -> Path:
+        """Return the path of the lock file for a cache key.
+
+        :param key: The cache key
+        :return: The path to the lock file
+        """
+        return Path(self.directory, f"{key}.lock")
+
+    @contextmanager
+    def lock(self: T, url: str) -> Iterator[MirrorLock]:
+        """Hold an exclusive lock on a mirror and mark it as recently used.
+
+        :param url: The repository URL
+        :yields: The lock, which may be downgraded to a shared lock
+        """
+        lock_path = self._lock_path(self.key(url))
+        with lock_path.open("a", encoding="utf-8") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            os.utime(lock_path)
+            try:
+                yield MirrorLock(handle)
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _entries(self: T) -> List[Tuple[float, int, str]]:
+        """Collect the mirrors in the cache.
+
+        :return: The last use, size and key of each mirror, least recently used first
+        """
+        entries = []
+        for mirror in Path(self.directory).glob("*.git"):
+            lock_path = self._lock_path(mirror.stem)
+            last_used = (lock_path if lock_path.exists() else mirror).stat().st_mtime
+            entries.append((last_used, directory_size(str(mirror)), mirror.stem))
+        return sorted(entries)
+
+    def evict(self: T, keep: str) -> List[str]:
+        """Remove mirrors that exceed the age or size limits.
+
+        Mirrors locked by another fork are skipped and retried on a later run.
+
+        :param keep: The URL of a mirror that must not be evicted
+        :return: The keys of the evicted mirrors
+        """
+        if not self.max_age and not self.max_size:
+            return []
+
+        keep_key = self.key(keep)
+        entries = self._entries()
+        total = sum(size for _last_used, size, _key in entries)
+        now = time.time()
+        evicted = []
+        for last_used, size, key in entries:
+            expired = bool(self.max_age) and now - last_used > self.max_age
+            oversized = bool(self.max_size) and total > self.max_size
+            if key == keep_key or not (expired or oversized):
+                continue
+            with self._lock_path(key).open("a", encoding="utf-8") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                shutil.rmtree(Path(self.directory, f"{key}.git"), ignore_errors=True)
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            total -= size
+            evicted.append(key)
+        return evicted
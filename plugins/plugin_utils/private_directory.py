@@ -0,0 +1,49 @@
+"""Directories on the controller that only the current user can use."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import errno
+import os
+import stat
+import tempfile
+
+from contextlib import suppress
+from pathlib import Path
+
+
+def private_directory(path: str) -> str:
+    """Create a directory only the current user can use, or check an existing one is.
+
+    The directory is checked without following a symbolic link, so another
+    user can not redirect files written to a predictable path, such as one
+    in the shared temporary directory, into a directory of their choice.
+
+    :param path: The directory, its parent must exist
+    :raises OSError: If the path is a symbolic link or not a directory, or it
+        belongs to another user or may be used by other users
+    :return: The directory
+    """
+    with suppress(FileExistsError):
+        Path(path).mkdir(mode=0o700)
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode):
+        raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+    if status.st_uid != os.getuid():
+        raise PermissionError(errno.EPERM, "Owned by another user", path)
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        raise PermissionError(errno.EPERM, "Accessible by other users", path)
+    return path
+
+
+def user_temporary_directory() -> str:
+    """Return a directory for the current user in the temporary directory.
+
+    :raises OSError: If the directory is not private to the user
+    :return: The directory
+    """
+    return private_directory(str(Path(tempfile.gettempdir(), f"ansible_scm-{os.getuid()}")))
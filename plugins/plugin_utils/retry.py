@@ -0,0 +1,84 @@
+"""Retry commands that failed because of a transient network error."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import random
+import re
+
+from dataclasses import dataclass
+from typing import Optional, TypeVar
+
+
+T = TypeVar("T", bound="RetryPolicy")  # pylint: disable=invalid-name, useless-suppression
+
+# Errors reported by git, curl and ssh when the remote or the network is briefly unavailable
+TRANSIENT_PATTERNS = (
+    r"The requested URL returned error: (?:408|429|5\d\d)",
+    r"\bHTTP (?:408|429|5\d\d)\b",
+    r"RPC failed",
+    r"early EOF",
+    r"the remote end hung up unexpectedly",
+    r"unexpected disconnect while reading sideband packet",
+    r"Connection (?:reset by peer|refused|timed out|closed by)",
+    r"Operation timed out",
+    r"Could not resolve host",
+    r"Temporary failure in name resolution",
+    r"Failed to connect to",
+    r"ssh: connect to host",
+    r"kex_exchange_identification",
+    r"SSL_ERROR_SYSCALL",
+    r"gnutls_handshake\(\) failed",
+)
+TRANSIENT_ERRORS = re.compile("|".join(TRANSIENT_PATTERNS), re.IGNORECASE)
+
+# Client errors other than a timeout or rate limit, such as failed authentication or a
+# request too large, are permanent even when the connection is also reported as dropped
+PERMANENT_ERRORS = re.compile(
+    r"(?:\bHTTP|The requested URL returned error:) (?!408|429)4\d\d\b",
+    re.IGNORECASE,
+)
+
+
+def is_transient(stderr: str) -> bool:
+    """Determine if the error output of a command reports a transient error.
+
+    :param stderr: The standard error of the command
+    :return: True if the command may succeed if run again
+    """
+    return not PERMANENT_ERRORS.search(stderr) and bool(TRANSIENT_ERRORS.search(stderr))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """When to run a command again after a transient error.
+
+    The delay before each retry is chosen at random, up to a limit that
+    doubles with each attempt, so concurrent tasks failing together do not
+    retry together. No retry is made once ``budget`` seconds would be
+    exceeded, a value of 0 disables the budget.
+    """
+
+    attempts: int = 1
+    delay: float = 1.0
+    max_delay: float = 30.0
+    budget: float = 0.0
+
+    def next_delay(self: T, attempt: int, elapsed: float) -> Optional[float]:
+        """Return the delay before the next attempt.
+
+        :param attempt: The number of the attempt that failed, starting at 1
+        :param elapsed: The seconds since the first attempt started
+        :return: The delay in seconds, or None if no further attempt should be made
+        """
+        if attempt >= self.attempts:
+            return None
+        limit = min(self.max_delay, self.delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, limit)  # noqa: S311 # jitter, not cryptographic
+        if self.budget and elapsed + delay > self.budget:
+            return None
+        return delay
@@ -0,0 +1,119 @@
+"""Run the steps of an action plugin as a graph of dependencies."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import asyncio
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+
+T = TypeVar("T", bound="Step")  # pylint: disable=invalid-name, useless-suppression
+
+StepFunction = Callable[[], None]
+
+
+@dataclass(frozen=True)
+class Step:
+    """A step and the steps that must complete before it starts."""
+
+    run: StepFunction
+    after: Tuple[StepFunction, ...] = ()
+
+    @property
+    def name(self: T) -> str:
+        """Return the name of the step.
+
+        :return: The name of the step function, without the leading underscore
+        """
+        return self.run.__name__.lstrip("_")
+
+
+@dataclass(frozen=False)
+class StepOutput:
+    """The output and timings recorded while a step runs."""
+
+    output: List[Dict[str, Union[int, Dict[str, str], List[str], str]]] = field(
+        default_factory=list,
+    )
+    timings: List[Dict[str, Union[None, bool, float, int, str]]] = field(default_factory=list)
+
+
+# The output of the step running in the current context, if run as part of a graph
+STEP_OUTPUT: ContextVar[Optional[StepOutput]] = ContextVar("step_output", default=None)
+
+
+def chain(functions: Sequence[StepFunction]) -> List[Step]:
+    """Create steps that run one after the other.
+
+    :param functions: The step functions, in order
+    :return: The steps
+    """
+    return [
+        Step(run=function, after=(functions[idx - 1],) if idx else ())
+        for idx, function in enumerate(functions)
+    ]
+
+
+def run_graph(
+    steps: Sequence[Step],
+    runner: Callable[[Step], None],
+    failed: Callable[[], bool],
+) -> List[StepOutput]:
+    """Run each step once the steps it depends on have completed.
+
+    Steps with no dependency between them run concurrently in threads. Once a
+    step fails no further steps are started, steps already running complete.
+
+    :param steps: The steps, each declared after the steps it depends on
+    :param runner: Run a step
+    :param failed: Return True once the task has failed
+    :return: The output of each step, in the order of the steps
+    """
+    return asyncio.run(_run_graph(steps, runner, failed))
+
+
+async def _run_graph(
+    steps: Sequence[Step],
+    runner: Callable[[Step], None],
+    failed: Callable[[], bool],
+) -> List[StepOutput]:
+    """Run the steps in an event loop.
+
+    :param steps: The steps, each declared after the steps it depends on
+    :param runner: Run a step
+    :param failed: Return True once the task has failed
+    :raises ValueError: If a step is declared before a step it depends on
+    :return: The output of each step, in the order of the steps
+    """
+    declared = set()
+    for step in steps:
+        if any(dependency not in declared for dependency in step.after):
+            msg = f"Step '{step.name}' is declared before a step it depends on"
+            raise ValueError(msg)
+        declared.add(step.run)
+
+    tasks: Dict[StepFunction, asyncio.Task[bool]] = {}
+    outputs = [StepOutput() for _step in steps]
+
+    async def run_step(step: Step, output: StepOutput) -> bool:
+        for dependency in step.after:
+            if not await tasks[dependency]:
+                return False
+        if failed():
+            return False
+        # Each task has a copy of the context, which is passed on to the thread
+        STEP_OUTPUT.set(output)
+        await asyncio.to_thread(runner, step)
+        return not failed()
+
+    for step, output in zip(steps, outputs):
+        tasks[step.run] = asyncio.create_task(run_step(step, output))
+    await asyncio.gather(*tasks.values())
+    return outputs
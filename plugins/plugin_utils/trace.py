@@ -0,0 +1,72 @@
+"""Timing spans for the steps and commands of an action plugin."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import json
+import threading
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional, TypeVar, Union
+
+
+T = TypeVar("T", bound="Span")  # pylint: disable=invalid-name, useless-suppression
+
+TRACE_FILE_ENV = "ANSIBLE_SCM_TRACE_FILE"
+
+# Workers of a batch share the trace file
+_TRACE_LOCK = threading.Lock()
+
+
+@dataclass(frozen=False)
+class Span:
+    """The timing of a step or command.
+
+    ``start`` and ``end`` are seconds since the epoch, ``duration`` and
+    ``cpu_time`` are in seconds. The CPU time is only available for commands.
+    """
+
+    kind: str
+    name: str
+    start: float
+    end: float
+    cpu_time: Optional[float] = None
+    return_code: Optional[int] = None
+    failed: bool = False
+
+    @property
+    def duration(self: T) -> float:
+        """Return the duration of the span.
+
+        :return: The duration in seconds
+        """
+        return self.end - self.start
+
+    @property
+    def record(self: T) -> Dict[str, Union[None, bool, float, int, str]]:
+        """Return the span for the task result.
+
+        :return: The span, with the duration and times rounded to the microsecond
+        """
+        record = asdict(self)
+        record["duration"] = self.duration
+        return {
+            key: round(value, 6) if isinstance(value, float) else value
+            for key, value in record.items()
+        }
+
+
+def write_trace(path: str, record: Dict[str, Union[None, bool, float, int, str]]) -> None:
+    """Append a record to a JSON lines trace file.
+
+    :param path: The path to the trace file
+    :param record: The record
+    """
+    line = json.dumps(record, sort_keys=True) + "\n"
+    with _TRACE_LOCK, Path(path).expanduser().open("a", encoding="utf-8") as handle:
+        handle.write(line)
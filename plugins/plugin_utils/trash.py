@@ -0,0 +1,101 @@
+"""A trash directory for removing repositories in the background."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+import shutil
+import subprocess
+import uuid
+
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, TypeVar
+
+from .private_directory import private_directory
+
+
+T = TypeVar("T", bound="Trash")  # pylint: disable=invalid-name, useless-suppression
+
+# Remove the entries in a grandchild, the shell exits immediately so it is not left as a zombie
+DETACHED_REMOVE = 'rm -rf -- "$@" >/dev/null 2>&1 &'
+
+
+@dataclass(frozen=False)
+class Trash:
+    """A directory of repositories waiting to be removed by a detached process.
+
+    A repository is renamed into the trash, which is instant on the same
+    filesystem, and removed by a process that outlives the task. Once
+    ``max_entries`` repositories are waiting, the oldest are removed by the
+    same process, so the trash does not grow if the removals fall behind or
+    are interrupted. A value of 0 disables the limit. The trash is only used
+    if it is a directory private to the current user, not a symbolic link.
+    """
+
+    directory: str
+    max_entries: int = 0
+
+    def __post_init__(self: T) -> None:
+        """Expand the trash directory."""
+        self.directory = str(Path(self.directory).expanduser())
+
+    def _entries(self: T) -> List[Path]:
+        """Collect the repositories in the trash.
+
+        :return: The path of each repository, oldest first
+        """
+        entries = []
+        for entry in Path(self.directory).iterdir():
+            # Removed by a detached process while listing
+            with suppress(FileNotFoundError):
+                entries.append((entry.lstat().st_mtime, entry))
+        return [entry for _mtime, entry in sorted(entries)]
+
+    def _excess(self: T) -> List[Path]:
+        """Find the oldest repositories to remove so another may be added.
+
+        :return: The path of each repository beyond the limit
+        """
+        if not self.max_entries:
+            return []
+        entries = self._entries()
+        return entries[: max(len(entries) - self.max_entries + 1, 0)]
+
+    def discard(self: T, path: str) -> bool:
+        """Move a repository into the trash and remove it in the background.
+
+        :param path: The path to the repository
+        :return: False if the repository could not be moved and must be removed by the caller
+        """
+        try:
+            Path(self.directory).parent.mkdir(parents=True, exist_ok=True)
+            private_directory(self.directory)
+            entries = self._excess()
+            entry = Path(self.directory, f"{Path(path).name}-{uuid.uuid4().hex[:8]}")
+            # Fails with EXDEV if the trash is on another filesystem
+            Path(path).rename(entry)
+            os.utime(entry)
+        except OSError:
+            return False
+
+        entries.append(entry)
+        try:
+            subprocess.run(
+                ["/bin/sh", "-c", DETACHED_REMOVE, "sh", *map(str, entries)],
+                check=False,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                # A new session so the removal is not interrupted with the controller
+                start_new_session=True,
+            )
+        except OSError:
+            for discarded in entries:
+                shutil.rmtree(discarded, ignore_errors=True)
+        return True
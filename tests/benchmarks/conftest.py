@@ -0,0 +1,91 @@
+"""Shared fixtures for the benchmarks."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import json
+import os
+
+from pathlib import Path
+from typing import Dict, Iterator
+
+import pytest
+
+from .synthetic import RepositorySpec, create_repository, start_git_daemon, start_http_backend
+
+
+# Set to run the benchmarks, they are skipped otherwise
+BENCHMARK_ENV = "ANSIBLE_SCM_BENCHMARK"
+# The sizes of repository to benchmark, separated by commas
+SIZES_ENV = "ANSIBLE_SCM_BENCHMARK_SIZES"
+# The file the results are written to
+OUTPUT_ENV = "ANSIBLE_SCM_BENCHMARK_OUTPUT"
+# A file of earlier results to compare with
+BASELINE_ENV = "ANSIBLE_SCM_BENCHMARK_BASELINE"
+# The fraction by which a duration may exceed the baseline
+TOLERANCE_ENV = "ANSIBLE_SCM_BENCHMARK_TOLERANCE"
+
+SPECS = {
+    "small": RepositorySpec(name="small", files=200, depth=20, branches=10, blob_size=1024),
+    "medium": RepositorySpec(name="medium", files=5000, depth=50, branches=100, blob_size=4096),
+    "large": RepositorySpec(name="large", files=50000, depth=100, branches=1000, blob_size=8192),
+}
+
+Results = Dict[str, Dict[str, object]]
+
+
+@pytest.fixture(scope="session")
+def remotes(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Dict[str, str]]:
+    """Provide the repositories of each size behind each kind of remote.
+
+    Repositories are only created for the sizes selected.
+
+    :param tmp_path_factory: The temporary directory factory
+    :yields: The URL prefix of each kind of remote
+    """
+    directory = tmp_path_factory.mktemp("remotes")
+    for size in os.environ.get(SIZES_ENV, "small,medium").split(","):
+        create_repository(SPECS[size.strip()], directory)
+
+    daemon = start_git_daemon(directory)
+    http = start_http_backend(directory)
+    try:
+        yield {
+            "file": f"file://{directory}",
+            "daemon": f"git://127.0.0.1:{daemon.port}",  # type: ignore[attr-defined]
+            "http": f"http://127.0.0.1:{http.server_address[1]}",
+        }
+    finally:
+        http.shutdown()
+        daemon.terminate()
+        daemon.wait()
+
+
+@pytest.fixture(scope="session")
+def results() -> Iterator[Results]:
+    """Collect the results of the benchmarks and write them once all have run.
+
+    :yields: The results, keyed by scenario
+    """
+    collected: Results = {}
+    yield collected
+    output = os.environ.get(OUTPUT_ENV)
+    if output and collected:
+        Path(output).write_text(json.dumps(collected, indent=2, sort_keys=True), encoding="utf-8")
+
+
+@pytest.fixture(scope="session")
+def baseline() -> Results:
+    """Provide the results of an earlier run to compare with.
+
+    :return: The earlier results, empty if no baseline is provided
+    """
+    path = os.environ.get(BASELINE_ENV)
+    if not path:
+        return {}
+    loaded: Results = json.loads(Path(path).read_text(encoding="utf-8"))
+    return loaded
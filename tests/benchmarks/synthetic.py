@@ -0,0 +1,261 @@
+"""Synthetic repositories and local remotes for the benchmarks."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import hashlib
+import os
+import socket
+import subprocess
+import threading
+import time
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TypeVar
+
+
+T = TypeVar("T", bound="RepositorySpec")  # pylint: disable=invalid-name, useless-suppression
+U = TypeVar("U", bound="HttpBackendHandler")  # pylint: disable=invalid-name, useless-suppression
+
+IDENTITY = "Benchmark <benchmark@localhost> 1700000000 +0000"
+
+
+@dataclass(frozen=True)
+class RepositorySpec:
+    """The shape of a synthetic repository."""
+
+    name: str
+    files: int
+    depth: int
+    branches: int
+    blob_size: int
+
+    @property
+    def changed_per_commit(self: T) -> int:
+        """Return the number of files changed by each commit after the first.
+
+        :return: The number of files
+        """
+        return max(self.files // 100, 1)
+
+
+def _blob(path: str, revision: int, size: int) -> bytes:
+    """Create the content of a file, which does not compress or delta well.
+
+    :param path: The path of the file
+    :param revision: The commit changing the file
+    :param size: The size of the content in bytes
+    :return: The content
+    """
+    seed = hashlib.sha256(f"{path}:{revision}".encode()).digest()
+    blocks = (size + len(seed) - 1) // len(seed)
+    content = b"".join(
+        hashlib.sha256(seed + block.to_bytes(4, "big")).digest() for block in range(blocks)
+    )
+    return content[:size]
+
+
+def _fast_import_stream(spec: RepositorySpec) -> Iterator[bytes]:
+    """Generate the fast-import stream of a synthetic repository.
+
+    The first commit adds every file, each later commit changes a rolling
+    subset of them. The branches point at evenly spaced commits.
+
+    :param spec: The shape of the repository
+    :yields: The parts of the stream
+    """
+    paths = [f"dir{idx % 50:02d}/file{idx:06d}.txt" for idx in range(spec.files)]
+    for revision in range(spec.depth):
+        if revision == 0:
+            changed = paths
+        else:
+            start = (revision - 1) * spec.changed_per_commit
+            changed = [paths[(start + idx) % spec.files] for idx in range(spec.changed_per_commit)]
+        message = f"Commit {revision}".encode()
+        yield b"commit refs/heads/main\n"
+        yield f"mark :{revision + 1}\n".encode()
+        yield f"committer {IDENTITY}\n".encode()
+        yield f"data {len(message)}\n".encode() + message + b"\n"
+        if revision:
+            yield f"from :{revision}\n".encode()
+        for path in changed:
+            content = _blob(path, revision, spec.blob_size)
+            yield f"M 100644 inline {path}\ndata {len(content)}\n".encode() + content + b"\n"
+    for branch in range(spec.branches):
+        mark = branch * spec.depth // max(spec.branches, 1) + 1
+        yield f"reset refs/heads/branch{branch:04d}\nfrom :{mark}\n\n".encode()
+
+
+def create_repository(spec: RepositorySpec, directory: Path) -> Path:
+    """Create a bare repository with the shape of the spec.
+
+    :param spec: The shape of the repository
+    :param directory: The directory in which the repository is created
+    :return: The path to the bare repository
+    """
+    path = directory / f"{spec.name}.git"
+    subprocess.run(
+        ["git", "init", "--quiet", "--bare", "--initial-branch=main", str(path)],
+        check=True,
+    )
+    with subprocess.Popen(
+        ["git", "-C", str(path), "fast-import", "--quiet"],
+        stdin=subprocess.PIPE,
+    ) as process:
+        assert process.stdin is not None
+        for part in _fast_import_stream(spec):
+            process.stdin.write(part)
+        process.stdin.close()
+    assert process.returncode == 0
+    # Accept pushes over the git protocol and http, the branches of a publish are new
+    for key in ("daemon.receivepack", "http.receivepack"):
+        subprocess.run(["git", "-C", str(path), "config", key, "true"], check=True)
+    return path
+
+
+def free_port() -> int:
+    """Find a port on the loopback interface that is not in use.
+
+    :return: The port
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def wait_for_port(port: int, timeout: float = 10) -> None:
+    """Wait until a server accepts connections.
+
+    :param port: The port on the loopback interface
+    :param timeout: The seconds to wait
+    :raises TimeoutError: If the server does not accept connections in time
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    msg = f"Nothing is listening on port {port}"
+    raise TimeoutError(msg)
+
+
+def start_git_daemon(base_path: Path) -> "subprocess.Popen[bytes]":
+    """Serve the repositories in a directory with the git protocol.
+
+    :param base_path: The directory of the repositories
+    :return: The daemon process, listening on the port in its ``port`` attribute
+    """
+    port = free_port()
+    process = subprocess.Popen(  # pylint: disable=consider-using-with # stopped by the caller
+        [
+            "git",
+            "daemon",
+            "--reuseaddr",
+            "--export-all",
+            "--enable=receive-pack",
+            "--listen=127.0.0.1",
+            f"--port={port}",
+            f"--base-path={base_path}",
+            str(base_path),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    process.port = port  # type: ignore[attr-defined]
+    wait_for_port(port)
+    return process
+
+
+class HttpBackendHandler(BaseHTTPRequestHandler):
+    """Run git http-backend for each request, as a CGI server would."""
+
+    project_root: str = ""
+
+    def log_message(self: U, format: str, *args: str) -> None:  # noqa: A002
+        """Discard the request log.
+
+        :param format: The message format
+        :param args: The message arguments
+        """
+
+    def _body(self: U) -> bytes:
+        """Read the request body, which git sends chunked once it exceeds the post buffer.
+
+        :return: The request body
+        """
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        chunks: List[bytes] = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if not size:
+                self.rfile.readline()
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _run_backend(self: U) -> None:
+        """Pass the request to git http-backend and relay the response."""
+        path, _, query = self.path.partition("?")
+        env: Dict[str, str] = {
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "GIT_PROJECT_ROOT": self.project_root,
+            "PATH": os.environ.get("PATH", os.defpath),
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "REMOTE_ADDR": self.client_address[0],
+            "REQUEST_METHOD": self.command,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "GIT_PROTOCOL": self.headers.get("Git-Protocol", ""),
+            "HTTP_CONTENT_ENCODING": self.headers.get("Content-Encoding", ""),
+        }
+        body = self._body() if self.command == "POST" else b""
+        env["CONTENT_LENGTH"] = str(len(body))
+        completed = subprocess.run(
+            ["git", "http-backend"],
+            input=body,
+            env=env,
+            capture_output=True,
+            check=False,
+        )
+        head, _, content = completed.stdout.partition(b"\r\n\r\n")
+        headers = [line.split(b":", 1) for line in head.split(b"\r\n") if b":" in line]
+        status: Optional[int] = None
+        for name, value in headers:
+            if name.strip().lower() == b"status":
+                status = int(value.split()[0])
+        self.send_response(status or 200)
+        for name, value in headers:
+            if name.strip().lower() != b"status":
+                self.send_header(name.decode().strip(), value.decode().strip())
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self: U) -> None:  # noqa: N802 # pylint: disable=invalid-name
+        """Handle a GET request."""
+        self._run_backend()
+
+    def do_POST(self: U) -> None:  # noqa: N802 # pylint: disable=invalid-name
+        """Handle a POST request."""
+        self._run_backend()
+
+
+def start_http_backend(project_root: Path) -> ThreadingHTTPServer:
+    """Serve the repositories in a directory with git http-backend.
+
+    :param project_root: The directory of the repositories
+    :return: The server, running in a thread until shut down
+    """
+    handler = type("Handler", (HttpBackendHandler,), {"project_root": str(project_root)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,221 @@
+"""Benchmarks of git_retrieve and git_publish against local remotes.
+
+Run with ``ANSIBLE_SCM_BENCHMARK=1 pytest tests/benchmarks``. Each scenario
+retrieves a synthetic repository, changes some files and publishes them,
+in a separate process so the peak memory of one scenario does not hide
+another. Set ``ANSIBLE_SCM_BENCHMARK_OUTPUT`` to write the results and
+``ANSIBLE_SCM_BENCHMARK_BASELINE`` to compare with the results of an
+earlier version.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import multiprocessing
+import os
+import resource
+import shlex
+import time
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Union
+
+import pytest
+
+from ansible.parsing.dataloader import DataLoader
+from ansible.playbook.play_context import PlayContext
+from ansible.playbook.task import Task
+from ansible.plugins import loader as plugin_loader
+from ansible.plugins.connection.local import Connection
+from ansible.template import Templar
+from ansible_collections.ansible.scm.plugins.action.git_publish import (
+    ActionModule as GitPublishActionModule,
+)
+from ansible_collections.ansible.scm.plugins.action.git_retrieve import (
+    ActionModule as GitRetrieveActionModule,
+)
+
+from .conftest import BENCHMARK_ENV, SIZES_ENV, SPECS, TOLERANCE_ENV, Results
+
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get(BENCHMARK_ENV),
+    reason=f"Set {BENCHMARK_ENV} to run the benchmarks",
+)
+
+SIZES = [size.strip() for size in os.environ.get(SIZES_ENV, "small,medium").split(",")]
+
+# The number of files changed before publishing
+CHANGED_FILES = 10
+
+Summary = Dict[str, Union[float, int, Dict[str, float], Dict[str, int]]]
+
+
+def _action_init(task: Task) -> Dict[str, object]:
+    """Create the keyword arguments for an action plugin.
+
+    :param task: The task
+    :return: The keyword arguments
+    """
+    play_context = PlayContext()
+    loader = DataLoader()
+    return {
+        "connection": Connection(play_context=play_context, new_stdin=None),
+        "loader": loader,
+        "play_context": play_context,
+        "shared_loader_obj": plugin_loader,
+        "task": task,
+        "templar": Templar(loader=loader),
+    }
+
+
+def _subcommand(command: str) -> str:
+    """Return the git subcommand of a command.
+
+    :param command: The command line
+    :return: The subcommand, such as ``clone``
+    """
+    parts = shlex.split(command)[1:]
+    while parts and parts[0].startswith("-"):
+        # The options of git itself, -C and -c take a value
+        if parts.pop(0) in ("-C", "-c"):
+            parts.pop(0)
+    return parts[0] if parts else ""
+
+
+def _summarize(result: Dict[str, object], duration: float) -> Summary:
+    """Summarize the timings of a task result.
+
+    :param result: The task result
+    :param duration: The seconds taken by the task
+    :return: The duration, the duration of each step and the number of each git subcommand
+    """
+    assert not result["failed"], result["msg"]
+    timings = result["timings"]
+    assert isinstance(timings, list)
+    steps = {str(span["name"]): span["duration"] for span in timings if span["kind"] == "step"}
+    commands = Counter(
+        _subcommand(str(span["name"])) for span in timings if span["kind"] == "command"
+    )
+    return {
+        "duration": round(duration, 3),
+        "steps": steps,
+        "subprocesses": sum(commands.values()),
+        "commands": dict(commands),
+    }
+
+
+def _scenario(url: str, parent_directory: str, branch: str) -> Dict[str, object]:
+    """Retrieve a repository, change some files and publish them.
+
+    :param url: The URL of the repository
+    :param parent_directory: The directory to retrieve the repository into
+    :param branch: The branch to publish to
+    :return: The summary of each task and the peak resident memory of the controller in KiB
+    """
+    task = Task()
+    task.args = {
+        "branch": {"name": branch, "duplicate_detection": False},
+        "origin": {"url": url},
+        "parent_directory": parent_directory,
+    }
+    start = time.perf_counter()
+    retrieved = GitRetrieveActionModule(**_action_init(task)).run(
+        task_vars={"ansible_play_name": "benchmark"},
+    )
+    retrieve = _summarize(retrieved, time.perf_counter() - start)
+
+    path = Path(retrieved["path"])
+    changed = sorted(path.glob("dir*/file*.txt"))[:CHANGED_FILES]
+    for file in changed:
+        file.write_text(f"Changed for {branch}\n", encoding="utf-8")
+
+    task = Task()
+    task.args = {"path": str(path), "include": [str(file.relative_to(path)) for file in changed]}
+    start = time.perf_counter()
+    published = GitPublishActionModule(**_action_init(task)).run(
+        task_vars={"ansible_play_name": "benchmark"},
+    )
+    publish = _summarize(published, time.perf_counter() - start)
+
+    return {
+        "retrieve": retrieve,
+        "publish": publish,
+        # Not measured for git, the peak of a child includes the controller it was forked from
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _run_isolated(url: str, parent_directory: str, branch: str) -> Dict[str, object]:
+    """Run a scenario in a child process, so the peak memory is its own.
+
+    :param url: The URL of the repository
+    :param parent_directory: The directory to retrieve the repository into
+    :param branch: The branch to publish to
+    :return: The result of the scenario
+    """
+    context = multiprocessing.get_context("fork")
+    queue = context.SimpleQueue()
+
+    def target() -> None:
+        try:
+            queue.put(_scenario(url, parent_directory, branch))
+        except Exception as exc:  # noqa: BLE001 # pylint: disable=broad-exception-caught
+            # Reported by the parent, which would otherwise wait for a result
+            queue.put({"error": repr(exc)})
+
+    process = context.Process(target=target)
+    process.start()
+    outcome: Dict[str, object] = queue.get()
+    process.join()
+    assert "error" not in outcome, outcome["error"]
+    return outcome
+
+
+@pytest.mark.parametrize("remote", ("file", "daemon", "http"))
+@pytest.mark.parametrize("size", SIZES)
+def test_retrieve_publish(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    remote: str,
+    size: str,
+    *,
+    remotes: Dict[str, str],
+    results: Results,
+    baseline: Results,
+    tmp_path: Path,
+) -> None:
+    """Benchmark a retrieve and publish of a synthetic repository.
+
+    :param remote: The kind of remote
+    :param size: The size of the repository
+    :param remotes: The URL prefix of each kind of remote
+    :param results: The results of the benchmarks
+    :param baseline: The results of an earlier run
+    :param tmp_path: A temporary directory
+    """
+    scenario = f"{size}-{remote}"
+    spec = SPECS[size]
+    url = f"{remotes[remote]}/{spec.name}.git"
+    outcome = _run_isolated(url, str(tmp_path), branch=f"benchmark-{scenario}")
+    outcome["spec"] = {
+        "files": spec.files,
+        "depth": spec.depth,
+        "branches": spec.branches,
+        "blob_size": spec.blob_size,
+    }
+    results[scenario] = outcome
+
+    earlier = baseline.get(scenario)
+    if not earlier:
+        return
+    tolerance = float(os.environ.get(TOLERANCE_ENV, "0.25"))
+    for task in ("retrieve", "publish"):
+        current, previous = outcome[task], earlier[task]
+        assert isinstance(current, dict)
+        assert isinstance(previous, dict)
+        assert current["subprocesses"] <= previous["subprocesses"], (task, current["commands"])
+        assert current["duration"] <= previous["duration"] * (1 + tolerance), task
@@ -16,9 +16,20 @@ from ansible.playbook.play_context import PlayContext
 from ansible.playbook.task import Task
 from ansible.plugins.connection.local import Connection
 from ansible.template import Templar
+from ansible_collections.ansible.scm.plugins.plugin_utils.command import Command
 
 
 ActionModuleInit = Dict[
     str,
     Union[Connection, PlayContext, DataLoader, Task, types.ModuleType, Templar],
 ]
+
+
+def git(*args: str) -> None:
+    """Run a git command for the test setup.
+
+    :param args: The git arguments
+    """
+    command = Command(command_parts=["git", *args], fail_msg="")
+    command.run(timeout=30)
+    assert command.return_code == 0, command.stderr
@@ -0,0 +1,126 @@
+"""Tests for the command runner."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import sys
+
+from typing import List
+
+import pytest
+
+from ansible_collections.ansible.scm.plugins.plugin_utils.command import (
+    TIMEOUT_RETURN_CODE,
+    Command,
+    OutputBuffer,
+)
+
+
+def test_output_buffer_bounded() -> None:
+    """Test only the head and tail of the output are kept."""
+    buffer = OutputBuffer(head=2, tail=3)
+    for idx in range(10):
+        buffer.append(str(idx))
+    assert buffer.lines == ["0", "1", "... 5 lines omitted ...", "7", "8", "9"]
+
+
+def test_command_streams_lines() -> None:
+    """Test each line is passed to the callback, with progress updates split."""
+    lines: List[str] = []
+    script = "import sys; sys.stdout.write('a\\nb\\r' + 'c\\n' * 5); sys.stderr.write('e')"
+    command = Command(
+        command_parts=[sys.executable, "-c", script],
+        fail_msg="failed",
+        stdout_buffer=OutputBuffer(head=1, tail=1),
+        stdout_callback=lines.append,
+    )
+    command.run(timeout=10)
+
+    assert command.return_code == 0
+    assert lines == ["a", "b", "c", "c", "c", "c", "c"]
+    assert command.stdout_lines == ["a", "... 5 lines omitted ...", "c"]
+    assert command.stderr == "e"
+
+
+def test_command_callback_error() -> None:
+    """Test a failing callback is raised after the output is drained and the command exits."""
+
+    def fail(line: str) -> None:
+        msg = f"Unexpected line: {line}"
+        raise ValueError(msg)
+
+    # More output than a pipe holds, the command would block if it was not read
+    script = "import sys; sys.stdout.write('line\\n' * 100000)"
+    command = Command(
+        command_parts=[sys.executable, "-c", script],
+        fail_msg="failed",
+        stdout_callback=fail,
+    )
+    with pytest.raises(ValueError, match="Unexpected line: line"):
+        command.run(timeout=10)
+
+    assert not command.timed_out
+    assert command.return_code == 0
+    assert command.stdout_lines[-1] == "line"
+
+
+def test_command_timeout() -> None:
+    """Test a command exceeding the timeout is stopped."""
+    command = Command(
+        command_parts=[sys.executable, "-c", "import time; time.sleep(30)"],
+        fail_msg="failed",
+    )
+    command.run(timeout=1)
+
+    assert command.timed_out
+    assert command.return_code == TIMEOUT_RETURN_CODE
+
+
+def test_command_stdin() -> None:
+    """Test input larger than a pipe buffer is written while the output is read."""
+    data = b"x" * (1024 * 1024)
+    command = Command(
+        command_parts=[sys.executable, "-c", "import sys; sys.stdout.write(sys.stdin.read())"],
+        fail_msg="failed",
+        stdin=data,
+    )
+    command.run(timeout=10)
+
+    assert command.return_code == 0
+    assert len(command.stdout) == len(data)
+
+
+def test_details_redacted() -> None:
+    """Test values are redacted in one pass without changing the command."""
+    script = "print('token secret-long secret')"
+    command = Command(
+        command_parts=[sys.executable, "-c", script, "secret-long"],
+        fail_msg="failed",
+        no_log={"secret": "<S>", "secret-long": "<L>"},
+    )
+    command.run(timeout=10)
+    details = command.details()
+
+    assert details["stdout_lines"] == ["token <L> <S>"]
+    assert str(details["command"]).endswith(" '<L>'")
+    assert command.command_parts[-1] == "secret-long"
+
+
+def test_details_verbosity() -> None:
+    """Test the output is omitted, trimmed to the tail or capped in size."""
+    command = Command(
+        command_parts=[sys.executable, "-c", "print('\\n'.join(map(str, range(100))))"],
+        fail_msg="failed",
+    )
+    command.run(timeout=10)
+
+    assert "stdout_lines" not in command.details(verbosity="summary")
+    assert command.details(verbosity="tail")["stdout_lines"] == [str(idx) for idx in range(80, 100)]
+    # Each line is counted with its line ending
+    capped = command.details(max_bytes=9)
+    assert capped["stdout_lines"] == ["... 97 lines omitted ...", "97", "98", "99"]
+    assert capped["stderr_lines"] == []
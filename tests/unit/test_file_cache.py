@@ -0,0 +1,67 @@
+"""Tests for the file cache."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+
+from pathlib import Path
+from typing import Set
+
+from ansible_collections.ansible.scm.plugins.plugin_utils.file_cache import FileCache
+
+
+URL = "https://github.com/ansible/scm_testing.git"
+
+
+def test_content_keyed_by_commit(tmp_path: Path) -> None:
+    """Test content is cached per commit and path, for equivalent URLs.
+
+    :param tmp_path: A temporary directory
+    """
+    cache = FileCache(directory=str(tmp_path))
+    cache.put(URL, "a" * 40, "configs/core.yml", b"core")
+
+    assert cache.get(URL.removesuffix(".git"), "a" * 40, "configs/core.yml") == b"core"
+    assert cache.get(URL, "b" * 40, "configs/core.yml") is None
+    assert cache.get(URL, "a" * 40, "configs/edge.yml") is None
+
+
+def test_ref_max_age(tmp_path: Path) -> None:
+    """Test the commit of a ref is only reused within the maximum age.
+
+    :param tmp_path: A temporary directory
+    """
+    cache = FileCache(directory=str(tmp_path))
+    cache.remember(URL, "main", "a" * 40)
+
+    assert cache.commit(URL, "main", max_age=60) == "a" * 40
+    assert cache.commit(URL, "main", max_age=0) is None
+    assert cache.commit(URL, "devel", max_age=60) is None
+    (entry,) = Path(tmp_path, "refs").iterdir()
+    os.utime(entry, (0, 0))
+    assert cache.commit(URL, "main", max_age=60) is None
+
+
+def test_evict(tmp_path: Path) -> None:
+    """Test the least recently used content is evicted beyond the size limit.
+
+    :param tmp_path: A temporary directory
+    """
+    cache = FileCache(directory=str(tmp_path), max_size=10)
+    written: Set[Path] = set()
+    for idx, path in enumerate(("first", "second", "third")):
+        cache.put(URL, "a" * 40, path, b"12345")
+        (entry,) = {entry for entry in tmp_path.rglob("*") if entry.is_file()} - written
+        os.utime(entry, (idx + 1, idx + 1))
+        written.add(entry)
+
+    # Marks the first as the most recently used
+    assert cache.get(URL, "a" * 40, "first") == b"12345"
+    assert cache.evict() == 1
+    assert cache.get(URL, "a" * 40, "second") is None
+    assert cache.get(URL, "a" * 40, "third") == b"12345"
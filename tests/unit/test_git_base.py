@@ -0,0 +1,258 @@
+"""Tests for the git action plugin base."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import json
+
+from pathlib import Path
+
+import pytest
+
+from ansible.errors import AnsibleActionFail
+from ansible.playbook.task import Task
+from ansible_collections.ansible.scm.plugins.action.git_publish import (
+    ActionModule as GitPublishActionModule,
+)
+from ansible_collections.ansible.scm.plugins.action.git_retrieve import (
+    ActionModule as GitRetrieveActionModule,
+)
+from ansible_collections.ansible.scm.plugins.plugin_utils.host_limiter import HostLimiter
+
+from .definitions import ActionModuleInit
+
+
+def test_batch_failures_isolated(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a failed entry does not prevent the other entries from running.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    missing = [f"file://{tmp_path}/missing{idx}.git" for idx in range(3)]
+    task = Task()
+    task.args = {
+        "branch": {"name": "batch", "duplicate_detection": False},
+        "parent_directory": str(tmp_path),
+        "repositories": [
+            {"origin": {"url": missing[0]}},
+            {"origin": {"url": missing[1]}, "unknown": True},
+            {"origin": {"url": missing[2]}, "branch": {"name": "entry"}},
+        ],
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    assert result["msg"] == "Failed to process 3 of 3 repositories"
+    first, second, third = result["results"]
+    assert first["msg"] == f"Failed to clone repository: {missing[0]}"
+    assert first["branch_name"] == "batch"
+    assert "unknown" in second["msg"]
+    assert third["msg"] == f"Failed to clone repository: {missing[2]}"
+    assert third["branch_name"] == "entry"
+
+
+def test_batch_duration(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the duration of each entry is reported.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {"paths": [str(tmp_path / "missing0"), str(tmp_path / "missing1")]}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["msg"] == "Failed to process 2 of 2 repositories"
+    assert all(entry["duration"] >= 0 for entry in result["results"])
+
+
+def test_timings_traced(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the timing of each step and command is returned and traced.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    trace_file = tmp_path / "trace.jsonl"
+    task = Task()
+    task.args = {
+        "origin": {"url": f"file://{tmp_path}/missing.git"},
+        "parent_directory": str(tmp_path),
+        "trace_file": str(trace_file),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert [(span["kind"], span["name"], span["failed"]) for span in result["timings"]] == [
+        ("step", "resolve_branch_name", False),
+        ("command", result["output"][0]["command"], True),
+        ("step", "query_origin_branch", True),
+    ]
+    assert all(span["duration"] >= 0 for span in result["timings"])
+    traced = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert [span["name"] for span in traced] == [span["name"] for span in result["timings"]]
+    assert {span["trace_id"] for span in traced} == {traced[0]["trace_id"]}
+
+
+def test_transient_errors_retried(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a network command is retried after a transient error and each attempt logged.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        # Nothing listens on port 1, the connection is refused
+        "origin": {"url": "http://127.0.0.1:1/repository.git"},
+        "parent_directory": str(tmp_path),
+        "retries": {"attempts": 3, "delay": 0.01},
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    clones = [output for output in result["output"] if " clone " in output["command"]]
+    assert [output["attempt"] for output in clones] == [1, 2, 3]
+    assert all("retry_delay_ms" in output for output in clones[:-1])
+    assert "retry_delay_ms" not in clones[-1]
+
+
+def test_permanent_errors_not_retried(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a network command is not retried after an error that is not transient.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{tmp_path}/missing.git"},
+        "parent_directory": str(tmp_path),
+        "retries": {"attempts": 3, "delay": 0.01},
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    clones = [output for output in result["output"] if " clone " in output["command"]]
+    assert [output["attempt"] for output in clones] == [1]
+
+
+def test_remote_concurrency(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the time waited for a slot of the remote host is reported.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": "http://127.0.0.1:1/repository.git"},
+        "parent_directory": str(tmp_path),
+        "remote_concurrency": {"max_per_host": 2, "directory": str(tmp_path / "locks")},
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    clones = [output for output in result["output"] if " clone " in output["command"]]
+    assert clones[0]["queue_wait_ms"] >= 0
+    assert result["queue_wait"] >= 0
+    assert list((tmp_path / "locks").glob("127.0.0.1_1-*.lock"))
+
+
+def test_batch_unexpected_error(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test an unexpected error in an entry is reported for the entry alone.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    missing = f"file://{tmp_path}/missing.git"
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "parent_directory": str(tmp_path),
+        "repositories": [
+            {"origin": {"url": missing}, "parent_directory": "/proc/missing/directory"},
+            {"origin": {"url": missing}},
+        ],
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["msg"] == "Failed to process 2 of 2 repositories"
+    first, second = result["results"]
+    assert first["failed"]
+    assert first["msg"].startswith("Unexpected error: FileNotFoundError")
+    assert second["msg"] == f"Failed to clone repository: {missing}"
+
+
+@pytest.mark.parametrize("max_workers", (0, -1))
+def test_batch_max_workers(action_init: ActionModuleInit, tmp_path: Path, max_workers: int) -> None:
+    """Test a batch without any worker is rejected.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param max_workers: The number of workers
+    """
+    task = Task()
+    task.args = {
+        "max_workers": max_workers,
+        "repositories": [{"origin": {"url": f"file://{tmp_path}/missing.git"}}],
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    with pytest.raises(AnsibleActionFail, match="`max_workers` must be 1 or more"):
+        action.run(task_vars={"ansible_play_name": "test"})
+
+
+@pytest.mark.parametrize("max_per_host", (0, -1))
+def test_remote_concurrency_invalid(
+    action_init: ActionModuleInit,
+    tmp_path: Path,
+    max_per_host: int,
+) -> None:
+    """Test a limit that would never let a command contact the host is rejected.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param max_per_host: The limit
+    """
+    task = Task()
+    task.args = {
+        "origin": {"url": "http://127.0.0.1:1/repository.git"},
+        "parent_directory": str(tmp_path),
+        "remote_concurrency": {"max_per_host": max_per_host},
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    with pytest.raises(AnsibleActionFail, match="`remote_concurrency.max_per_host` must be 1"):
+        action.run(task_vars={"ansible_play_name": "test"})
+
+
+def test_remote_concurrency_timeout(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a command waiting for a slot of its host fails once the timeout is reached.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    limiter = HostLimiter(directory=str(tmp_path / "locks"), max_per_host=1)
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": "http://127.0.0.1:1/repository.git"},
+        "parent_directory": str(tmp_path),
+        "remote_concurrency": {"max_per_host": 1, "directory": limiter.directory},
+        "timeout": 1,
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    with limiter.slot("http://127.0.0.1:1/other.git"):
+        result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    assert result["msg"] == (
+        "Timed out after 1 seconds waiting for a slot of host: 127.0.0.1:1,"
+        " Failed to clone repository: http://127.0.0.1:1/repository.git"
+    )
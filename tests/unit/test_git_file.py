@@ -0,0 +1,98 @@
+"""Tests for the git_file lookup plugin."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import shutil
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ansible.errors import AnsibleLookupError
+from ansible.plugins.loader import lookup_loader
+
+from .definitions import git
+
+
+def lookup(*terms: str, **options: object) -> List[str]:
+    """Run the lookup plugin.
+
+    :param terms: The paths of the files
+    :param options: The options of the lookup
+    :return: The content of each file
+    """
+    plugin = lookup_loader.get("ansible.scm.git_file")
+    result: List[str] = plugin.run(list(terms), variables={}, **options)
+    return result
+
+
+@pytest.fixture(name="origin")
+def fixture_origin(tmp_path: Path) -> Path:
+    """Provide a bare repository with a few files, which serves partial clones.
+
+    :param tmp_path: A temporary directory
+    :return: The path to the bare repository
+    """
+    work, origin = tmp_path / "work", tmp_path / "origin.git"
+    identity = ["-c", "user.name=test", "-c", "user.email=test@localhost"]
+    git("init", "--quiet", "--initial-branch=main", str(work))
+    (work / "configs").mkdir()
+    (work / "configs" / "core.yml").write_text("name: core\n", encoding="utf-8")
+    (work / "configs" / "edge.yml").write_text("name: edge\n", encoding="utf-8")
+    (work / "link.yml").symlink_to("configs/core.yml")
+    git("-C", str(work), "add", ".")
+    git("-C", str(work), *identity, "commit", "--quiet", "-m", "first")
+    git("-C", str(work), "tag", "v1")
+    (work / "configs" / "core.yml").write_text("name: changed\n", encoding="utf-8")
+    git("-C", str(work), *identity, "commit", "--quiet", "-am", "second")
+    git("clone", "--quiet", "--bare", str(work), str(origin))
+    git("-C", str(origin), "config", "uploadpack.allowFilter", "true")
+    return origin
+
+
+def test_read_files(origin: Path, tmp_path: Path) -> None:
+    """Test files are read at a ref and served from the cache afterwards.
+
+    :param origin: The bare repository
+    :param tmp_path: A temporary directory
+    """
+    options = {"url": f"file://{origin}", "cache_directory": str(tmp_path / "cache")}
+    assert lookup("configs/core.yml", "/configs/edge.yml", **options) == [
+        "name: changed\n",
+        "name: edge\n",
+    ]
+    assert lookup("configs/core.yml", ref="v1", **options) == ["name: core\n"]
+
+    # The commit of the ref is reused and the content cached, the origin is not needed
+    lookup("configs/core.yml", ref="main", ref_max_age=60, **options)
+    shutil.rmtree(origin)
+    assert lookup("./configs/core.yml", ref="main", ref_max_age=60, **options) == [
+        "name: changed\n",
+    ]
+
+
+@pytest.mark.parametrize(
+    ("path", "message"),
+    (
+        ("missing.yml", "not found"),
+        ("link.yml", "not a regular file"),
+        ("configs", "not a regular file"),
+        ("../origin.git/config", "Invalid path"),
+    ),
+)
+def test_invalid_files(origin: Path, tmp_path: Path, path: str, message: str) -> None:
+    """Test paths that are not regular files in the repository are rejected.
+
+    :param origin: The bare repository
+    :param tmp_path: A temporary directory
+    :param path: The path of the file
+    :param message: The expected error
+    """
+    with pytest.raises(AnsibleLookupError, match=message):
+        lookup(path, url=f"file://{origin}", cache_directory=str(tmp_path / "cache"))
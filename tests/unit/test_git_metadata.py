@@ -0,0 +1,148 @@
+"""Tests for the git metadata reader."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+import shutil
+
+from pathlib import Path
+
+import pytest
+
+from ansible_collections.ansible.scm.plugins.module_utils.git_metadata import (
+    GitMetadata,
+    GitMetadataError,
+    parse_bool,
+    parse_config,
+)
+
+from .definitions import git
+
+
+CONFIG = r"""
+# A comment
+[core]
+    sparseCheckout
+    editor = "vim -c 'set tw=72'" ; a comment
+[remote "Origin"]
+    url = https://example.com/repo.git
+    fetch = +refs/heads/*:refs/remotes/Origin/*
+[user] name = A \"quoted\"  name
+    email = a@example.com\
+.org
+"""
+
+
+def test_parse_config() -> None:
+    """Test the parsing of a configuration file."""
+    assert parse_config(CONFIG) == [
+        ("core.sparsecheckout", "true"),
+        ("core.editor", "vim -c 'set tw=72'"),
+        ("remote.Origin.url", "https://example.com/repo.git"),
+        ("remote.Origin.fetch", "+refs/heads/*:refs/remotes/Origin/*"),
+        ("user.name", 'A "quoted"  name'),
+        ("user.email", "a@example.com.org"),
+    ]
+
+
+def test_parse_config_include() -> None:
+    """Test configuration includes are not supported."""
+    with pytest.raises(GitMetadataError):
+        parse_config('[includeIf "gitdir:~/work/"]\n    path = ~/.gitconfig-work\n')
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        ("true", True),
+        ("Yes", True),
+        ("on", True),
+        ("1", True),
+        ("2k", True),
+        ("FALSE", False),
+        ("no", False),
+        ("off", False),
+        ("0", False),
+        ("", False),
+    ),
+)
+def test_parse_bool(value: str, *, expected: bool) -> None:
+    """Test boolean values are parsed as git would.
+
+    :param value: The configuration value
+    :param expected: The boolean git would use
+    """
+    assert parse_bool(value) is expected
+
+
+def test_parse_bool_invalid() -> None:
+    """Test a value git would reject is not taken as false."""
+    with pytest.raises(GitMetadataError):
+        parse_bool("enabled")
+
+
+def test_system_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the system configuration is read beneath the installation prefix of git.
+
+    :param tmp_path: A temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    git("init", "--quiet", str(tmp_path / "work"))
+    prefix = tmp_path / "prefix"
+    (prefix / "bin").mkdir(parents=True)
+    (prefix / "bin" / "git").symlink_to(shutil.which("git") or "git")
+    monkeypatch.setenv("PATH", f"{prefix / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    metadata = GitMetadata(str(tmp_path / "work"))
+
+    # Without the data directory, the git found may be a wrapper script
+    with pytest.raises(GitMetadataError, match="installation prefix"):
+        metadata.config()
+
+    (prefix / "share" / "git-core").mkdir(parents=True)
+    (prefix / "etc").mkdir()
+    (prefix / "etc" / "gitconfig").write_text("[user]\n    name = system\n", encoding="utf-8")
+    assert metadata.config().get("user.name") == "system"
+
+
+def test_branches(tmp_path: Path) -> None:
+    """Test branches are read from both packed and loose refs.
+
+    :param tmp_path: A temporary directory
+    """
+    work, origin, clone = tmp_path / "work", tmp_path / "origin.git", tmp_path / "clone"
+    git("init", "--quiet", "--initial-branch", "main", str(work))
+    git(
+        "-C",
+        str(work),
+        "-c",
+        "user.name=a",
+        "-c",
+        "user.email=a@b",
+        "commit",
+        "-q",
+        "--allow-empty",
+        "-m",
+        "init",
+    )
+    git("-C", str(work), "branch", "feature")
+    git("clone", "--quiet", "--bare", str(work), str(origin))
+    git("clone", "--quiet", str(origin), str(clone))
+    git("-C", str(clone), "branch", "local")
+
+    metadata = GitMetadata(str(clone))
+
+    assert metadata.head() == "refs/heads/main"
+    assert metadata.branches() == {"main", "local"}
+    assert metadata.branches(remote="origin") == {"main", "feature"}
+    # The remote tracking branches of a clone are packed, the new branch is loose
+    commit = metadata.ref("refs/heads/local")
+    assert commit
+    assert metadata.ref("refs/remotes/origin/feature") == commit
+    assert metadata.ref("refs/remotes/origin/feat") is None
@@ -0,0 +1,383 @@
+"""Tests for the git_publish action plugin."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+import subprocess
+import tempfile
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ansible.errors import AnsibleActionFail
+from ansible.playbook.task import Task
+from ansible_collections.ansible.scm.plugins.action.git_publish import (
+    ActionModule as GitPublishActionModule,
+)
+from ansible_collections.ansible.scm.plugins.module_utils.git_metadata import (
+    GitMetadata,
+    GitMetadataError,
+)
+from ansible_collections.ansible.scm.plugins.plugin_utils import command as command_module
+from ansible_collections.ansible.scm.plugins.plugin_utils.command import Command
+from ansible_collections.ansible.scm.plugins.plugin_utils.git_base import available_cpus
+
+from .definitions import ActionModuleInit, git
+
+
+# The git subprocesses expected for a publish: add, diff to count the staged files, commit and push
+PUBLISH_SUBPROCESSES = 4
+
+
+@pytest.fixture(name="clone")
+def fixture_clone(tmp_path: Path) -> Path:
+    """Provide a clone of a local repository with an uncommitted change.
+
+    :param tmp_path: A temporary directory
+    :returns: The path to the clone
+    """
+    origin = tmp_path / "origin.git"
+    clone = tmp_path / "clone"
+    git("init", "--quiet", "--bare", str(origin))
+    git("clone", "--quiet", str(origin), str(clone))
+    (clone / "file.txt").write_text("content", encoding="utf-8")
+    return clone
+
+
+def test_publish_subprocesses(
+    action_init: ActionModuleInit,
+    clone: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test the number of git subprocesses spawned to publish.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    :param monkeypatch: The monkeypatch fixture
+    """
+    spawned: List[List[str]] = []
+
+    class Popen(subprocess.Popen):  # type: ignore[type-arg]
+        """Record each subprocess spawned."""
+
+        def __init__(self, args: List[str], **kwargs: object) -> None:
+            spawned.append(args)
+            super().__init__(args, **kwargs)  # type: ignore[call-overload]
+
+    monkeypatch.setattr(command_module.subprocess, "Popen", Popen)
+    task = Task()
+    task.args = {"path": str(clone), "remove": False}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert len(spawned) == PUBLISH_SUBPROCESSES, spawned
+    assert all(args[0] == "git" for args in spawned)
+
+
+def test_performance_options(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test the performance tuning is applied to each git command.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    task = Task()
+    task.args = {
+        "path": str(clone),
+        "performance": {"enabled": True, "checkout_workers": 3, "compression": 1},
+        "remove": False,
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    options = (
+        f"git -c checkout.workers=3 -c pack.threads={available_cpus()}"
+        " -c protocol.version=2 -c core.compression=1 -C"
+    )
+    assert all(output["command"].startswith(options) for output in result["output"])
+
+
+def test_include_exclude(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test files, patterns and exclusions are staged and counted.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    (clone / "configs").mkdir()
+    for name in ("one.cfg", "two.cfg", "skip.cfg", "notes.txt"):
+        (clone / "configs" / name).write_text(name, encoding="utf-8")
+    task = Task()
+    task.args = {
+        "exclude": ["configs/skip.cfg"],
+        "include": ["file.txt", "configs/*.cfg", "file.txt"],
+        "path": str(clone),
+        "remove": False,
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert result["files_staged"] == len(["file.txt", "one.cfg", "two.cfg"])
+    status = Command(
+        command_parts=["git", "-C", str(clone), "status", "--porcelain"],
+        fail_msg="",
+    )
+    status.run(timeout=30)
+    assert status.stdout_lines == ["?? configs/notes.txt", "?? configs/skip.cfg"]
+
+
+def test_skip_unchanged(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test nothing is committed or pushed when the files have not changed.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    task = Task()
+    task.args = {"path": str(clone), "remove": False, "skip_unchanged": True}
+    first = GitPublishActionModule(**{**action_init, "task": task.copy()}).run(
+        task_vars={"ansible_play_name": "test"},
+    )
+    second = GitPublishActionModule(**{**action_init, "task": task.copy()}).run(
+        task_vars={"ansible_play_name": "test"},
+    )
+
+    assert first["changed"], first["msg"]
+    assert not second["failed"], second["msg"]
+    assert not second["changed"]
+    assert second["msg"] == f"No changes to publish from: {clone}"
+    assert not any(" push " in output["command"] for output in second["output"])
+
+
+def test_targeted_push(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test only the branch and the created tag are pushed.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    identity = ["-c", "user.name=test", "-c", "user.email=test@localhost"]
+    git("-C", str(clone), *identity, "commit", "--quiet", "--allow-empty", "-m", "local")
+    git("-C", str(clone), "tag", "local-only")
+    (clone / "file.txt").write_text("changed", encoding="utf-8")
+    task = Task()
+    task.args = {
+        "path": str(clone),
+        "remote_branch": "review",
+        "remove": False,
+        "tag": {"annotation": "release-1", "message": "Release 1"},
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    remote = Command(
+        command_parts=["git", "ls-remote", "--refs", str(clone.parent / "origin.git")],
+        fail_msg="",
+    )
+    remote.run(timeout=30)
+    refs = sorted(line.split()[1] for line in remote.stdout_lines)
+    assert refs == ["refs/heads/review", "refs/tags/release-1"]
+
+
+def test_deferred_removal(
+    action_init: ActionModuleInit,
+    clone: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test the repository is moved into the shared trash once pushed.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(clone.parent))
+    task = Task()
+    task.args = {"path": str(clone), "deferred_removal": {"enabled": True}}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert not clone.exists()
+    assert (clone.parent / f"ansible_scm-{os.getuid()}" / "trash").is_dir()
+
+
+def test_ssh_multiplexing(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test git commands share an ssh connection per identity without changing the environment.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    sockets = clone.parent / "sockets"
+    task = Task()
+    task.args = {
+        "path": str(clone),
+        "remove": False,
+        "ssh_multiplexing": {"enabled": True, "directory": str(sockets), "persist": 30},
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    push = next(output for output in result["output"] if " push " in output["command"])
+    (control_directory,) = sockets.iterdir()
+    assert f"ControlPath={control_directory}/%C" in push["command"]
+    assert "ControlPersist=30" in push["command"]
+    assert not push["env"]
+
+
+def test_output_verbosity(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test the commands are summarized in the output and their timings kept.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    task = Task()
+    task.args = {"path": str(clone), "remove": False, "output_verbosity": "summary"}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert result["output"]
+    assert not any("stderr_lines" in output for output in result["output"])
+    commands = [timing for timing in result["timings"] if timing["kind"] == "command"]
+    assert len(commands) == len(result["output"])
+
+
+def test_read_config_git(
+    action_init: ActionModuleInit,
+    clone: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test every key of a long configuration is read when it is read with git.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    rewrites = [
+        f'[url "https://mirror{idx}.example.com/"]\n\tinsteadOf = https://host{idx}/\n'
+        for idx in range(600)
+    ]
+    with (clone / ".git" / "config").open("a", encoding="utf-8") as config:
+        # More lines than the output retains, with the identity among those omitted
+        config.write("".join([*rewrites[:150], "[user]\n\tname = Configured\n", *rewrites[150:]]))
+
+    def unreadable(_metadata: GitMetadata) -> None:
+        msg = "unreadable"
+        raise GitMetadataError(msg)
+
+    monkeypatch.setattr(GitMetadata, "config", unreadable)
+    task = Task()
+    task.args = {"path": str(clone)}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert result["user_name"] == "Configured"
+
+
+def test_ssh_multiplexing_shared_directory(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test connections are not shared through a directory other users have access to.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    sockets = clone.parent / "sockets"
+    sockets.mkdir(mode=0o700)
+    sockets.chmod(0o777)
+    task = Task()
+    task.args = {
+        "path": str(clone),
+        "remove": False,
+        "ssh_multiplexing": {"enabled": True, "directory": str(sockets)},
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert not any("ControlPath" in output["command"] for output in result["output"])
+    assert not any(sockets.iterdir())
+
+
+def test_batch_error_isolated(
+    action_init: ActionModuleInit,
+    clone: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test an error reading one repository does not prevent the others from being published.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    :param tmp_path: A temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    unreadable = tmp_path / "unreadable"
+    git("clone", "--quiet", str(tmp_path / "origin.git"), str(unreadable))
+    # pylint: disable=protected-access
+    read_config = GitPublishActionModule._read_config  # noqa: SLF001
+
+    def fail_unreadable(action: GitPublishActionModule) -> None:
+        if action._task.args["path"] == str(unreadable):  # noqa: SLF001
+            msg = "Permission denied"
+            raise PermissionError(msg)
+        read_config(action)
+
+    # pylint: enable=protected-access
+    monkeypatch.setattr(GitPublishActionModule, "_read_config", fail_unreadable)
+    task = Task()
+    task.args = {"paths": [str(unreadable), str(clone)], "remove": False}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["msg"] == "Failed to process 1 of 2 repositories"
+    failed, published = result["results"]
+    assert failed["msg"] == "Unexpected error: PermissionError: Permission denied"
+    assert not published["failed"], published["msg"]
+    assert published["changed"]
+
+
+@pytest.mark.parametrize("max_workers", (0, -1))
+def test_batch_max_workers(action_init: ActionModuleInit, clone: Path, max_workers: int) -> None:
+    """Test a batch without any worker is rejected.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    :param max_workers: The number of workers
+    """
+    task = Task()
+    task.args = {"paths": [str(clone)], "max_workers": max_workers}
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    with pytest.raises(AnsibleActionFail, match="`max_workers` must be 1 or more"):
+        action.run(task_vars={"ansible_play_name": "test"})
+
+
+def test_unchanged_file_not_counted(action_init: ActionModuleInit, clone: Path) -> None:
+    """Test a tracked file listed individually is only counted as staged if it changed.
+
+    :param action_init: A fixture for action initialization.
+    :param clone: A clone with an uncommitted change
+    """
+    identity = ["-c", "user.name=test", "-c", "user.email=test@localhost"]
+    git("-C", str(clone), "add", "file.txt")
+    git("-C", str(clone), *identity, "commit", "--quiet", "-m", "first")
+    task = Task()
+    task.args = {
+        "path": str(clone),
+        "include": ["file.txt"],
+        "remove": False,
+        "skip_unchanged": True,
+    }
+    action = GitPublishActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert not result["changed"]
+    assert result["files_staged"] == 0
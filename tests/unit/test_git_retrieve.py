@@ -0,0 +1,626 @@
+"""Tests for the git_retrieve action plugin."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import fcntl
+import os
+import time
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from ansible.errors import AnsibleActionFail
+from ansible.playbook.task import Task
+from ansible_collections.ansible.scm.plugins.action.git_retrieve import (
+    ActionModule as GitRetrieveActionModule,
+)
+from ansible_collections.ansible.scm.plugins.action.git_retrieve import (
+    JSONTypes,
+)
+from ansible_collections.ansible.scm.plugins.module_utils.git_metadata import GitMetadata
+from ansible_collections.ansible.scm.plugins.plugin_utils.command import Command
+from ansible_collections.ansible.scm.plugins.plugin_utils.mirror_cache import MirrorCache
+
+from .definitions import ActionModuleInit, git
+
+
+IDENTITY = ("-c", "user.name=test", "-c", "user.email=test@localhost")
+
+
+def _commit(work: Path, message: str) -> None:
+    """Create an empty commit in a clone.
+
+    :param work: The path to the clone
+    :param message: The commit message
+    """
+    git("-C", str(work), *IDENTITY, "commit", "--quiet", "--allow-empty", "-m", message)
+
+
+def _origin(tmp_path: Path, branches: Tuple[str, ...] = ("main",)) -> Path:
+    """Create an origin with one commit on the branches, pushed from a clone in ``work``.
+
+    :param tmp_path: A temporary directory
+    :param branches: The branches of the origin
+    :returns: The path to the origin
+    """
+    origin = tmp_path / "origin.git"
+    work = tmp_path / "work"
+    git("init", "--quiet", "--bare", "--initial-branch=main", str(origin))
+    git("clone", "--quiet", str(origin), str(work))
+    _commit(work, "first")
+    for branch in branches:
+        git("-C", str(work), "push", "--quiet", "origin", f"HEAD:refs/heads/{branch}")
+    return origin
+
+
+def test_upstream_concurrent_fetch(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the upstream is staged while the origin is cloned and rebased on locally.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = tmp_path / "origin.git"
+    upstream = tmp_path / "upstream"
+    git("init", "--quiet", "--bare", "--initial-branch=main", str(origin))
+    git("clone", "--quiet", str(origin), str(upstream))
+    _commit(upstream, "common")
+    git("-C", str(upstream), "push", "--quiet", "origin", "HEAD:main")
+    _commit(upstream, "upstream")
+
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{origin}"},
+        "parent_directory": str(tmp_path / "workspace"),
+        "upstream": {"url": f"file://{upstream}", "concurrent_fetch": True},
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    commands = [output["command"] for output in result["output"]]
+    fetches = [command for command in commands if f"file://{upstream}" in command]
+    assert [command.split()[1] for command in fetches] == ["-C", "clone"]
+    assert not any(" pull " in command for command in commands)
+    log = Command(command_parts=["git", "-C", result["path"], "log", "--format=%s"], fail_msg="")
+    log.run(timeout=30)
+    assert log.stdout_lines == ["upstream", "common"]
+
+
+def test_update_existing_clone(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test an existing clone is refreshed in place and local changes are discarded.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _origin(tmp_path)
+    work = tmp_path / "work"
+
+    def retrieve() -> Dict[str, JSONTypes]:
+        task = Task()
+        task.args = {
+            "branch": {"name": "backup", "duplicate_detection": False},
+            "origin": {"url": f"file://{origin}"},
+            "parent_directory": str(tmp_path / "workspace"),
+            "update": True,
+        }
+        action = GitRetrieveActionModule(**{**action_init, "task": task})
+        result: Dict[str, JSONTypes] = action.run(task_vars={"ansible_play_name": "test"})
+        return result
+
+    first = retrieve()
+    assert not first["failed"], first["msg"]
+    assert not first["updated"]
+    (Path(str(first["path"])) / "untracked.txt").write_text("content", encoding="utf-8")
+    _commit(work, "second")
+    git("-C", str(work), "push", "--quiet", "origin", "HEAD:main")
+
+    second = retrieve()
+    assert not second["failed"], second["msg"]
+    assert second["updated"]
+    assert second["path"] == first["path"]
+    assert not (Path(str(second["path"])) / "untracked.txt").exists()
+    log = Command(command_parts=["git", "-C", second["path"], "log", "--format=%s"], fail_msg="")
+    log.run(timeout=30)
+    assert log.stdout_lines[0] == "second"
+
+
+def test_return_branches(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test only the branches matching the pattern are returned.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _origin(tmp_path, ("main", "release/1.0", "release/2.0", "feature"))
+
+    def retrieve(return_branches: JSONTypes, name: str) -> Dict[str, JSONTypes]:
+        task = Task()
+        task.args = {
+            "branch": {"name": name, "duplicate_detection": False},
+            "origin": {"url": f"file://{origin}"},
+            "parent_directory": str(tmp_path / f"{name}-{return_branches}"),
+            "return_branches": return_branches,
+        }
+        action = GitRetrieveActionModule(**{**action_init, "task": task})
+        result: Dict[str, JSONTypes] = action.run(task_vars={"ansible_play_name": "test"})
+        assert not result["failed"], result["msg"]
+        return result
+
+    # Listed before the new branch is created, local branches first
+    assert retrieve(True, "new")["branches"] == ["main", "feature", "release/1.0", "release/2.0"]
+    assert retrieve("release/*", "new")["branches"] == ["release/1.0", "release/2.0"]
+    # The existing branch is found without listing the branches
+    existing = retrieve(False, "feature")
+    assert existing["branches"] == []
+    assert any(
+        output["command"].endswith(" -c checkout.defaultRemote=origin switch feature")
+        for output in existing["output"]
+    )
+
+
+def test_update_without_origin(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a repository without an origin remote is left in place and the task fails.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = tmp_path / "origin.git"
+    existing = tmp_path / "workspace" / "origin"
+    git("init", "--quiet", "--bare", "--initial-branch=main", str(origin))
+    git("init", "--quiet", "--initial-branch=main", str(existing))
+    git("-C", str(existing), "remote", "add", "upstream", f"file://{origin}")
+    (existing / "precious.txt").write_text("uncommitted", encoding="utf-8")
+
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{origin}"},
+        "parent_directory": str(tmp_path / "workspace"),
+        "update": True,
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    assert "has no origin remote" in result["msg"]
+    assert (existing / "precious.txt").read_text(encoding="utf-8") == "uncommitted"
+
+
+def test_upstream_ssh_options(
+    action_init: ActionModuleInit,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test the upstream is fetched with the same ssh options, whether staged concurrently or not.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    origin = _origin(tmp_path)
+    upstream = tmp_path / "upstream.git"
+    git("clone", "--quiet", "--bare", str(origin), str(upstream))
+
+    # An ssh client recording its options, which runs the git command locally
+    bin_directory = tmp_path / "bin"
+    bin_directory.mkdir()
+    log = tmp_path / "ssh.log"
+    ssh = bin_directory / "ssh"
+    ssh.write_text(
+        "#!/bin/sh\n"
+        'options=""; while [ "$#" -gt 2 ]; do options="$options $1"; shift; done\n'
+        f'echo "$options" >> {log}\n'
+        'exec sh -c "$2"\n',
+        encoding="utf-8",
+    )
+    ssh.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_directory}:{os.environ['PATH']}")
+
+    def ssh_options(concurrent_fetch: bool) -> List[str]:
+        log.unlink(missing_ok=True)
+        task = Task()
+        task.args = {
+            "branch": {"duplicate_detection": False},
+            "host_key_checking": "accept-new",
+            "origin": {"url": f"file://{origin}"},
+            "parent_directory": str(tmp_path / f"workspace-{concurrent_fetch}"),
+            "upstream": {"url": f"git@localhost:{upstream}", "concurrent_fetch": concurrent_fetch},
+        }
+        action = GitRetrieveActionModule(**{**action_init, "task": task})
+        result = action.run(task_vars={"ansible_play_name": "test"})
+        assert not result["failed"], result["msg"]
+        return log.read_text(encoding="utf-8").splitlines()
+
+    sequential, concurrent = ssh_options(concurrent_fetch=False), ssh_options(concurrent_fetch=True)
+    assert sequential == concurrent
+    assert all("StrictHostKeyChecking=accept-new" in options for options in concurrent)
+
+
+def test_existing_branch_not_fetched(
+    action_init: ActionModuleInit,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test a branch retrieved with the clone is not fetched again, however long it takes to find.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    origin = _origin(tmp_path, ("main", "feature"))
+
+    ref = GitMetadata.ref
+
+    def slow_ref(metadata: GitMetadata, name: str) -> Optional[str]:
+        time.sleep(0.2)
+        commit: Optional[str] = ref(metadata, name)
+        return commit
+
+    monkeypatch.setattr(GitMetadata, "ref", slow_ref)
+    task = Task()
+    task.args = {
+        "branch": {"name": "feature", "duplicate_detection": False},
+        # The origin is queried for the branch, which is then retrieved by the clone
+        "origin": {"url": f"file://{origin}", "branch": "feature", "single_branch": True},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert not any(" fetch " in output["command"] for output in result["output"])
+
+
+def test_mirror_dissociated(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a clone from the mirror is shallow and does not borrow objects by default.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _history_origin(tmp_path)
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "mirror_cache": {"enabled": True, "directory": str(tmp_path / "mirrors")},
+        "origin": {"url": f"file://{origin}"},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert Path(result["mirror"]["path"]).is_dir()
+    assert not (Path(result["path"]) / ".git" / "objects" / "info" / "alternates").exists()
+    assert _git_lines(result["path"], "rev-parse", "--is-shallow-repository") == ["true"]
+    assert _git_lines(result["path"], "log", "--format=%s") == ["second"]
+
+
+def test_mirror_failure_releases_lock(
+    action_init: ActionModuleInit,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test the lock of a mirror that can not be refreshed is released before the clone.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param monkeypatch: The pytest monkeypatch fixture
+    """
+    origin = _origin(tmp_path)
+    url = f"file://{origin}"
+    mirrors = MirrorCache(directory=str(tmp_path / "mirrors"))
+    # Not a repository, so the mirror can not be refreshed
+    Path(mirrors.path(url)).mkdir()
+
+    lock_path = Path(mirrors.directory, f"{mirrors.key(url)}.lock")
+    locked: List[bool] = []
+    clone = GitRetrieveActionModule._clone  # noqa: SLF001 # pylint: disable=protected-access
+
+    def probe(action: GitRetrieveActionModule) -> None:
+        with lock_path.open("a", encoding="utf-8") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                locked.append(True)
+            else:
+                locked.append(False)
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        clone(action)
+
+    monkeypatch.setattr(GitRetrieveActionModule, "_clone", probe)
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "mirror_cache": {"enabled": True, "directory": mirrors.directory},
+        "origin": {"url": url},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert not result["mirror"]["hit"]
+    assert locked == [False]
+
+
+def _partial_origin(tmp_path: Path) -> Path:
+    """Create an origin allowing partial clones, with a file in two directories.
+
+    :param tmp_path: A temporary directory
+    :returns: The path to the origin
+    """
+    origin = tmp_path / "origin.git"
+    work = tmp_path / "work"
+    git("init", "--quiet", "--bare", "--initial-branch=main", str(origin))
+    git("-C", str(origin), "config", "uploadpack.allowFilter", "true")
+    git("clone", "--quiet", str(origin), str(work))
+    for name in ("README.md", "one/file.txt", "two/file.txt"):
+        (work / name).parent.mkdir(exist_ok=True)
+        (work / name).write_text(name, encoding="utf-8")
+    git("-C", str(work), "add", "--all")
+    git("-C", str(work), *IDENTITY, "commit", "--quiet", "-m", "first")
+    git("-C", str(work), "push", "--quiet", "origin", "HEAD:main")
+    return origin
+
+
+def test_partial_sparse_clone(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a blobless clone only transfers the contents of the sparse paths.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _partial_origin(tmp_path)
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{origin}", "filter": "blobless", "sparse_paths": ["one"]},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    path = Path(result["path"])
+    assert (path / "README.md").is_file()
+    assert (path / "one" / "file.txt").is_file()
+    assert not (path / "two").exists()
+    config = Command(
+        command_parts=["git", "-C", str(path), "config", "remote.origin.partialclonefilter"],
+        fail_msg="",
+    )
+    config.run(timeout=30)
+    assert config.stdout_lines == ["blob:none"]
+    objects = Command(
+        command_parts=["git", "-C", str(path), "rev-list", "--objects", "--missing=print", "HEAD"],
+        fail_msg="",
+    )
+    objects.run(timeout=30)
+    # Only the content of the file outside the sparse paths was not transferred
+    assert len([line for line in objects.stdout_lines if line.startswith("?")]) == 1
+
+
+def test_invalid_filter(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a filter git would not understand is rejected before cloning.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {
+        "origin": {"url": f"file://{tmp_path / 'origin.git'}", "filter": "blob:everything"},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    with pytest.raises(AnsibleActionFail, match="Invalid origin filter 'blob:everything'"):
+        action.run(task_vars={"ansible_play_name": "test"})
+    assert not (tmp_path / "workspace").exists()
+
+
+def test_update_sparse_paths(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the sparse paths of an existing clone are changed when it is updated.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _partial_origin(tmp_path)
+
+    def retrieve(sparse_paths: List[str]) -> Dict[str, JSONTypes]:
+        task = Task()
+        task.args = {
+            "branch": {"name": "backup", "duplicate_detection": False},
+            "origin": {
+                "url": f"file://{origin}",
+                "filter": "blobless",
+                "sparse_paths": sparse_paths,
+            },
+            "parent_directory": str(tmp_path / "workspace"),
+            "update": True,
+        }
+        action = GitRetrieveActionModule(**{**action_init, "task": task})
+        result: Dict[str, JSONTypes] = action.run(task_vars={"ansible_play_name": "test"})
+        return result
+
+    first = retrieve(["one"])
+    assert not first["failed"], first["msg"]
+    assert not (Path(str(first["path"])) / "two").exists()
+
+    second = retrieve(["two"])
+    assert not second["failed"], second["msg"]
+    assert second["updated"]
+    path = Path(str(second["path"]))
+    assert (path / "two" / "file.txt").read_text(encoding="utf-8") == "two/file.txt"
+    assert not (path / "one").exists()
+
+
+def _history_origin(tmp_path: Path) -> Path:
+    """Create an origin with two commits on main, a tag and another branch.
+
+    :param tmp_path: A temporary directory
+    :returns: The path to the origin
+    """
+    origin = _origin(tmp_path, ("other",))
+    work = tmp_path / "work"
+    git("-C", str(work), "tag", "v1.0.0")
+    _commit(work, "second")
+    git("-C", str(work), "push", "--quiet", "--tags", "origin", "HEAD:main")
+    return origin
+
+
+def _git_lines(path: str, *args: str) -> List[str]:
+    """Run git in a clone and return its output.
+
+    :param path: The path to the clone
+    :param args: The git arguments
+    :returns: The lines of output
+    """
+    command = Command(command_parts=["git", "-C", path, *args], fail_msg="")
+    command.run(timeout=30)
+    lines: List[str] = command.stdout_lines
+    return lines
+
+
+@pytest.mark.parametrize(
+    ("origin_args", "commits", "branches", "tags"),
+    (
+        pytest.param({}, ["second"], ["origin/main", "origin/other"], ["v1.0.0"], id="default"),
+        pytest.param(
+            {"depth": 0},
+            ["second", "first"],
+            ["origin/main", "origin/other"],
+            ["v1.0.0"],
+            id="full_history",
+        ),
+        pytest.param(
+            {"single_branch": True, "tags": False},
+            ["second"],
+            ["origin/main"],
+            [],
+            id="single_branch_no_tags",
+        ),
+    ),
+)
+def test_history_options(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    action_init: ActionModuleInit,
+    tmp_path: Path,
+    origin_args: Dict[str, JSONTypes],
+    commits: List[str],
+    branches: List[str],
+    tags: List[str],
+) -> None:
+    """Test the history, branches and tags retrieved from the origin.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    :param origin_args: The origin arguments
+    :param commits: The commits expected in the history
+    :param branches: The remote branches expected
+    :param tags: The tags expected
+    """
+    origin = _history_origin(tmp_path)
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{origin}", **origin_args},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert _git_lines(result["path"], "log", "--format=%s") == commits
+    remote_branches = _git_lines(result["path"], "branch", "--remotes", "--format=%(refname:short)")
+    assert [branch for branch in remote_branches if branch != "origin/HEAD"] == branches
+    assert _git_lines(result["path"], "tag") == tags
+
+
+def test_checkout_commit(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test exactly the commit requested is retrieved.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _history_origin(tmp_path)
+    commit = _git_lines(str(origin), "rev-parse", "v1.0.0")[0]
+    task = Task()
+    task.args = {
+        "branch": {"duplicate_detection": False},
+        "origin": {"url": f"file://{origin}", "commit": commit},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert _git_lines(result["path"], "rev-parse", "HEAD") == [commit]
+    assert _git_lines(result["path"], "log", "--format=%s") == ["first"]
+
+
+def test_negative_depth(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test a negative depth is rejected before cloning.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    task = Task()
+    task.args = {
+        "origin": {"url": f"file://{tmp_path / 'origin.git'}", "depth": -1},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    with pytest.raises(AnsibleActionFail, match="`origin.depth` must be 0 or a positive number"):
+        action.run(task_vars={"ansible_play_name": "test"})
+    assert not (tmp_path / "workspace").exists()
+
+
+def test_duplicate_branch_detected(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test the task fails before cloning if the branch exists on the origin.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _history_origin(tmp_path)
+    task = Task()
+    task.args = {
+        "branch": {"name": "other"},
+        "origin": {"url": f"file://{origin}"},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert result["failed"]
+    assert result["msg"] == "Branch 'other' already exists"
+    commands = [output["command"] for output in result["output"]]
+    assert len(commands) == 1
+    assert " ls-remote --heads " in commands[0]
+    assert not any(" clone " in command for command in commands)
+
+
+def test_duplicate_detection_disabled(action_init: ActionModuleInit, tmp_path: Path) -> None:
+    """Test an existing branch is checked out, without querying the origin, when allowed.
+
+    :param action_init: A fixture for action initialization.
+    :param tmp_path: A temporary directory
+    """
+    origin = _history_origin(tmp_path)
+    task = Task()
+    task.args = {
+        "branch": {"name": "other", "duplicate_detection": False},
+        "origin": {"url": f"file://{origin}"},
+        "parent_directory": str(tmp_path / "workspace"),
+    }
+    action = GitRetrieveActionModule(**{**action_init, "task": task})
+    result = action.run(task_vars={"ansible_play_name": "test"})
+
+    assert not result["failed"], result["msg"]
+    assert result["branch_name"] == "other"
+    assert not any(" ls-remote " in output["command"] for output in result["output"])
+    assert _git_lines(result["path"], "branch", "--show-current") == ["other"]
+    assert _git_lines(result["path"], "log", "--format=%s") == ["first"]
@@ -0,0 +1,70 @@
+"""Tests for the retry policy."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import pytest
+
+from ansible_collections.ansible.scm.plugins.plugin_utils.retry import (
+    RetryPolicy,
+    is_transient,
+)
+
+
+@pytest.mark.parametrize(
+    ("stderr", "expected"),
+    (
+        (
+            "fatal: unable to access 'https://example.com/': The requested URL returned error: 503",
+            True,
+        ),
+        ("error: RPC failed; HTTP 429 curl 22 The requested URL returned error: 429", True),
+        ("Connection reset by peer\nfatal: Could not read from remote repository.", True),
+        (
+            "fatal: unable to access 'https://example.com/': The requested URL returned error: 404",
+            False,
+        ),
+        ("fatal: Authentication failed for 'https://example.com/'", False),
+        ("fatal: couldn't find remote ref refs/heads/missing", False),
+        ("error: RPC failed; HTTP 401 curl 22 The requested URL returned error: 401", False),
+        (
+            "error: RPC failed; HTTP 403 curl 22 The requested URL returned error: 403\n"
+            "fatal: the remote end hung up unexpectedly",
+            False,
+        ),
+        ("error: RPC failed; HTTP 404 curl 22\nfatal: early EOF", False),
+        (
+            "error: RPC failed; HTTP 413 curl 22 The requested URL returned error: 413\n"
+            "send-pack: unexpected disconnect while reading sideband packet",
+            False,
+        ),
+        ("error: RPC failed; HTTP 408 curl 22\nfatal: the remote end hung up unexpectedly", True),
+    ),
+)
+def test_is_transient(stderr: str, expected: bool) -> None:
+    """Test transient errors are distinguished from permanent errors.
+
+    :param stderr: The standard error of the command
+    :param expected: If the error is transient
+    """
+    assert is_transient(stderr) is expected
+
+
+def test_next_delay_backoff() -> None:
+    """Test the delay limit doubles and no delay is returned once the attempts are used."""
+    policy = RetryPolicy(attempts=4, delay=1, max_delay=3)
+    for attempt, limit in ((1, 1), (2, 2), (3, 3)):
+        delay = policy.next_delay(attempt=attempt, elapsed=0)
+        assert delay is not None
+        assert 0 <= delay <= limit
+    assert policy.next_delay(attempt=4, elapsed=0) is None
+
+
+def test_next_delay_budget() -> None:
+    """Test no delay is returned once the budget would be exceeded."""
+    policy = RetryPolicy(attempts=5, delay=1, budget=10)
+    assert policy.next_delay(attempt=1, elapsed=10) is None
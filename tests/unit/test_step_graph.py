@@ -0,0 +1,82 @@
+"""Tests for the step graph."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import threading
+
+from typing import List
+
+import pytest
+
+from ansible_collections.ansible.scm.plugins.plugin_utils.step_graph import (
+    STEP_OUTPUT,
+    Step,
+    chain,
+    run_graph,
+)
+
+
+def test_independent_steps_overlap() -> None:
+    """Test independent steps run concurrently and output is in declared order."""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def first() -> None:
+        barrier.wait()
+
+    def second() -> None:
+        barrier.wait()
+
+    def last() -> None:
+        pass
+
+    def runner(step: Step) -> None:
+        step.run()
+        output = STEP_OUTPUT.get()
+        assert output is not None
+        output.output.append({"step": step.name})
+
+    steps = [Step(first), Step(second), Step(last, after=(first, second))]
+    outputs = run_graph(steps, runner=runner, failed=lambda: False)
+
+    assert [output.output for output in outputs] == [
+        [{"step": "first"}],
+        [{"step": "second"}],
+        [{"step": "last"}],
+    ]
+
+
+def test_no_steps_after_failure() -> None:
+    """Test no further steps start once a step has failed."""
+    ran: List[str] = []
+
+    def first() -> None:
+        ran.append("first")
+
+    def second() -> None:
+        ran.append("second")
+
+    run_graph(chain([first, second]), runner=lambda step: step.run(), failed=lambda: bool(ran))
+
+    assert ran == ["first"]
+
+
+def test_declared_before_dependency() -> None:
+    """Test a step declared before a step it depends on is rejected."""
+
+    def first() -> None:
+        pass
+
+    def second() -> None:
+        pass
+
+    with pytest.raises(ValueError, match="'second' is declared before"):
+        run_graph(
+            [Step(second, after=(first,)), Step(first)],
+            runner=lambda step: step.run(),
+            failed=lambda: False,
+        )
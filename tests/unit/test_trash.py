@@ -0,0 +1,116 @@
+"""Tests for the trash directory."""
+
+from __future__ import absolute_import, division, print_function
+
+
+# pylint: disable=invalid-name
+__metaclass__ = type
+# pylint: enable=invalid-name
+
+import os
+import time
+
+from pathlib import Path
+
+import pytest
+
+from ansible_collections.ansible.scm.plugins.plugin_utils.trash import Trash
+
+
+def test_discard_in_background(tmp_path: Path) -> None:
+    """Test a repository is moved into the trash and removed by a detached process.
+
+    :param tmp_path: A temporary directory
+    """
+    repository = tmp_path / "repository"
+    (repository / "nested").mkdir(parents=True)
+    (repository / "nested" / "file.txt").write_text("content", encoding="utf-8")
+    trash = Trash(directory=str(tmp_path / "trash"))
+
+    assert trash.discard(str(repository))
+    assert not repository.exists()
+    deadline = time.monotonic() + 10
+    while any((tmp_path / "trash").iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any((tmp_path / "trash").iterdir())
+
+
+def test_discard_limit(tmp_path: Path) -> None:
+    """Test the oldest repositories are removed in the background once the trash is full.
+
+    :param tmp_path: A temporary directory
+    """
+    directory = tmp_path / "trash"
+    directory.mkdir(mode=0o700)
+    for idx in range(3):
+        (directory / f"stale{idx}").mkdir()
+        os.utime(directory / f"stale{idx}", (idx, idx))
+    repository = tmp_path / "repository"
+    repository.mkdir()
+    trash = Trash(directory=str(directory), max_entries=2)
+
+    assert trash.discard(str(repository))
+    # Removed in the background with the repository, the newest are kept meanwhile
+    assert (directory / "stale2").is_dir()
+    deadline = time.monotonic() + 10
+    while len(list(directory.iterdir())) > 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [entry.name for entry in directory.iterdir()] == ["stale2"]
+
+
+def test_discard_missing(tmp_path: Path) -> None:
+    """Test a repository that can not be moved is left to the caller.
+
+    :param tmp_path: A temporary directory
+    """
+    trash = Trash(directory=str(tmp_path / "trash"))
+    assert not trash.discard(str(tmp_path / "missing"))
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="Changing the owner of a directory requires root")
+def test_discard_foreign_trash(tmp_path: Path) -> None:
+    """Test a trash belonging to another user is not used.
+
+    :param tmp_path: A temporary directory
+    """
+    directory = tmp_path / "trash"
+    directory.mkdir()
+    os.chown(directory, 65534, 65534)
+    repository = tmp_path / "repository"
+    repository.mkdir()
+
+    assert not Trash(directory=str(directory)).discard(str(repository))
+    assert repository.is_dir()
+
+
+def test_discard_symlinked_trash(tmp_path: Path) -> None:
+    """Test a trash that is a symbolic link is not used, nor is anything in its target removed.
+
+    :param tmp_path: A temporary directory
+    """
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    for idx in range(3):
+        (target / f"unrelated{idx}").mkdir()
+    (tmp_path / "trash").symlink_to(target)
+    repository = tmp_path / "repository"
+    repository.mkdir()
+
+    assert not Trash(directory=str(tmp_path / "trash"), max_entries=1).discard(str(repository))
+    assert repository.is_dir()
+    assert len(list(target.iterdir())) == len(range(3))
+
+
+def test_discard_shared_trash(tmp_path: Path) -> None:
+    """Test a trash other users have access to is not used.
+
+    :param tmp_path: A temporary directory
+    """
+    directory = tmp_path / "trash"
+    directory.mkdir()
+    directory.chmod(0o755)
+    repository = tmp_path / "repository"
+    repository.mkdir()
+
+    assert not Trash(directory=str(directory)).discard(str(repository))
+    assert repository.is_dir()